@@ -7,18 +7,33 @@ from .models import (
 )
 from django.urls import reverse # ✅ ADICIONE ESTA LINHA
 from django.utils.html import format_html 
+from .exclusoes import em_lote
 
 class InscricaoInline(admin.TabularInline):
     model = Inscricao
     extra = 1
 
 
-class AlunoAdmin(admin.ModelAdmin):
+class ExclusoesEmLoteAdmin(admin.ModelAdmin):
+    """
+    Modelos com exportação incremental: exclusões (e suas cascatas) gravam
+    as marcas de exclusão num único INSERT em vez de um por objeto.
+    """
+    def delete_model(self, request, obj):
+        with em_lote():
+            super().delete_model(request, obj)
+
+    def delete_queryset(self, request, queryset):
+        with em_lote():
+            super().delete_queryset(request, queryset)
+
+
+class AlunoAdmin(ExclusoesEmLoteAdmin):
     list_display = ('nome_completo', 'email', 'status')
     search_fields = ['nome_completo', 'email']
     list_filter = ['status']
 
-class PagamentoAdmin(admin.ModelAdmin):
+class PagamentoAdmin(ExclusoesEmLoteAdmin):
     list_display = ('descricao', 'aluno', 'valor', 'status', 'data_vencimento')
     list_filter = ('status', 'tipo', 'mes_referencia')
     search_fields = ('aluno__nome_completo', 'descricao')
@@ -39,7 +54,7 @@ class TurmaAdmin(admin.ModelAdmin):
     search_fields = ['nome']
 
 
-class PagamentoAdmin(admin.ModelAdmin):
+class PagamentoAdmin(ExclusoesEmLoteAdmin):
     list_display = ('descricao', 'aluno', 'valor', 'status', 'data_vencimento')
     list_filter = ('status', 'tipo', 'mes_referencia')
     search_fields = ('aluno__nome_completo', 'descricao')
@@ -87,9 +102,9 @@ admin.site.register(Aluno, AlunoAdmin)
 admin.site.register(Professor)
 admin.site.register(Turma, TurmaAdmin)
 admin.site.register(Inscricao)
-admin.site.register(RegistroAula)
-admin.site.register(Presenca)
-admin.site.register(Contrato) 
+admin.site.register(RegistroAula, ExclusoesEmLoteAdmin)
+admin.site.register(Presenca, ExclusoesEmLoteAdmin)
+admin.site.register(Contrato, ExclusoesEmLoteAdmin)
 admin.site.register(Pagamento, PagamentoAdmin)
 admin.site.register(AcompanhamentoFalta)
 admin.site.register(HorarioAula)
\ No newline at end of file
@@ -0,0 +1,111 @@
+# cadastros/desempenho.py
+"""
+Séries mensais de frequência e notas de um aluno.
+
+O perfil do aluno (visão da escola) e o portal do aluno mostram os mesmos
+gráficos dos últimos meses. Em vez de uma consulta por mês, cada série sai
+de uma única consulta agrupada por mês (TruncMonth): uma para as presenças
+e outra para as provas finalizadas. Os meses sem registro entram com zero.
+
+O resultado pode ficar em cache por aluno. Cada aluno tem um número de
+versão próprio, incrementado quando suas presenças ou provas mudam (ver
+signals.py e presencas.salvar_chamada), o que descarta todas as janelas
+em cache desse aluno de uma vez.
+"""
+from dateutil.relativedelta import relativedelta
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Avg, Count, Q
+from django.db.models.functions import TruncMonth
+from django.utils import timezone
+
+from .models import AlunoProva, Presenca
+
+PREFIXO_CHAVE = 'desempenho_aluno'
+
+
+def _chave_versao(aluno_id):
+    return f'{PREFIXO_CHAVE}:versao:{aluno_id}'
+
+
+def invalidar_desempenho(alunos_ids):
+    """ Descarta as séries em cache dos alunos informados. """
+    for aluno_id in set(alunos_ids):
+        try:
+            cache.incr(_chave_versao(aluno_id))
+        except ValueError:
+            # Sem versão gravada também não há série em cache com ela
+            pass
+
+
+def _meses(inicio, fim):
+    mes = inicio.replace(day=1)
+    while mes <= fim:
+        yield mes
+        mes += relativedelta(months=1)
+
+
+def _mes(valor):
+    # TruncMonth sobre DateField devolve date; alguns backends devolvem datetime
+    return valor.date() if hasattr(valor, 'date') else valor
+
+
+def series_mensais(aluno_id, inicio, fim):
+    """
+    Frequência e nota média de cada mês entre `inicio` e `fim` (inclusive).
+    Retorna uma lista em ordem cronológica de dicts com mes (primeiro dia),
+    aulas, presencas, frequencia (%) e nota (média das provas finalizadas,
+    None quando não houve prova).
+    """
+    inicio = inicio.replace(day=1)
+
+    presencas = {
+        _mes(linha['mes']): linha
+        for linha in Presenca.objects.filter(
+            aluno_id=aluno_id, registro_aula__data_aula__range=(inicio, fim)
+        ).annotate(mes=TruncMonth('registro_aula__data_aula')).values('mes').annotate(
+            aulas=Count('id'), presencas=Count('id', filter=Q(presente=True))
+        ).order_by()
+    }
+    notas = {
+        _mes(linha['mes']): linha['media']
+        for linha in AlunoProva.objects.filter(
+            aluno_id=aluno_id, status='finalizada', data_realizacao__range=(inicio, fim)
+        ).annotate(mes=TruncMonth('data_realizacao')).values('mes').annotate(
+            media=Avg('nota_final')
+        ).order_by()
+    }
+
+    series = []
+    for mes in _meses(inicio, fim):
+        linha = presencas.get(mes, {})
+        aulas, presentes = linha.get('aulas', 0), linha.get('presencas', 0)
+        nota = notas.get(mes)
+        series.append({
+            'mes': mes,
+            'aulas': aulas,
+            'presencas': presentes,
+            'frequencia': round(presentes / aulas * 100, 1) if aulas else 0,
+            'nota': round(float(nota), 1) if nota is not None else None,
+        })
+    return series
+
+
+def ultimos_meses(aluno_id, meses=6, hoje=None, usar_cache=True):
+    """ Séries dos últimos `meses` meses, incluindo o atual, opcionalmente em cache. """
+    hoje = hoje or timezone.now().date()
+    inicio = hoje.replace(day=1) - relativedelta(months=meses - 1)
+    fim = hoje.replace(day=1) + relativedelta(months=1, days=-1)
+    if not usar_cache:
+        return series_mensais(aluno_id, inicio, fim)
+
+    versao = cache.get(_chave_versao(aluno_id))
+    if versao is None:
+        cache.add(_chave_versao(aluno_id), 1, None)
+        versao = cache.get(_chave_versao(aluno_id), 1)
+    chave = f'{PREFIXO_CHAVE}:{aluno_id}:{versao}:{inicio.isoformat()}:{fim.isoformat()}'
+    series = cache.get(chave)
+    if series is None:
+        series = series_mensais(aluno_id, inicio, fim)
+        cache.set(chave, series, settings.DESEMPENHO_CACHE_SEGUNDOS)
+    return series
@@ -0,0 +1,59 @@
+# cadastros/exclusoes.py
+"""
+Marcas de exclusão (RegistroExclusao) da exportação incremental.
+
+O signal post_delete dos modelos sincronizados chama `registrar`. Fora de
+um bloco `em_lote()` a marca é gravada na hora, um INSERT por objeto.
+Dentro do bloco, as marcas são acumuladas e gravadas com um único
+bulk_create ao final, na mesma transação da exclusão. O bloco serve para
+as exclusões em massa: queryset.delete() e exclusões com cascata (aluno,
+registro de aula), em que o Django dispara o signal uma vez por objeto.
+
+As marcas mais antigas que EXCLUSOES_RETENCAO_DIAS são apagadas pelo
+comando limpar_exclusoes. Um cliente que sincronize com um ?since= mais
+antigo que isso precisa refazer a carga completa.
+"""
+import threading
+from contextlib import contextmanager
+from datetime import timedelta
+
+from django.db import transaction
+from django.utils import timezone
+
+from .models import RegistroExclusao
+
+TAMANHO_LOTE = 1000
+
+_local = threading.local()
+
+
+def registrar(modelo, objeto_id):
+    marca = RegistroExclusao(modelo=modelo._meta.model_name, objeto_id=objeto_id)
+    pendentes = getattr(_local, 'pendentes', None)
+    if pendentes is None:
+        marca.save()
+    else:
+        pendentes.append(marca)
+
+
+@contextmanager
+def em_lote():
+    """ Acumula as marcas das exclusões feitas no bloco e grava todas de uma vez ao final. """
+    if getattr(_local, 'pendentes', None) is not None:
+        # Bloco aninhado: quem grava é o mais externo
+        yield
+        return
+    _local.pendentes = []
+    try:
+        with transaction.atomic():
+            yield
+            RegistroExclusao.objects.bulk_create(_local.pendentes, batch_size=TAMANHO_LOTE)
+    finally:
+        _local.pendentes = None
+
+
+def apagar_antigas(dias, hoje=None):
+    """ Apaga as marcas com mais de `dias` dias. Retorna quantas foram apagadas. """
+    limite = (hoje or timezone.now()) - timedelta(days=dias)
+    apagadas, _ = RegistroExclusao.objects.filter(excluido_em__lt=limite).delete()
+    return apagadas
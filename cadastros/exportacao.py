@@ -0,0 +1,708 @@
+# cadastros/exportacao.py
+"""
+Exportações CSV em streaming.
+
+Cada exportação é descrita em EXPORTACOES: nome do arquivo, cabeçalho,
+consulta (values_list com o pk, sem instanciar modelos), ordenação e a
+função que formata uma linha. A resposta é um StreamingHttpResponse: o BOM
+do UTF-8 sai no primeiro pedaço (o Excel precisa dele para acentuar
+corretamente) e as linhas vão sendo enviadas à medida que as páginas da
+consulta chegam do banco (ver paginacao.percorrer_keyset), de modo que a
+memória não cresce com o tamanho da tabela.
+
+O ZIP de registros de aula por turma segue a mesma ideia: uma única
+leitura ordenada por turma e data da aula, em páginas por keyset, agrupada
+enquanto é lida, e cada CSV é comprimido e enviado à medida que as linhas
+são produzidas.
+
+As exportações completas também podem ser geradas em segundo plano
+(TarefaExportacao): a página só enfileira a tarefa e o comando
+processar_exportacoes grava o arquivo num armazenamento privado, usando
+os mesmos geradores, sem ocupar um worker web durante a exportação.
+
+O pacote analítico reúne as tabelas usadas nas análises financeiras num
+único ZIP com um NDJSON por tabela (uma lista posicional por linha) e um
+manifesto com o esquema. Valores monetários vão em centavos, booleanos
+como 0/1 e textos repetitivos (status, tipos, descrições, turmas) como
+códigos inteiros, com os valores correspondentes no manifesto.
+
+Sincronização incremental: as exportações marcadas como `incremental`
+aceitam ?since=<data/hora> e trazem só as linhas criadas ou alteradas
+desde então (campo atualizado_em). As exclusões ficam em RegistroExclusao
+(ver exclusoes.py, inclusive a retenção) e saem na exportação de exclusões. O cabeçalho X-Exportado-Ate da resposta
+é o valor a usar no próximo ?since=.
+"""
+import csv
+import gzip
+import json
+import re
+import tempfile
+import zipfile
+from datetime import datetime, time
+from itertools import chain, groupby
+
+from django.core.files import File
+from django.db import connection, transaction
+from django.db.models import Q
+from django.http import StreamingHttpResponse
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+
+from .models import (
+    AcompanhamentoPedagogico, Aluno, Contrato, Despesa, Inscricao, Pagamento, Presenca, RegistroAula, RegistroExclusao,
+    TarefaExportacao,
+)
+from .paginacao import percorrer_keyset, percorrer_keyset_composto
+
+BOM = '\ufeff'
+LINHAS_POR_PEDACO = 200
+LINHAS_POR_CONSULTA = 2000
+
+
+class _Eco:
+    """ "Arquivo" para o csv.writer que apenas devolve o que receberia. """
+
+    def write(self, valor):
+        return valor
+
+
+class _Contador:
+    """ Conta as linhas que passam pelos geradores da exportação. """
+
+    def __init__(self):
+        self.total = 0
+
+    def contar(self, linhas):
+        for linha in linhas:
+            self.total += 1
+            yield linha
+
+
+def _rotulos(modelo, campo):
+    return dict(modelo._meta.get_field(campo).flatchoices)
+
+
+def _data(valor, formato='%Y-%m-%d'):
+    return valor.strftime(formato) if valor else ''
+
+
+def _texto(valor):
+    return '' if valor is None else valor
+
+
+def gerar_csv(cabecalho, linhas):
+    """ Gera o CSV em pedaços de texto: o BOM primeiro, depois cabeçalho e linhas. """
+    yield BOM
+    writer = csv.writer(_Eco())
+    pedaco = [writer.writerow(cabecalho)]
+    for linha in linhas:
+        pedaco.append(writer.writerow(linha))
+        if len(pedaco) >= LINHAS_POR_PEDACO:
+            yield ''.join(pedaco)
+            pedaco = []
+    if pedaco:
+        yield ''.join(pedaco)
+
+
+class _Canal:
+    """ Destino do ZipFile que acumula os bytes escritos até serem enviados. """
+
+    def __init__(self):
+        self.pedacos = []
+
+    def write(self, dados):
+        self.pedacos.append(bytes(dados))
+        return len(dados)
+
+    def flush(self):
+        pass
+
+    def esvaziar(self):
+        dados = b''.join(self.pedacos)
+        self.pedacos = []
+        return dados
+
+
+def gerar_zip(arquivos):
+    """
+    Gera um ZIP em pedaços de bytes. `arquivos` produz pares (nome, pedaços
+    de texto); cada arquivo é comprimido e enviado conforme é gerado. Como o
+    destino não permite voltar atrás, o zipfile grava tamanhos e CRC depois
+    dos dados de cada arquivo.
+    """
+    canal = _Canal()
+    with zipfile.ZipFile(canal, 'w', zipfile.ZIP_DEFLATED) as arquivo_zip:
+        for nome, pedacos in arquivos:
+            with arquivo_zip.open(nome, 'w') as destino:
+                for pedaco in pedacos:
+                    destino.write(pedaco.encode('utf-8'))
+                    dados = canal.esvaziar()
+                    if dados:
+                        yield dados
+    yield canal.esvaziar()
+
+
+def resposta_csv(nome_arquivo, cabecalho, linhas):
+    response = StreamingHttpResponse(gerar_csv(cabecalho, linhas), content_type='text/csv; charset=utf-8')
+    response['Content-Disposition'] = f'attachment; filename="{nome_arquivo}"'
+    return response
+
+
+# ------------------------------------------------------------------------------
+# Definições das exportações
+# ------------------------------------------------------------------------------
+
+PLANOS = _rotulos(Contrato, 'plano')
+TIPOS_PAGAMENTO = _rotulos(Pagamento, 'tipo')
+STATUS_PAGAMENTO = _rotulos(Pagamento, 'status')
+STATUS_ACOMPANHAMENTO = _rotulos(AcompanhamentoPedagogico, 'status')
+STATUS_ALUNO = _rotulos(Aluno, 'status')
+
+
+def _linha_contrato(c):
+    return [
+        c.pk, c.aluno_id, c.aluno__nome_completo, PLANOS.get(c.plano, c.plano),
+        _data(c.data_inicio), _data(c.data_fim),
+        f"{c.valor_mensalidade:.2f}", f"{c.valor_matricula:.2f}", c.parcelas_matricula,
+        'Sim' if c.ativo else 'Não', _texto(c.observacoes),
+    ]
+
+
+def _linha_pagamento(p):
+    return [
+        p.pk, p.aluno_id, p.aluno__nome_completo, p.contrato_id or '',
+        TIPOS_PAGAMENTO.get(p.tipo, p.tipo), p.descricao, f"{p.valor:.2f}", f"{p.valor_pago:.2f}",
+        STATUS_PAGAMENTO.get(p.status, p.status), _data(p.mes_referencia),
+        _data(p.data_vencimento), _data(p.data_pagamento),
+    ]
+
+
+def _linha_pagamento_aluno(p):
+    return [
+        p.aluno__nome_completo, p.descricao, TIPOS_PAGAMENTO.get(p.tipo, p.tipo), f"{p.valor:.2f}",
+        STATUS_PAGAMENTO.get(p.status, p.status), _data(p.mes_referencia), _data(p.data_vencimento),
+        _data(p.data_pagamento), f"{p.valor_pago:.2f}", p.contrato_id or '',
+    ]
+
+
+def _linha_registro_aula(r):
+    return [
+        r.pk, r.turma_id, r.turma__nome, _data(r.data_aula),
+        r.professor_id or '', _texto(r.professor__nome_completo),
+        r.last_parag, _texto(r.last_word), r.new_dictation, r.old_dictation,
+        r.new_reading, r.old_reading, _texto(r.lesson_check),
+    ]
+
+
+def _linha_presenca(p):
+    return [
+        p.pk, p.aluno_id, p.aluno__nome_completo, p.registro_aula_id, p.registro_aula__turma_id,
+        p.registro_aula__turma__nome, _data(p.registro_aula__data_aula), 'Sim' if p.presente else 'Não',
+    ]
+
+
+def _linha_aluno(a):
+    return [
+        a.pk, a.nome_completo, _texto(a.cpf), _texto(a.email), _texto(a.telefone),
+        _texto(a.cidade), _texto(a.estado), _data(a.data_nascimento), _data(a.data_matricula),
+        STATUS_ALUNO.get(a.status, a.status), a.creditos_aulas,
+    ]
+
+
+def _linha_acompanhamento(a):
+    return [
+        a.pk, a.aluno_id, a.aluno__nome_completo, STATUS_ACOMPANHAMENTO.get(a.status, a.status),
+        _data(a.data, '%Y-%m-%d %H:%M'),
+        '',  # Data Realização: o campo não existe mais; a coluna fica pela compatibilidade
+        a.stage_no_momento, a.criado_por__nome_completo or 'N/A',
+        a.dificuldades, a.relacao_lingua, a.objetivo_estudo, a.correcao_ditados,
+        a.pontos_fortes, a.pontos_melhorar, a.estrategia, a.comentarios_extras,
+        _texto(a.atividades_recomendadas),
+    ]
+
+
+# consulta: queryset values_list(named=True) com o pk; ordem: (campo, decrescente);
+# incremental: aceita ?since= (o modelo tem atualizado_em)
+EXPORTACOES = {
+    'contratos': {
+        'arquivo': 'mms_contratos.csv',
+        'cabecalho': [
+            'ID Contrato', 'ID Aluno', 'Nome Aluno', 'Plano', 'Data Início', 'Data Fim',
+            'Valor Mensalidade', 'Valor Matrícula', 'Parcelas Matrícula', 'Ativo', 'Observações',
+        ],
+        'consulta': lambda: Contrato.objects.values_list(
+            'pk', 'aluno_id', 'aluno__nome_completo', 'plano', 'data_inicio', 'data_fim',
+            'valor_mensalidade', 'valor_matricula', 'parcelas_matricula', 'ativo', 'observacoes',
+            named=True,
+        ),
+        'ordem': ('pk', False),
+        'incremental': True,
+        'linha': _linha_contrato,
+    },
+    'pagamentos': {
+        'arquivo': 'mms_pagamentos.csv',
+        'cabecalho': [
+            'ID Pagamento', 'ID Aluno', 'Nome Aluno', 'ID Contrato', 'Tipo', 'Descrição',
+            'Valor Total', 'Valor Pago', 'Status', 'Mês Referência', 'Data Vencimento', 'Data Pagamento',
+        ],
+        'consulta': lambda: Pagamento.objects.values_list(
+            'pk', 'aluno_id', 'aluno__nome_completo', 'contrato_id', 'tipo', 'descricao', 'valor',
+            'valor_pago', 'status', 'mes_referencia', 'data_vencimento', 'data_pagamento',
+            named=True,
+        ),
+        'ordem': ('pk', False),
+        'incremental': True,
+        'linha': _linha_pagamento,
+    },
+    # Extrato de um aluno (perfil_aluno): a view filtra pelo aluno e nomeia o arquivo
+    'pagamentos_aluno': {
+        'arquivo': 'pagamentos.csv',
+        'cabecalho': [
+            'Aluno', 'Descrição', 'Tipo', 'Valor', 'Status',
+            'Mês de Referência', 'Vencimento', 'Data Pagamento', 'Valor Pago', 'Contrato ID',
+        ],
+        'consulta': lambda: Pagamento.objects.values_list(
+            'pk', 'aluno__nome_completo', 'descricao', 'tipo', 'valor', 'status', 'mes_referencia',
+            'data_vencimento', 'data_pagamento', 'valor_pago', 'contrato_id',
+            named=True,
+        ),
+        'ordem': ('data_vencimento', True),
+        'linha': _linha_pagamento_aluno,
+    },
+    'registros_aula': {
+        'arquivo': 'mms_registros_aula.csv',
+        'cabecalho': [
+            'ID Registro', 'ID Turma', 'Nome Turma', 'Data Aula', 'ID Professor', 'Nome Professor',
+            'Último Parágrafo', 'Última Palavra', 'Ditado Novo', 'Ditado Antigo',
+            'Leitura Nova', 'Leitura Antiga', 'Lesson Check',
+        ],
+        'consulta': lambda: RegistroAula.objects.values_list(
+            'pk', 'turma_id', 'turma__nome', 'data_aula', 'professor_id', 'professor__nome_completo',
+            'last_parag', 'last_word', 'new_dictation', 'old_dictation',
+            'new_reading', 'old_reading', 'lesson_check',
+            named=True,
+        ),
+        'ordem': ('pk', False),
+        'incremental': True,
+        'linha': _linha_registro_aula,
+    },
+    'presencas': {
+        'arquivo': 'mms_presencas.csv',
+        'cabecalho': [
+            'ID Presença', 'ID Aluno', 'Nome Aluno', 'ID Registro', 'ID Turma', 'Nome Turma', 'Data Aula', 'Presente',
+        ],
+        'consulta': lambda: Presenca.objects.values_list(
+            'pk', 'aluno_id', 'aluno__nome_completo', 'registro_aula_id', 'registro_aula__turma_id',
+            'registro_aula__turma__nome', 'registro_aula__data_aula', 'presente',
+            named=True,
+        ),
+        'ordem': ('pk', False),
+        'incremental': True,
+        'linha': _linha_presenca,
+    },
+    'alunos': {
+        'arquivo': 'mms_alunos.csv',
+        'cabecalho': [
+            'ID Aluno', 'Nome', 'CPF', 'E-mail', 'Telefone', 'Cidade', 'Estado',
+            'Data Nascimento', 'Data Matrícula', 'Status', 'Créditos',
+        ],
+        'consulta': lambda: Aluno.objects.values_list(
+            'pk', 'nome_completo', 'cpf', 'email', 'telefone', 'cidade', 'estado',
+            'data_nascimento', 'data_matricula', 'status', 'creditos_aulas',
+            named=True,
+        ),
+        'ordem': ('pk', False),
+        'incremental': True,
+        'linha': _linha_aluno,
+    },
+    'acompanhamentos': {
+        'arquivo': 'mms_acompanhamentos_pedagogicos.csv',
+        'cabecalho': [
+            'ID Acompanhamento', 'ID Aluno', 'Nome Aluno', 'Status', 'Data Agendamento',
+            'Data Realização', 'Stage no Momento', 'Criado por (Professor)',
+            'Dificuldades', 'Relação Língua', 'Objetivo Estudo', 'Correção Ditados',
+            'Pontos Fortes', 'Pontos a Melhorar', 'Estratégia', 'Comentários Extras',
+            'Atividades Recomendadas',
+        ],
+        'consulta': lambda: AcompanhamentoPedagogico.objects.values_list(
+            'pk', 'aluno_id', 'aluno__nome_completo', 'status', 'data', 'stage_no_momento',
+            'criado_por__nome_completo', 'dificuldades', 'relacao_lingua', 'objetivo_estudo',
+            'correcao_ditados', 'pontos_fortes', 'pontos_melhorar', 'estrategia',
+            'comentarios_extras', 'atividades_recomendadas',
+            named=True,
+        ),
+        'ordem': ('data', True),
+        'linha': _linha_acompanhamento,
+    },
+}
+
+
+def linhas_exportacao(nome, filtro=None):
+    """ Linhas já formatadas da exportação `nome`, lidas do banco em páginas. """
+    exportacao = EXPORTACOES[nome]
+    consulta = exportacao['consulta']()
+    if filtro is not None:
+        consulta = consulta.filter(filtro)
+    campo, decrescente = exportacao['ordem']
+    for linha in percorrer_keyset(consulta, campo, decrescente, LINHAS_POR_CONSULTA):
+        yield exportacao['linha'](linha)
+
+
+def ler_desde(valor):
+    """
+    Converte o parâmetro ?since= (data ou data e hora ISO 8601; sem fuso,
+    vale o horário local) em datetime. Levanta ValueError se for inválido.
+    """
+    # O "+" do fuso (ex.: 10:00:00+00:00) chega como espaço quando não vem codificado na URL
+    valor = re.sub(r'(\d{2}:\d{2}(?::\d{2}(?:\.\d+)?)?) (\d{2}:?\d{2})$', r'\1+\2', (valor or '').strip())
+    try:
+        desde = parse_datetime(valor) or datetime.combine(parse_date(valor), time.min)
+    except (TypeError, ValueError):
+        raise ValueError(f'Parâmetro since inválido: "{valor}". Use AAAA-MM-DD ou AAAA-MM-DDTHH:MM:SS.')
+    if timezone.is_naive(desde):
+        desde = timezone.make_aware(desde)
+    return desde
+
+
+def _marcar_sincronizacao(response, inicio):
+    # Valor a usar no próximo ?since=: o instante anterior à leitura, para não perder
+    # o que for gravado durante a exportação (no máximo repete algumas linhas)
+    response['X-Exportado-Ate'] = inicio.isoformat()
+    return response
+
+
+def exportar_csv(nome, desde=None):
+    """
+    Resposta em streaming com a exportação `nome`: completa ou, com `desde`,
+    só as linhas criadas ou alteradas a partir desse instante.
+    """
+    exportacao = EXPORTACOES[nome]
+    if desde is None:
+        return resposta_csv(exportacao['arquivo'], exportacao['cabecalho'], linhas_exportacao(nome))
+    if not exportacao.get('incremental'):
+        raise ValueError('Esta exportação não aceita o parâmetro since.')
+
+    inicio = timezone.now()
+    linhas = linhas_exportacao(nome, Q(atualizado_em__gte=desde))
+    arquivo = exportacao['arquivo'].replace('.csv', f'_desde_{desde:%Y%m%d%H%M%S}.csv')
+    return _marcar_sincronizacao(resposta_csv(arquivo, exportacao['cabecalho'], linhas), inicio)
+
+
+def exportar_exclusoes(desde=None):
+    """ Registros excluídos (a partir de `desde`) dos modelos com sincronização incremental. """
+    inicio = timezone.now()
+    consulta = RegistroExclusao.objects.values_list('pk', 'modelo', 'objeto_id', 'excluido_em', named=True)
+    if desde is not None:
+        consulta = consulta.filter(excluido_em__gte=desde)
+    linhas = (
+        [r.modelo, r.objeto_id, r.excluido_em.isoformat()]
+        for r in percorrer_keyset(consulta, 'pk', False, LINHAS_POR_CONSULTA)
+    )
+    response = resposta_csv('mms_exclusoes.csv', ['Modelo', 'ID', 'Excluído em'], linhas)
+    return _marcar_sincronizacao(response, inicio)
+
+
+# ------------------------------------------------------------------------------
+# ZIP com os registros de aula de cada turma
+# ------------------------------------------------------------------------------
+
+CABECALHO_REGISTROS_TURMA = [
+    'ID Registro', 'Data Aula', 'ID Professor', 'Nome Professor',
+    'Último Parágrafo', 'Última Palavra', 'Ditado Novo', 'Ditado Antigo',
+    'Leitura Nova', 'Leitura Antiga', 'Lesson Check',
+]
+
+
+def _linha_registro_turma(r):
+    return [
+        r.pk, _data(r.data_aula), r.professor_id or '', _texto(r.professor__nome_completo),
+        r.last_parag, _texto(r.last_word), r.new_dictation, r.old_dictation,
+        r.new_reading, r.old_reading, _texto(r.lesson_check),
+    ]
+
+
+def csvs_registros_por_turma(contador=None):
+    """
+    Pares (nome do arquivo, pedaços do CSV) de cada turma com registros,
+    a partir de uma única leitura ordenada por turma e data da aula,
+    percorrida por keyset em páginas de LINHAS_POR_CONSULTA.
+    `contador` (opcional) conta os registros lidos.
+    """
+    consulta = RegistroAula.objects.values_list(
+        'pk', 'turma_id', 'turma__nome', 'data_aula', 'professor_id', 'professor__nome_completo',
+        'last_parag', 'last_word', 'new_dictation', 'old_dictation',
+        'new_reading', 'old_reading', 'lesson_check',
+        named=True,
+    )
+    registros = percorrer_keyset_composto(
+        consulta, ['turma__nome', 'turma_id', 'data_aula'], LINHAS_POR_CONSULTA
+    )
+    if contador is not None:
+        registros = contador.contar(registros)
+
+    for _, linhas in groupby(registros, key=lambda r: r.turma_id):
+        primeira = next(linhas)
+        # Remove caracteres inválidos para nomes de arquivo
+        nome_turma_seguro = re.sub(r'[^\w\-]+', '_', primeira.turma__nome)
+        yield (
+            f'registros_turma_{nome_turma_seguro}.csv',
+            gerar_csv(CABECALHO_REGISTROS_TURMA, map(_linha_registro_turma, chain([primeira], linhas))),
+        )
+
+
+def resposta_zip_registros_por_turma():
+    response = StreamingHttpResponse(gerar_zip(csvs_registros_por_turma()), content_type='application/zip')
+    response['Content-Disposition'] = 'attachment; filename="mms_registros_aula_por_turma.zip"'
+    return response
+
+
+# ------------------------------------------------------------------------------
+# Pacote analítico (NDJSON colunar + manifesto)
+# ------------------------------------------------------------------------------
+
+# Para cada tabela: modelo e colunas (nome no arquivo, caminho no ORM, tipo).
+# Tipos: inteiro, booleano (0/1), data (AAAA-MM-DD), centavos (inteiro),
+# codigo (texto codificado como inteiro; as escolhas do campo vêm primeiro).
+TABELAS_ANALITICAS = {
+    'pagamentos': (Pagamento, [
+        ('id', 'pk', 'inteiro'),
+        ('aluno_id', 'aluno_id', 'inteiro'),
+        ('contrato_id', 'contrato_id', 'inteiro'),
+        ('tipo', 'tipo', 'codigo'),
+        ('status', 'status', 'codigo'),
+        ('descricao', 'descricao', 'codigo'),
+        ('valor', 'valor', 'centavos'),
+        ('valor_pago', 'valor_pago', 'centavos'),
+        ('mes_referencia', 'mes_referencia', 'data'),
+        ('data_vencimento', 'data_vencimento', 'data'),
+        ('data_pagamento', 'data_pagamento', 'data'),
+    ]),
+    'contratos': (Contrato, [
+        ('id', 'pk', 'inteiro'),
+        ('aluno_id', 'aluno_id', 'inteiro'),
+        ('plano', 'plano', 'codigo'),
+        ('status', 'status', 'codigo'),
+        ('ativo', 'ativo', 'booleano'),
+        ('data_inicio', 'data_inicio', 'data'),
+        ('data_fim', 'data_fim', 'data'),
+        ('data_cancelamento', 'data_cancelamento', 'data'),
+        ('valor_mensalidade', 'valor_mensalidade', 'centavos'),
+        ('valor_matricula', 'valor_matricula', 'centavos'),
+        ('parcelas_matricula', 'parcelas_matricula', 'inteiro'),
+    ]),
+    'presencas': (Presenca, [
+        ('id', 'pk', 'inteiro'),
+        ('aluno_id', 'aluno_id', 'inteiro'),
+        ('presente', 'presente', 'booleano'),
+        ('registro_aula_id', 'registro_aula_id', 'inteiro'),
+        ('data_aula', 'registro_aula__data_aula', 'data'),
+        ('turma_id', 'registro_aula__turma_id', 'inteiro'),
+        ('turma', 'registro_aula__turma__nome', 'codigo'),
+        ('professor_id', 'registro_aula__professor_id', 'inteiro'),
+    ]),
+    'inscricoes': (Inscricao, [
+        ('id', 'pk', 'inteiro'),
+        ('aluno_id', 'aluno_id', 'inteiro'),
+        ('turma_id', 'turma_id', 'inteiro'),
+        ('turma', 'turma__nome', 'codigo'),
+        ('stage', 'turma__stage', 'inteiro'),
+        ('status', 'status', 'codigo'),
+        ('faltas_consecutivas', 'faltas_consecutivas', 'inteiro'),
+    ]),
+    'despesas': (Despesa, [
+        ('id', 'pk', 'inteiro'),
+        ('descricao', 'descricao', 'codigo'),
+        ('categoria', 'categoria', 'codigo'),
+        ('valor', 'valor', 'centavos'),
+        ('pago', 'pago', 'booleano'),
+        ('data_vencimento', 'data_vencimento', 'data'),
+        ('data_pagamento', 'data_pagamento', 'data'),
+    ]),
+}
+
+
+class _Codigos:
+    """ Dicionário texto -> código de uma coluna, preenchido conforme as linhas passam. """
+
+    def __init__(self, escolhas=()):
+        self.valores = []
+        self.rotulos = []
+        self.codigos = {}
+        for valor, rotulo in escolhas:
+            self.codificar(valor, rotulo)
+
+    def codificar(self, valor, rotulo=None):
+        if valor is None:
+            return None
+        codigo = self.codigos.get(valor)
+        if codigo is None:
+            codigo = self.codigos[valor] = len(self.valores)
+            self.valores.append(valor)
+            self.rotulos.append(rotulo if rotulo is not None else valor)
+        return codigo
+
+
+def _conversor(tipo, codigos):
+    if tipo == 'centavos':
+        return lambda v: None if v is None else int(v * 100)
+    if tipo == 'data':
+        return lambda v: None if v is None else v.isoformat()
+    if tipo == 'booleano':
+        return lambda v: None if v is None else int(v)
+    if tipo == 'codigo':
+        return codigos.codificar
+    return lambda v: v
+
+
+def _linhas_ndjson(modelo, colunas, esquema, contador):
+    """ Pedaços de texto do NDJSON da tabela; preenche `esquema` com os dicionários usados. """
+    conversores = []
+    for nome, caminho, tipo in colunas:
+        codigos = None
+        if tipo == 'codigo':
+            campo = modelo._meta.get_field(caminho) if '__' not in caminho else None
+            codigos = _Codigos(campo.flatchoices if campo is not None else ())
+            esquema[nome] = codigos
+        conversores.append(_conversor(tipo, codigos))
+
+    consulta = modelo.objects.values_list(*[caminho for _, caminho, _ in colunas], named=True)
+    caminhos = [caminho for _, caminho, _ in colunas]
+    pedaco = []
+    for linha in contador.contar(percorrer_keyset(consulta, 'pk', False, LINHAS_POR_CONSULTA)):
+        valores = [converter(getattr(linha, caminho)) for converter, caminho in zip(conversores, caminhos)]
+        pedaco.append(json.dumps(valores, ensure_ascii=False, separators=(',', ':')))
+        if len(pedaco) >= LINHAS_POR_PEDACO:
+            yield '\n'.join(pedaco) + '\n'
+            pedaco = []
+    if pedaco:
+        yield '\n'.join(pedaco) + '\n'
+
+
+def _manifesto(esquemas, contadores):
+    manifesto = {
+        'formato': 'ndjson-colunar',
+        'versao': 1,
+        'gerado_em': timezone.now().isoformat(),
+        'descricao': (
+            'Cada arquivo <tabela>.ndjson tem uma lista por linha, na ordem de "colunas". '
+            'centavos: valor monetário multiplicado por 100; booleano: 0/1; data: AAAA-MM-DD; '
+            'codigo: índice em "valores" (e "rotulos") da coluna.'
+        ),
+        'tabelas': {},
+    }
+    for nome_tabela, (_, colunas) in TABELAS_ANALITICAS.items():
+        descricao_colunas = []
+        for nome, _, tipo in colunas:
+            coluna = {'nome': nome, 'tipo': tipo}
+            codigos = esquemas[nome_tabela].get(nome)
+            if codigos is not None:
+                coluna['valores'] = codigos.valores
+                coluna['rotulos'] = codigos.rotulos
+            descricao_colunas.append(coluna)
+        manifesto['tabelas'][nome_tabela] = {
+            'arquivo': f'{nome_tabela}.ndjson',
+            'linhas': contadores[nome_tabela].total,
+            'colunas': descricao_colunas,
+        }
+    yield json.dumps(manifesto, ensure_ascii=False, indent=2)
+
+
+def arquivos_pacote_analitico(contador=None):
+    """
+    Pares (nome, pedaços) do pacote: um NDJSON por tabela e, por último, o
+    manifesto (escrito depois das tabelas, quando os dicionários já estão completos).
+    """
+    esquemas = {}
+    contadores = {}
+    for nome_tabela, (modelo, colunas) in TABELAS_ANALITICAS.items():
+        esquemas[nome_tabela] = {}
+        contadores[nome_tabela] = _Contador()
+        linhas = _linhas_ndjson(modelo, colunas, esquemas[nome_tabela], contadores[nome_tabela])
+        yield f'{nome_tabela}.ndjson', linhas
+    if contador is not None:
+        contador.total = sum(c.total for c in contadores.values())
+    yield 'manifesto.json', _manifesto(esquemas, contadores)
+
+
+def resposta_pacote_analitico():
+    nome = f"mms_pacote_analitico_{timezone.now():%Y%m%d}.zip"
+    response = StreamingHttpResponse(gerar_zip(arquivos_pacote_analitico()), content_type='application/zip')
+    response['Content-Disposition'] = f'attachment; filename="{nome}"'
+    return response
+
+
+# ------------------------------------------------------------------------------
+# Exportações em segundo plano (TarefaExportacao)
+# ------------------------------------------------------------------------------
+
+def _gzip(pedacos):
+    canal = _Canal()
+    with gzip.GzipFile(fileobj=canal, mode='wb') as compactado:
+        for pedaco in pedacos:
+            compactado.write(pedaco.encode('utf-8'))
+            dados = canal.esvaziar()
+            if dados:
+                yield dados
+    yield canal.esvaziar()
+
+
+def _conteudo_da_tarefa(tarefa, contador):
+    """ Nome do arquivo e pedaços de bytes da exportação pedida pela tarefa. """
+    if tarefa.tipo == 'registros_por_turma':
+        # O ZIP já vem comprimido
+        return 'mms_registros_aula_por_turma.zip', gerar_zip(csvs_registros_por_turma(contador))
+    if tarefa.tipo == 'pacote_analitico':
+        return f"mms_pacote_analitico_{timezone.now():%Y%m%d}.zip", gerar_zip(arquivos_pacote_analitico(contador))
+
+    exportacao = EXPORTACOES[tarefa.tipo]
+    filtro = Q(**tarefa.filtros) if tarefa.filtros else None
+    linhas = contador.contar(linhas_exportacao(tarefa.tipo, filtro))
+    return f"{exportacao['arquivo']}.gz", _gzip(gerar_csv(exportacao['cabecalho'], linhas))
+
+
+def proxima_tarefa():
+    """
+    Reserva a tarefa mais antiga da fila (marcando-a como em andamento) ou
+    devolve None. Com SKIP LOCKED, vários workers podem consumir a fila sem
+    pegar a mesma tarefa.
+    """
+    with transaction.atomic():
+        fila = TarefaExportacao.objects.filter(status='pendente').order_by('criado_em', 'pk')
+        if connection.features.has_select_for_update_skip_locked:
+            fila = fila.select_for_update(skip_locked=True)
+        tarefa = fila.first()
+        if tarefa is None:
+            return None
+        atualizadas = TarefaExportacao.objects.filter(pk=tarefa.pk, status='pendente').update(
+            status='em_andamento', iniciado_em=timezone.now()
+        )
+    if not atualizadas:
+        # Outro worker (sem SKIP LOCKED) chegou antes
+        return proxima_tarefa()
+    tarefa.refresh_from_db()
+    return tarefa
+
+
+def executar_tarefa(tarefa):
+    """ Gera o arquivo da tarefa em um temporário e o grava no armazenamento das exportações. """
+    contador = _Contador()
+    try:
+        nome, pedacos = _conteudo_da_tarefa(tarefa, contador)
+        with tempfile.TemporaryFile() as temporario:
+            for pedaco in pedacos:
+                temporario.write(pedaco)
+            tarefa.tamanho_bytes = temporario.tell()
+            temporario.seek(0)
+            tarefa.arquivo.save(nome, File(temporario), save=False)
+    except Exception as erro:
+        tarefa.status = 'falhou'
+        tarefa.erro = repr(erro)
+        tarefa.finalizado_em = timezone.now()
+        tarefa.save(update_fields=['status', 'erro', 'finalizado_em'])
+        raise
+
+    tarefa.status = 'concluida'
+    tarefa.linhas = contador.total
+    tarefa.finalizado_em = timezone.now()
+    tarefa.save(update_fields=['status', 'arquivo', 'linhas', 'tamanho_bytes', 'finalizado_em'])
+    return tarefa
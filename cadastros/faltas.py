@@ -0,0 +1,251 @@
+# cadastros/faltas.py
+"""
+Motor de sequências de faltas (alertas de AcompanhamentoFalta).
+
+Uma única consulta com funções de janela calcula, para cada par
+(aluno, turma) de inscrições MATRICULADAS, a data da última aula registrada
+e a data da última presença. Só voltam do banco as faltas posteriores à
+última presença (a sequência atual) e a linha da última aula; o restante é
+agregado em memória.
+
+Cada inscrição guarda a própria sequência (`faltas_consecutivas`),
+atualizada no momento em que a chamada é salva: se a aula é mais nova que
+a última contabilizada, basta somar ou zerar o contador; caso contrário
+(edição de aula antiga), a sequência daquela turma é recalculada. Os
+alertas são sempre aplicados a partir desses contadores. A rotina noturna
+(verificar_faltas) recalcula as sequências pelo histórico completo, o
+mesmo critério do caminho incremental, e corrige os contadores que
+divergirem antes de aplicar os alertas.
+"""
+from collections import defaultdict
+from datetime import date, timedelta
+
+from django.db import transaction
+from django.db.models import Case, Exists, F, Max, OuterRef, Q, When, Window
+from django.utils import timezone
+
+from .models import AcompanhamentoFalta, Inscricao, Presenca
+from .paineis import invalidar_paineis
+
+LIMITE_FALTAS_CONSECUTIVAS = 3
+JANELA_DIAS = 30
+
+
+def sequencias_de_faltas(alunos=None, turmas=None, hoje=None, janela_dias=JANELA_DIAS):
+    """
+    Retorna um dict {(aluno_id, turma_id): sequencia}, em que `sequencia` tem
+    'faltas' (faltas seguidas desde a última presença), 'inicio' (data da
+    primeira falta da sequência), 'ultima_aula', 'ultima_presente' e 'nome'.
+
+    `alunos` e `turmas` restringem a consulta (ids ou querysets);
+    `janela_dias=None` considera todo o histórico.
+    """
+    matriculado_na_turma = Inscricao.objects.filter(
+        aluno=OuterRef('aluno'), turma=OuterRef('registro_aula__turma'), status='matriculado'
+    )
+    presencas = Presenca.objects.filter(Exists(matriculado_na_turma))
+    if janela_dias is not None:
+        hoje = hoje or timezone.now().date()
+        presencas = presencas.filter(registro_aula__data_aula__gte=hoje - timedelta(days=janela_dias))
+    if alunos is not None:
+        presencas = presencas.filter(aluno__in=alunos)
+    if turmas is not None:
+        presencas = presencas.filter(registro_aula__turma__in=turmas)
+
+    particao = [F('aluno_id'), F('registro_aula__turma_id')]
+    linhas = presencas.annotate(
+        data=F('registro_aula__data_aula'),
+        turma_ref=F('registro_aula__turma_id'),
+        ultima_aula=Window(Max('registro_aula__data_aula'), partition_by=particao),
+        ultima_presenca=Window(
+            Max(Case(When(presente=True, then=F('registro_aula__data_aula')))), partition_by=particao
+        ),
+    ).filter(
+        Q(ultima_presenca__isnull=True) | Q(data__gt=F('ultima_presenca')) | Q(data=F('ultima_aula'))
+    ).values_list('aluno_id', 'turma_ref', 'aluno__nome_completo', 'data', 'presente', 'ultima_aula', 'ultima_presenca')
+
+    sequencias = {}
+    for aluno_id, turma_id, nome, data, presente, ultima_aula, ultima_presenca in linhas:
+        sequencia = sequencias.setdefault((aluno_id, turma_id), {
+            'faltas': 0, 'inicio': None, 'ultima_aula': ultima_aula, 'ultima_presente': False, 'nome': nome,
+        })
+        if not presente and (ultima_presenca is None or data > ultima_presenca):
+            sequencia['faltas'] += 1
+            if sequencia['inicio'] is None or data < sequencia['inicio']:
+                sequencia['inicio'] = data
+        if data == ultima_aula and presente:
+            sequencia['ultima_presente'] = True
+    return sequencias
+
+
+def aplicar_alertas(sequencias, agora=None):
+    """
+    Cria, atualiza ou resolve os alertas pendentes a partir das sequências.
+
+    Os alertas são por aluno: vale a maior sequência entre as turmas dele.
+    Se nenhuma turma atinge o limite e a última aula de alguma delas teve
+    presença, o alerta pendente é resolvido automaticamente.
+    Retorna {'novos': [...], 'atualizados': [...], 'resolvidos': [...]}
+    com pares (nome do aluno, alerta).
+    """
+    agora = agora or timezone.now()
+    por_aluno = defaultdict(list)
+    for (aluno_id, _turma_id), sequencia in sequencias.items():
+        por_aluno[aluno_id].append(sequencia)
+
+    resultado = {'novos': [], 'atualizados': [], 'resolvidos': []}
+    if not por_aluno:
+        return resultado
+
+    pendentes = {}
+    # Em ordem decrescente, o alerta mais antigo de cada aluno é o que fica no dict
+    for alerta in AcompanhamentoFalta.objects.filter(aluno_id__in=por_aluno, status='pendente').order_by('-pk'):
+        pendentes[alerta.aluno_id] = alerta
+
+    for aluno_id, lista in por_aluno.items():
+        maior = max(lista, key=lambda s: s['faltas'])
+        alerta = pendentes.get(aluno_id)
+        presencas_recentes = [s['ultima_aula'] for s in lista if s['ultima_presente']]
+
+        if maior['faltas'] >= LIMITE_FALTAS_CONSECUTIVAS:
+            if alerta is None:
+                resultado['novos'].append((maior['nome'], AcompanhamentoFalta(
+                    aluno_id=aluno_id,
+                    data_inicio_sequencia=maior['inicio'],
+                    numero_de_faltas=maior['faltas'],
+                    status='pendente',
+                )))
+            elif maior['faltas'] > alerta.numero_de_faltas:
+                alerta.numero_de_faltas = maior['faltas']
+                resultado['atualizados'].append((maior['nome'], alerta))
+        elif alerta and presencas_recentes:
+            alerta.status = 'resolvido'
+            alerta.motivo = f"Resolvido automaticamente: Presença detectada em {max(presencas_recentes).strftime('%d/%m/%Y')}."
+            alerta.data_resolucao = agora
+            resultado['resolvidos'].append((maior['nome'], alerta))
+
+    with transaction.atomic():
+        if resultado['novos']:
+            AcompanhamentoFalta.objects.bulk_create([a for _, a in resultado['novos']])
+        if resultado['atualizados']:
+            AcompanhamentoFalta.objects.bulk_update([a for _, a in resultado['atualizados']], ['numero_de_faltas'])
+        if resultado['resolvidos']:
+            AcompanhamentoFalta.objects.bulk_update(
+                [a for _, a in resultado['resolvidos']], ['status', 'motivo', 'data_resolucao']
+            )
+    if any(resultado.values()):
+        invalidar_paineis()
+    return resultado
+
+
+def sequencias_das_inscricoes(alunos):
+    """
+    Sequências no formato de `sequencias_de_faltas`, lidas dos contadores
+    guardados nas inscrições MATRICULADAS dos alunos informados.
+    """
+    return {
+        (i.aluno_id, i.turma_id): {
+            'faltas': i.faltas_consecutivas,
+            'inicio': i.inicio_sequencia_faltas,
+            'ultima_aula': i.ultima_aula_contabilizada,
+            'ultima_presente': i.faltas_consecutivas == 0,
+            'nome': i.aluno.nome_completo,
+        }
+        for i in Inscricao.objects.filter(
+            aluno__in=alunos, status='matriculado', ultima_aula_contabilizada__isnull=False
+        ).select_related('aluno')
+    }
+
+
+def reconciliar_contadores(alunos=None):
+    """
+    Recalcula pelo histórico completo (o mesmo critério do caminho
+    incremental) a sequência de cada inscrição MATRICULADA dos alunos
+    informados (ou de todos) e grava só as que divergem do contador
+    guardado. Retorna a lista das inscrições corrigidas.
+    """
+    inscricoes = Inscricao.objects.filter(status='matriculado')
+    if alunos is not None:
+        inscricoes = inscricoes.filter(aluno__in=alunos)
+    sequencias = sequencias_de_faltas(alunos=alunos, janela_dias=None)
+
+    corrigidas = []
+    for inscricao in inscricoes.select_related('aluno'):
+        sequencia = sequencias.get((inscricao.aluno_id, inscricao.turma_id))
+        esperado = (sequencia['faltas'], sequencia['inicio'], sequencia['ultima_aula']) if sequencia else (0, None, None)
+        atual = (inscricao.faltas_consecutivas, inscricao.inicio_sequencia_faltas, inscricao.ultima_aula_contabilizada)
+        if atual != esperado:
+            (inscricao.faltas_consecutivas, inscricao.inicio_sequencia_faltas,
+             inscricao.ultima_aula_contabilizada) = esperado
+            corrigidas.append(inscricao)
+
+    if corrigidas:
+        Inscricao.objects.bulk_update(
+            corrigidas, ['faltas_consecutivas', 'inicio_sequencia_faltas', 'ultima_aula_contabilizada']
+        )
+    return corrigidas
+
+
+def verificar_faltas(alunos=None):
+    """
+    Verificação completa (rotina noturna): reconcilia os contadores das
+    inscrições com o histórico de presenças e aplica os alertas a partir
+    deles, exatamente como o caminho incremental faz ao salvar a chamada.
+    O resultado de `aplicar_alertas` ganha a chave 'corrigidas'.
+    """
+    corrigidas = reconciliar_contadores(alunos)
+    alunos_ids = alunos if alunos is not None else Inscricao.objects.filter(status='matriculado').values('aluno')
+    resultado = aplicar_alertas(sequencias_das_inscricoes(alunos_ids))
+    resultado['corrigidas'] = corrigidas
+    return resultado
+
+
+def atualizar_sequencias_da_aula(registro_aula):
+    """
+    Atualiza a sequência de faltas das inscrições MATRICULADAS que constam na
+    chamada da aula e reavalia os alertas apenas desses alunos.
+    Deve ser chamada depois que as presenças da aula foram gravadas.
+    """
+    data_aula = registro_aula.data_aula
+    if isinstance(data_aula, str):
+        # Aulas atrasadas são criadas com a data ainda em texto (AAAA-MM-DD)
+        data_aula = date.fromisoformat(data_aula)
+
+    presencas = dict(Presenca.objects.filter(registro_aula=registro_aula).values_list('aluno_id', 'presente'))
+    if not presencas:
+        return {'novos': [], 'atualizados': [], 'resolvidos': []}
+
+    inscricoes = list(Inscricao.objects.filter(
+        turma_id=registro_aula.turma_id, status='matriculado', aluno_id__in=presencas
+    ))
+    recalcular = []
+    for inscricao in inscricoes:
+        ultima = inscricao.ultima_aula_contabilizada
+        if ultima is None or data_aula <= ultima:
+            recalcular.append(inscricao)
+        elif presencas[inscricao.aluno_id]:
+            inscricao.faltas_consecutivas = 0
+            inscricao.inicio_sequencia_faltas = None
+            inscricao.ultima_aula_contabilizada = data_aula
+        else:
+            inscricao.faltas_consecutivas += 1
+            inscricao.inicio_sequencia_faltas = inscricao.inicio_sequencia_faltas or data_aula
+            inscricao.ultima_aula_contabilizada = data_aula
+
+    if recalcular:
+        # Contador ainda não inicializado ou aula antiga editada: refaz pelo histórico da turma
+        sequencias = sequencias_de_faltas(
+            alunos=[i.aluno_id for i in recalcular], turmas=[registro_aula.turma_id], janela_dias=None
+        )
+        for inscricao in recalcular:
+            sequencia = sequencias.get((inscricao.aluno_id, inscricao.turma_id))
+            inscricao.faltas_consecutivas = sequencia['faltas'] if sequencia else 0
+            inscricao.inicio_sequencia_faltas = sequencia['inicio'] if sequencia else None
+            inscricao.ultima_aula_contabilizada = sequencia['ultima_aula'] if sequencia else None
+
+    Inscricao.objects.bulk_update(
+        inscricoes, ['faltas_consecutivas', 'inicio_sequencia_faltas', 'ultima_aula_contabilizada']
+    )
+
+    # O alerta é por aluno: considera os contadores de todas as turmas em que ele está matriculado
+    return aplicar_alertas(sequencias_das_inscricoes([i.aluno_id for i in inscricoes]))
@@ -0,0 +1,221 @@
+# cadastros/faturamento.py
+"""
+Motor de faturamento em lote (mensalidades e parcelas de matrícula).
+
+Em vez de consultar o banco mês a mês para cada contrato, carregamos de uma
+vez as cobranças já existentes dos contratos do lote, calculamos em memória
+os meses que faltam e gravamos tudo com um único `bulk_create` por lote.
+Os contratos do lote ficam travados (SELECT ... FOR UPDATE) enquanto as
+cobranças são montadas e gravadas, então rodadas sobrepostas do cron se
+enfileiram por contrato em vez de gerar (e contar) a mesma cobrança duas
+vezes; a `chave_cobranca` única continua como última garantia.
+
+Cada contrato guarda em `faturado_ate` o último mês já processado; uma rodada
+normal só olha os meses seguintes a essa marca. `reconstruir=True` refaz o
+histórico inteiro e `desde` força o reprocessamento a partir de um mês.
+"""
+import calendar
+from collections import defaultdict
+
+from dateutil.relativedelta import relativedelta
+from django.db import transaction
+from django.db.models import Count, F, Q
+from django.utils import timezone
+
+from .models import Aluno, Contrato, Pagamento
+from .paineis import invalidar_paineis
+from .resumos import atualizar_resumos
+
+TAMANHO_LOTE_PADRAO = 500
+TIPOS_FATURADOS = ['mensalidade', 'matricula']
+
+
+def contratos_vigentes(hoje=None):
+    """
+    Contratos ATIVOS ou TRANCADOS (trancados continuam gerando boleto)
+    dentro do período de vigência.
+    """
+    hoje = hoje or timezone.now().date()
+    criterio_vigencia = Q(data_inicio__lte=hoje) & (Q(data_fim__gte=hoje) | Q(data_fim__isnull=True))
+    criterio_status = Q(ativo=True) | Q(status='trancado')
+    return Contrato.objects.filter(criterio_vigencia & criterio_status)
+
+
+def contratos_a_faturar(hoje=None):
+    """ Contratos vigentes cuja marca d'água ainda não alcançou o mês corrente. """
+    hoje = hoje or timezone.now().date()
+    return contratos_vigentes(hoje).filter(
+        Q(faturado_ate__isnull=True) | Q(faturado_ate__lt=hoje.replace(day=1))
+    )
+
+
+def _status_do_mes(mes, hoje):
+    status = 'pendente'
+    if mes.year < hoje.year:
+        status = 'atrasado'
+    elif mes.month < hoje.month:
+        status = 'atrasado'
+
+    # Histórico anterior a Set/2025 foi migrado como já quitado
+    if mes.year < 2025 or (mes.year == 2025 and mes.month < 9):
+        status = 'pago'
+    return status
+
+
+def _meses_do_contrato(contrato, hoje):
+    """ Percorre os meses de referência do contrato até o mês corrente (inclusive). """
+    mes = contrato.data_inicio
+    while mes.year < hoje.year or (mes.year == hoje.year and mes.month <= hoje.month):
+        yield mes
+        mes += relativedelta(months=1)
+
+
+def _ultimo_dia(mes):
+    return mes.replace(day=calendar.monthrange(mes.year, mes.month)[1])
+
+
+def _inicio_da_janela(contrato, reconstruir, desde):
+    """ Primeiro mês (dia 1) que precisa ser avaliado para o contrato, ou None para todo o histórico. """
+    if reconstruir:
+        return None
+    if desde:
+        return desde
+    if contrato.faturado_ate:
+        return contrato.faturado_ate.replace(day=1) + relativedelta(months=1)
+    return None
+
+
+def montar_cobrancas(contrato, meses_existentes, parcelas_geradas, hoje, a_partir_de=None):
+    """
+    Monta (sem salvar) as cobranças que faltam para um contrato.
+
+    `meses_existentes` é um dict tipo -> conjunto de (ano, mês) já cobrados;
+    `parcelas_geradas` é o total de parcelas de matrícula já existentes;
+    `a_partir_de` ignora os meses anteriores (já cobertos pela marca d'água).
+    """
+    novas = []
+    mensalidades = meses_existentes.get('mensalidade', set())
+    matriculas = meses_existentes.get('matricula', set())
+    cobra_matricula = contrato.valor_matricula > 0 and contrato.parcelas_matricula > 0
+
+    for mes in _meses_do_contrato(contrato, hoje):
+        if a_partir_de and (mes.year, mes.month) < (a_partir_de.year, a_partir_de.month):
+            continue
+
+        chave_mes = (mes.year, mes.month)
+        status = _status_do_mes(mes, hoje)
+        data_venc = _ultimo_dia(mes)
+        pago = status == 'pago'
+
+        if chave_mes not in mensalidades:
+            novas.append(Pagamento(
+                aluno_id=contrato.aluno_id, contrato=contrato, tipo='mensalidade',
+                descricao=f"Mensalidade {mes.strftime('%B/%Y')}",
+                valor=contrato.valor_mensalidade, mes_referencia=mes,
+                chave_cobranca=Pagamento.gerar_chave_cobranca(f"c{contrato.pk}", 'mensalidade', mes),
+                data_vencimento=data_venc,
+                status=status,
+                data_pagamento=data_venc if pago else None,
+                valor_pago=contrato.valor_mensalidade if pago else 0,
+            ))
+
+        if cobra_matricula and parcelas_geradas < contrato.parcelas_matricula and chave_mes not in matriculas:
+            valor_parcela = round(contrato.valor_matricula / contrato.parcelas_matricula, 2)
+            novas.append(Pagamento(
+                aluno_id=contrato.aluno_id, contrato=contrato, tipo='matricula',
+                descricao=f"Parcela {parcelas_geradas + 1}/{contrato.parcelas_matricula} Matrícula",
+                valor=valor_parcela, mes_referencia=mes,
+                chave_cobranca=Pagamento.gerar_chave_cobranca(f"c{contrato.pk}", 'matricula', mes, parcelas_geradas + 1),
+                data_vencimento=data_venc,
+                status=status,
+                data_pagamento=data_venc if pago else None,
+                valor_pago=valor_parcela if pago else 0,
+            ))
+            parcelas_geradas += 1
+
+    return novas
+
+
+def _processar_lote(contratos, hoje, reconstruir=False, desde=None):
+    ids = [c.pk for c in contratos]
+
+    with transaction.atomic():
+        # Trava os contratos do lote antes de ler as cobranças existentes: uma
+        # rodada sobreposta espera aqui e, ao continuar, já vê o que esta gravou.
+        # Assim o que é montado abaixo é exatamente o que será inserido, e as
+        # quantidades e créditos derivados dessas linhas não contam em dobro.
+        marcas = dict(
+            Contrato.objects.select_for_update().filter(pk__in=ids).order_by('pk').values_list('pk', 'faturado_ate')
+        )
+        for contrato in contratos:
+            contrato.faturado_ate = marcas.get(contrato.pk)
+        janelas = {c.pk: _inicio_da_janela(c, reconstruir, desde) for c in contratos}
+
+        # Só carregamos as cobranças da janela que será avaliada
+        existentes = Pagamento.objects.filter(contrato_id__in=ids, tipo__in=TIPOS_FATURADOS)
+        if all(janelas.values()):
+            existentes = existentes.filter(mes_referencia__gte=min(janelas.values()))
+
+        meses_existentes = defaultdict(lambda: defaultdict(set))
+        for contrato_id, tipo, mes_referencia in existentes.values_list('contrato_id', 'tipo', 'mes_referencia'):
+            meses_existentes[contrato_id][tipo].add((mes_referencia.year, mes_referencia.month))
+
+        # A numeração das parcelas de matrícula depende do total já gerado, fora da janela também
+        parcelas_matricula = dict(
+            Pagamento.objects.filter(contrato_id__in=ids, tipo='matricula')
+            .values('contrato_id').annotate(total=Count('id')).values_list('contrato_id', 'total')
+        )
+
+        novas = []
+        geradas = {}
+        creditos = defaultdict(int)
+        for contrato in contratos:
+            cobrancas = montar_cobrancas(
+                contrato, meses_existentes[contrato.pk], parcelas_matricula.get(contrato.pk, 0), hoje,
+                a_partir_de=janelas[contrato.pk],
+            )
+            if not cobrancas:
+                continue
+            novas.extend(cobrancas)
+            geradas[contrato] = len(cobrancas)
+
+            # bulk_create não passa pelo Pagamento.save(): replicamos aqui o
+            # acúmulo de crédito de mensalidades pagas em contratos trancados.
+            if contrato.status == 'trancado':
+                creditos[contrato.aluno_id] += sum(
+                    1 for p in cobrancas if p.tipo == 'mensalidade' and p.status == 'pago'
+                )
+
+        if novas:
+            # Com os contratos travados não há conflito esperado; a chave única
+            # continua como garantia contra qualquer outro caminho de gravação.
+            Pagamento.objects.bulk_create(novas, ignore_conflicts=True)
+            for aluno_id, quantidade in creditos.items():
+                if quantidade:
+                    Aluno.objects.filter(pk=aluno_id).update(
+                        creditos_aulas=F('creditos_aulas') + quantidade, atualizado_em=timezone.now()
+                    )
+        # A marca d'água só avança junto com as cobranças do lote. Ela não é
+        # exportada, então não mexe em atualizado_em (sincronização incremental).
+        Contrato.objects.filter(pk__in=ids).update(faturado_ate=hoje.replace(day=1))
+
+    if novas:
+        invalidar_paineis()
+        atualizar_resumos({p.aluno_id for p in novas})
+    return geradas
+
+
+def gerar_cobrancas(contratos=None, hoje=None, tamanho_lote=TAMANHO_LOTE_PADRAO, reconstruir=False, desde=None):
+    """
+    Gera as cobranças que faltam para os contratos informados (por padrão,
+    os vigentes ainda não faturados no mês). Retorna um dict {contrato: quantidade_gerada}.
+    """
+    hoje = hoje or timezone.now().date()
+    if contratos is None:
+        contratos = contratos_vigentes(hoje) if (reconstruir or desde) else contratos_a_faturar(hoje)
+    contratos = list(contratos.select_related('aluno').order_by('pk'))
+
+    geradas = {}
+    for inicio in range(0, len(contratos), tamanho_lote):
+        geradas.update(_processar_lote(contratos[inicio:inicio + tamanho_lote], hoje, reconstruir, desde))
+    return geradas
@@ -0,0 +1,163 @@
+# cadastros/management/commands/benchmark_desempenho.py
+"""
+Mede tempo e quantidade de consultas das principais telas e comandos.
+
+Pensado para rodar sobre a escola sintética (gerar_dados_sinteticos) e
+comparar commits: o resultado é um JSON com, para cada cenário, o tempo
+mínimo/mediano/máximo em ms e o número de consultas SQL da última execução.
+Como grava no banco (comandos de manutenção) e cria um superusuário
+temporário, só roda com DEBUG ligado ou com --confirmar; o usuário é
+removido ao final.
+
+    python manage.py benchmark_desempenho --rotulo antes --saida antes.json
+"""
+import io
+import json
+import statistics
+import subprocess
+import time
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from cadastros.models import Aluno, Contrato, Inscricao, Pagamento, Presenca, RegistroAula, Turma
+
+USUARIO_BENCHMARK = 'sint_benchmark'
+
+
+def _versao_git():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+class Command(BaseCommand):
+    help = 'Cronometra e conta as consultas das principais telas e comandos, com saída em JSON.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repeticoes', type=int, default=3, help='Execuções por cenário (padrão: 3).')
+        parser.add_argument('--rotulo', default='', help='Identificação livre da rodada (ex.: nome do branch).')
+        parser.add_argument('--saida', help='Grava o JSON neste arquivo em vez de exibir na tela.')
+        parser.add_argument('--apenas', nargs='*', default=None, metavar='CENARIO',
+                            help='Executa só os cenários informados.')
+        parser.add_argument('--sem-comandos', action='store_true',
+                            help='Não executa os comandos de manutenção (que gravam no banco).')
+        parser.add_argument('--confirmar', action='store_true', help='Obrigatório quando DEBUG=False (evita rodar em produção).')
+
+    def cenarios(self, incluir_comandos):
+        aluno = Aluno.objects.filter(contratos__isnull=False).order_by('pk').first() or Aluno.objects.order_by('pk').first()
+        turma = Turma.objects.order_by('pk').first()
+        paginas = {
+            'dashboard_admin': reverse('cadastros:dashboard_admin'),
+            'lista_alunos': reverse('cadastros:lista_alunos'),
+            'lista_alunos_trancados': reverse('cadastros:lista_alunos_trancados'),
+            'dashboard_saude': reverse('cadastros:dashboard_saude'),
+            'dashboard_feedback': reverse('cadastros:dashboard_feedback'),
+            'relatorio_professores': reverse('cadastros:relatorio_professores'),
+            'exportar_contratos_csv': reverse('cadastros:exportar_contratos_csv'),
+            'exportar_pagamentos_csv': reverse('cadastros:exportar_pagamentos_csv'),
+            'exportar_acompanhamentos_csv': reverse('cadastros:exportar_acompanhamentos_csv'),
+            'exportar_registros_aula_por_turma_zip': reverse('cadastros:exportar_registros_aula_por_turma_zip'),
+        }
+        # Painéis carregados sob demanda pelas páginas acima (primeira página de cada)
+        for painel in ('pendentes', 'recebidos', 'rodizio', 'alunos'):
+            paginas[f'painel_{painel}'] = reverse('cadastros:painel_dados', args=[painel])
+        if aluno:
+            paginas['perfil_aluno'] = reverse('cadastros:perfil_aluno', args=[aluno.pk])
+        if turma:
+            paginas['detalhe_turma'] = reverse('cadastros:detalhe_turma', args=[turma.pk])
+
+        cenarios = {nome: ('pagina', url) for nome, url in paginas.items()}
+        if incluir_comandos:
+            cenarios.update({
+                'cmd_gerar_cobrancas': ('comando', ['gerar_cobrancas']),
+                'cmd_gerar_cobrancas_rebuild': ('comando', ['gerar_cobrancas', '--rebuild']),
+                'cmd_verificar_faltas': ('comando', ['verificar_faltas']),
+            })
+        return cenarios
+
+    def handle(self, *args, **options):
+        if not settings.DEBUG and not options['confirmar']:
+            raise CommandError('DEBUG está desligado. Use --confirmar se realmente quer rodar o benchmark neste banco.')
+        if options['repeticoes'] < 1:
+            raise CommandError('--repeticoes precisa ser maior que zero.')
+
+        cenarios = self.cenarios(not options['sem_comandos'])
+        if options['apenas']:
+            desconhecidos = set(options['apenas']) - set(cenarios)
+            if desconhecidos:
+                raise CommandError(f'Cenários desconhecidos: {", ".join(sorted(desconhecidos))}. Disponíveis: {", ".join(cenarios)}')
+            cenarios = {nome: cenarios[nome] for nome in options['apenas']}
+
+        usuario, _ = User.objects.get_or_create(username=USUARIO_BENCHMARK, defaults={'is_staff': True, 'is_superuser': True})
+        cliente = Client()
+        try:
+            cliente.force_login(usuario)
+            resultados = self.medir(cliente, cenarios, options['repeticoes'])
+        finally:
+            # O superusuário só existe durante a medição; o logout apaga a sessão dele
+            cliente.logout()
+            User.objects.filter(username=USUARIO_BENCHMARK).delete()
+
+        relatorio = {
+            'rotulo': options['rotulo'],
+            'commit': _versao_git(),
+            'data': timezone.now().isoformat(),
+            'banco': connection.vendor,
+            'repeticoes': options['repeticoes'],
+            'volume': {
+                modelo.__name__: modelo.objects.count()
+                for modelo in (Aluno, Turma, Inscricao, RegistroAula, Presenca, Contrato, Pagamento)
+            },
+            'cenarios': resultados,
+        }
+        saida = json.dumps(relatorio, ensure_ascii=False, indent=2)
+        if options['saida']:
+            with open(options['saida'], 'w', encoding='utf-8') as arquivo:
+                arquivo.write(saida)
+            self.stdout.write(self.style.SUCCESS(f'Resultado gravado em {options["saida"]}.'))
+        else:
+            self.stdout.write(saida)
+
+    def medir(self, cliente, cenarios, repeticoes):
+        resultados = {}
+        for nome, (tipo, alvo) in cenarios.items():
+            self.stderr.write(f'  {nome}...', ending='')
+            tempos = []
+            for _ in range(repeticoes):
+                with CaptureQueriesContext(connection) as consultas:
+                    inicio = time.perf_counter()
+                    status = self.executar(cliente, tipo, alvo)
+                    tempos.append((time.perf_counter() - inicio) * 1000)
+            resultados[nome] = {
+                'tipo': tipo,
+                'alvo': alvo,
+                'status': status,
+                'consultas': len(consultas.captured_queries),
+                'ms_min': round(min(tempos), 2),
+                'ms_mediana': round(statistics.median(tempos), 2),
+                'ms_max': round(max(tempos), 2),
+            }
+            self.stderr.write(f' {resultados[nome]["ms_mediana"]} ms, {resultados[nome]["consultas"]} consultas')
+        return resultados
+
+    def executar(self, cliente, tipo, alvo):
+        if tipo == 'comando':
+            call_command(*alvo, stdout=io.StringIO(), stderr=io.StringIO())
+            return 'ok'
+        response = cliente.get(alvo)
+        # Respostas em streaming só são geradas quando consumidas
+        if getattr(response, 'streaming', False):
+            for _ in response.streaming_content:
+                pass
+        return response.status_code
@@ -1,91 +1,59 @@
 # cadastros/management/commands/gerar_cobrancas.py
 
-from django.core.management.base import BaseCommand
-from cadastros.models import Contrato, Pagamento
-from django.utils import timezone
-from dateutil.relativedelta import relativedelta
-from django.db.models import Q # <--- Importante para o filtro OU
-import calendar
-
-class Command(BaseCommand):
-    help = 'Gera as cobranças de mensalidade e matrícula para contratos ativos e trancados.'
-
-    def handle(self, *args, **options):
-        hoje = timezone.now().date()
-        
-        # --- ALTERAÇÃO PRINCIPAL AQUI ---
-        # Buscamos contratos que estão marcados como ATIVOS no sistema
-        # OU que estão com status 'trancado' (pois eles continuam gerando boleto)
-        # Filtramos também pela data de vigência para não gerar boleto de contrato vencido
-        
-        criterio_vigencia = Q(data_inicio__lte=hoje) & (Q(data_fim__gte=hoje) | Q(data_fim__isnull=True))
-        criterio_status = Q(ativo=True) | Q(status='trancado')
-
-        contratos_para_processar = Contrato.objects.filter(criterio_vigencia & criterio_status)
-        
-        self.stdout.write(self.style.SUCCESS(f'Encontrados {len(contratos_para_processar)} contratos vigentes (Ativos ou Trancados).'))
+from datetime import datetime
 
-        for contrato in contratos_para_processar:
-            # ... (O restante do seu código permanece IDÊNTICO, pois a lógica de gerar é a mesma) ...
-            self.stdout.write(f"\nVerificando contrato de {contrato.aluno.nome_completo}...")
-            
-            data_iteradora = contrato.data_inicio
-            while data_iteradora.year < hoje.year or (data_iteradora.year == hoje.year and data_iteradora.month <= hoje.month):
-                
-                mes_corrente_loop = data_iteradora
-                
-                # --- LÓGICA DE STATUS (Mantida) ---
-                status_pagamento = 'pendente'
-                if mes_corrente_loop.year < hoje.year:
-                    status_pagamento = 'atrasado'
-                elif mes_corrente_loop.month < hoje.month:
-                    status_pagamento = 'atrasado'
-
-                if mes_corrente_loop.year < 2025 or (mes_corrente_loop.year == 2025 and mes_corrente_loop.month < 9):
-                    status_pagamento = 'pago'
-                
-                # --- LÓGICA DA MENSALIDADE ---
-                mensalidade_existente = Pagamento.objects.filter(contrato=contrato, tipo='mensalidade', mes_referencia__year=mes_corrente_loop.year, mes_referencia__month=mes_corrente_loop.month).exists()
-
-                if not mensalidade_existente:
-                    ultimo_dia = calendar.monthrange(mes_corrente_loop.year, mes_corrente_loop.month)[1]
-                    data_venc = mes_corrente_loop.replace(day=ultimo_dia)
-                    
-                    data_pgto = data_venc if status_pagamento == 'pago' else None
-                    
-                    Pagamento.objects.create(
-                        aluno=contrato.aluno, contrato=contrato, tipo='mensalidade',
-                        descricao=f"Mensalidade {mes_corrente_loop.strftime('%B/%Y')}",
-                        valor=contrato.valor_mensalidade, mes_referencia=mes_corrente_loop,
-                        data_vencimento=data_venc, 
-                        status=status_pagamento,
-                        data_pagamento=data_pgto,
-                        valor_pago=contrato.valor_mensalidade if status_pagamento == 'pago' else 0
-                    )
-                    self.stdout.write(f'  -> Mensalidade de {mes_corrente_loop.strftime("%m/%Y")} gerada.')
+from django.core.management.base import CommandError
+from django.utils import timezone
+from cadastros.faturamento import contratos_vigentes, contratos_a_faturar, gerar_cobrancas, TAMANHO_LOTE_PADRAO
+from cadastros.management.lotes import ComandoEmLotes
 
-                # --- LÓGICA DA MATRÍCULA (Mantida) ---
-                if contrato.valor_matricula > 0 and contrato.parcelas_matricula > 0:
-                    parcelas_geradas = Pagamento.objects.filter(contrato=contrato, tipo='matricula').count()
-                    if parcelas_geradas < contrato.parcelas_matricula:
-                        parcela_existente_mes = Pagamento.objects.filter(contrato=contrato, tipo='matricula', mes_referencia__year=mes_corrente_loop.year, mes_referencia__month=mes_corrente_loop.month).exists()
-                        if not parcela_existente_mes:
-                            ultimo_dia = calendar.monthrange(mes_corrente_loop.year, mes_corrente_loop.month)[1]
-                            data_venc = mes_corrente_loop.replace(day=ultimo_dia)
-                            valor_parcela = round(contrato.valor_matricula / contrato.parcelas_matricula, 2)
-                            data_pgto_mat = data_venc if status_pagamento == 'pago' else None
 
-                            Pagamento.objects.create(
-                                aluno=contrato.aluno, contrato=contrato, tipo='matricula',
-                                descricao=f"Parcela {parcelas_geradas + 1}/{contrato.parcelas_matricula} Matrícula",
-                                valor=valor_parcela, mes_referencia=mes_corrente_loop,
-                                data_vencimento=data_venc,
-                                status=status_pagamento,
-                                data_pagamento=data_pgto_mat,
-                                valor_pago=valor_parcela if status_pagamento == 'pago' else 0
-                            )
-                            self.stdout.write(f'  -> Parcela de matrícula gerada.')
+def _mes(valor):
+    try:
+        return datetime.strptime(valor, '%Y-%m').date()
+    except ValueError:
+        raise CommandError(f'Mês inválido "{valor}". Use o formato AAAA-MM.')
 
-                data_iteradora += relativedelta(months=1)
 
-        self.stdout.write(self.style.SUCCESS('\nCobranças geradas com sucesso.'))
\ No newline at end of file
+class Command(ComandoEmLotes):
+    help = 'Gera as cobranças de mensalidade e matrícula para contratos ativos e trancados.'
+    tamanho_bloco_padrao = TAMANHO_LOTE_PADRAO
+
+    def add_arguments(self, parser):
+        super().add_arguments(parser)
+        parser.add_argument('--rebuild', action='store_true',
+                            help='Ignora a marca d\'água e reavalia todo o histórico de cada contrato.')
+        parser.add_argument('--since', type=_mes, metavar='AAAA-MM',
+                            help='Reavalia os contratos vigentes a partir deste mês, ignorando a marca d\'água.')
+
+    def preparar(self, opcoes):
+        # Todos os blocos (e workers) faturam com a mesma data de referência
+        opcoes['hoje'] = timezone.now().date()
+
+    def get_queryset(self, opcoes):
+        # Contratos marcados como ATIVOS ou com status 'trancado' (continuam
+        # gerando boleto), sempre dentro do período de vigência. Sem --rebuild
+        # ou --since, só entram os que ainda não foram faturados neste mês.
+        if opcoes['rebuild'] or opcoes['since']:
+            return contratos_vigentes(opcoes['hoje'])
+        return contratos_a_faturar(opcoes['hoje'])
+
+    def processar_lote(self, queryset, opcoes):
+        geradas = gerar_cobrancas(
+            queryset, hoje=opcoes['hoje'], tamanho_lote=opcoes['chunk_size'],
+            reconstruir=opcoes['rebuild'], desde=opcoes['since'],
+        )
+        return {
+            'cobrancas_geradas': sum(geradas.values()),
+            'contratos_faturados': len(geradas),
+            'detalhes': [
+                f"  -> {contrato.aluno.nome_completo} (contrato #{contrato.pk}): {quantidade} cobrança(s) gerada(s)."
+                for contrato, quantidade in geradas.items()
+            ],
+        }
+
+    def exibir_resumo(self, execucao, resumo):
+        self.stdout.write(self.style.SUCCESS(
+            f'Cobranças geradas com sucesso: {resumo["cobrancas_geradas"]} nova(s) '
+            f'em {resumo["contratos_faturados"]} contrato(s) de {execucao.processados} avaliado(s).'
+        ))
@@ -0,0 +1,350 @@
+# cadastros/management/commands/gerar_dados_sinteticos.py
+"""
+Gera uma escola sintética para medir desempenho (ver benchmark_desempenho).
+
+Todos os registros gerados são marcados (turmas e provas com o prefixo
+"[SINT]", e-mails em @sintetico.invalid, usuários com o prefixo "sint_"),
+então `--limpar` remove exatamente o que foi gerado. A gravação usa
+bulk_create, portanto os signals e os save() dos modelos não rodam (campos
+derivados, como telefone_normalizado, são preenchidos aqui); as
+cobranças são geradas pelo próprio motor de faturamento. Como o MySQL não
+devolve os ids do bulk_create, cada etapa relê o que acabou de gravar.
+"""
+import random
+from datetime import time, timedelta
+from decimal import Decimal
+
+from dateutil.relativedelta import relativedelta
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+
+from cadastros.exclusoes import em_lote
+from cadastros.faturamento import gerar_cobrancas
+from cadastros.models import (
+    AcompanhamentoFalta, AcompanhamentoPedagogico, Aluno, AlunoProva, AlunoResumo, AvaliacaoProfessor, Contrato,
+    Despesa, FollowUp, HorarioAula, Inscricao, Lead, Pagamento, PesquisaSatisfacao, Presenca, Professor,
+    ProvaTemplate, Questao, RegistroAula, RespostaAluno, Turma,
+)
+from cadastros.resumos import atualizar_resumos_em_blocos
+from cadastros.utils import normalizar_telefone
+
+PREFIXO = '[SINT]'
+DOMINIO = 'sintetico.invalid'
+PREFIXO_USUARIO = 'sint_'
+
+NOMES = ['Ana', 'Bruno', 'Carla', 'Daniel', 'Eduarda', 'Felipe', 'Gabriela', 'Henrique', 'Isabela', 'João',
+         'Karina', 'Lucas', 'Mariana', 'Nicolas', 'Olívia', 'Pedro', 'Rafaela', 'Samuel', 'Tatiana', 'Vinícius']
+SOBRENOMES = ['Silva', 'Santos', 'Oliveira', 'Souza', 'Lima', 'Pereira', 'Costa', 'Rodrigues', 'Almeida',
+              'Nascimento', 'Carvalho', 'Ribeiro', 'Gomes', 'Martins', 'Araújo', 'Barbosa']
+
+
+class Command(BaseCommand):
+    help = 'Gera uma escola sintética (alunos, turmas, aulas, contratos, leads, provas e pesquisas) para benchmarks.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--alunos', type=int, default=200, help='Quantidade de alunos (padrão: 200).')
+        parser.add_argument('--alunos-por-turma', type=int, default=8, help='Tamanho médio das turmas (padrão: 8).')
+        parser.add_argument('--anos', type=int, default=2, help='Anos de histórico de aulas e cobranças (padrão: 2).')
+        parser.add_argument('--leads', type=int, default=None, help='Quantidade de leads (padrão: metade dos alunos).')
+        parser.add_argument('--seed', type=int, default=42, help='Semente do gerador aleatório, para resultados reproduzíveis.')
+        parser.add_argument('--limpar', action='store_true', help='Apenas remove os dados sintéticos gerados anteriormente.')
+        parser.add_argument('--confirmar', action='store_true', help='Obrigatório quando DEBUG=False (evita poluir produção).')
+
+    def handle(self, *args, **options):
+        if not settings.DEBUG and not options['confirmar']:
+            raise CommandError('DEBUG está desligado. Use --confirmar se realmente quer gerar dados sintéticos neste banco.')
+
+        self.limpar()
+        if options['limpar']:
+            self.stdout.write(self.style.SUCCESS('Dados sintéticos removidos.'))
+            return
+
+        if options['alunos'] < 1 or options['alunos_por_turma'] < 1 or options['anos'] < 1:
+            raise CommandError('--alunos, --alunos-por-turma e --anos precisam ser maiores que zero.')
+
+        self.rnd = random.Random(options['seed'])
+        self.hoje = timezone.now().date()
+        self.inicio = self.hoje - relativedelta(years=options['anos'])
+        n_leads = options['leads'] if options['leads'] is not None else options['alunos'] // 2
+
+        with transaction.atomic():
+            professores = self.gerar_professores(max(3, options['alunos'] // (options['alunos_por_turma'] * 3)))
+            turmas = self.gerar_turmas(max(1, options['alunos'] // options['alunos_por_turma']))
+            alunos = self.gerar_alunos(options['alunos'])
+            self.gerar_inscricoes(alunos, turmas)
+            self.gerar_aulas(turmas, professores)
+            self.gerar_contratos(alunos)
+            self.gerar_leads(n_leads)
+            self.gerar_provas(alunos, professores)
+            self.gerar_pesquisas(alunos, professores)
+            self.gerar_acompanhamentos(alunos, professores)
+            self.gerar_despesas(options['anos'])
+            # O bulk_create não dispara os signals que mantêm a projeção usada pela lista de alunos
+            atualizar_resumos_em_blocos(Aluno.objects.filter(email__endswith=f'@{DOMINIO}'), hoje=self.hoje)
+
+        self.stdout.write(self.style.SUCCESS('Escola sintética gerada:'))
+        for modelo in (Aluno, AlunoResumo, Turma, Inscricao, RegistroAula, Presenca, Contrato, Pagamento, Lead, FollowUp,
+                       AlunoProva, RespostaAluno, PesquisaSatisfacao):
+            self.stdout.write(f'  {modelo.__name__}: {modelo.objects.count()}')
+
+    # ------------------------------------------------------------------
+    # Limpeza
+    # ------------------------------------------------------------------
+    def limpar(self):
+        with transaction.atomic(), em_lote():
+            alunos = Aluno.objects.filter(email__endswith=f'@{DOMINIO}')
+            # Pagamento protege o aluno (on_delete=PROTECT): sai primeiro
+            Pagamento.objects.filter(aluno__in=alunos).delete()
+            AlunoProva.objects.filter(aluno__in=alunos).delete()
+            alunos.delete()
+            Turma.objects.filter(nome__startswith=PREFIXO).delete()
+            ProvaTemplate.objects.filter(titulo__startswith=PREFIXO).delete()
+            Lead.objects.filter(email__endswith=f'@{DOMINIO}').delete()
+            Despesa.objects.filter(descricao__startswith=PREFIXO).delete()
+            User.objects.filter(username__startswith=PREFIXO_USUARIO).delete()
+
+    # ------------------------------------------------------------------
+    # Geradores
+    # ------------------------------------------------------------------
+    def nome(self):
+        return f'{self.rnd.choice(NOMES)} {self.rnd.choice(SOBRENOMES)} {self.rnd.choice(SOBRENOMES)}'
+
+    def telefone(self):
+        return f'(11) 9{self.rnd.randint(1000, 9999)}-{self.rnd.randint(1000, 9999)}'
+
+    def data_aleatoria(self, inicio, fim):
+        return inicio + timedelta(days=self.rnd.randint(0, max(0, (fim - inicio).days)))
+
+    def gerar_professores(self, quantidade):
+        professores = []
+        for i in range(quantidade):
+            usuario = User.objects.create_user(username=f'{PREFIXO_USUARIO}prof_{i}', password=None)
+            professores.append(Professor.objects.create(
+                usuario=usuario, nome_completo=f'{PREFIXO} {self.nome()}',
+                eh_teacher=True, eh_pedagogico=(i == 0), eh_administrativo=(i == 1),
+            ))
+        return professores
+
+    def gerar_turmas(self, quantidade):
+        Turma.objects.bulk_create([
+            Turma(nome=f'{PREFIXO} Turma {i + 1:03d}', stage=self.rnd.randint(1, 12)) for i in range(quantidade)
+        ])
+        turmas = list(Turma.objects.filter(nome__startswith=PREFIXO).order_by('pk'))
+        horarios = []
+        for turma in turmas:
+            dias = self.rnd.sample(range(5), 2)
+            hora = self.rnd.choice([8, 10, 14, 16, 18, 19, 20])
+            for dia in dias:
+                horarios.append(HorarioAula(turma=turma, dia_semana=dia, horario_inicio=time(hora), horario_fim=time(hora + 1)))
+        HorarioAula.objects.bulk_create(horarios)
+        return turmas
+
+    def gerar_alunos(self, quantidade):
+        status = ['ativo'] * 8 + ['inativo', 'trancado']
+        Aluno.objects.bulk_create([
+            Aluno(
+                nome_completo=self.nome(),
+                email=f'aluno{i}@{DOMINIO}',
+                telefone=(telefone := self.telefone()), telefone_normalizado=normalizar_telefone(telefone),
+                cidade='São Paulo', estado='SP',
+                data_nascimento=self.data_aleatoria(self.hoje - relativedelta(years=60), self.hoje - relativedelta(years=12)),
+                status=self.rnd.choice(status),
+            )
+            for i in range(quantidade)
+        ], batch_size=1000)
+        return list(Aluno.objects.filter(email__endswith=f'@{DOMINIO}').order_by('pk'))
+
+    def gerar_inscricoes(self, alunos, turmas):
+        mapa_status = {'ativo': 'matriculado', 'inativo': 'desistiu', 'trancado': 'trancado'}
+        inscricoes = []
+        for aluno in alunos:
+            escolhidas = self.rnd.sample(turmas, 2 if len(turmas) > 1 and self.rnd.random() < 0.1 else 1)
+            for turma in escolhidas:
+                status = mapa_status[aluno.status]
+                if status == 'matriculado' and self.rnd.random() < 0.05:
+                    status = self.rnd.choice(['experimental', 'acompanhando'])
+                inscricoes.append(Inscricao(aluno=aluno, turma=turma, status=status))
+        Inscricao.objects.bulk_create(inscricoes, batch_size=1000)
+
+    def gerar_aulas(self, turmas, professores):
+        alunos_por_turma = {}
+        for aluno_id, turma_id in Inscricao.objects.filter(
+            turma__in=turmas, status__in=['matriculado', 'experimental', 'acompanhando']
+        ).values_list('aluno_id', 'turma_id'):
+            alunos_por_turma.setdefault(turma_id, []).append(aluno_id)
+        dias_por_turma = {}
+        for turma_id, dia in HorarioAula.objects.filter(turma__in=turmas).values_list('turma_id', 'dia_semana'):
+            dias_por_turma.setdefault(turma_id, set()).add(dia)
+
+        for turma in turmas:
+            professor = self.rnd.choice(professores)
+            registros = []
+            dia = self.inicio
+            while dia <= self.hoje:
+                if dia.weekday() in dias_por_turma.get(turma.pk, ()) and self.rnd.random() < 0.95:
+                    registros.append(RegistroAula(
+                        turma=turma, data_aula=dia, professor=professor,
+                        last_parag=self.rnd.randint(1, 400), last_word=f'word{self.rnd.randint(1, 999)}',
+                        new_dictation=str(self.rnd.randint(1, 80)), new_reading=str(self.rnd.randint(1, 80)),
+                    ))
+                dia += timedelta(days=1)
+            RegistroAula.objects.bulk_create(registros, batch_size=1000)
+            registros = list(RegistroAula.objects.filter(turma=turma).only('pk'))
+
+            # Cada aluno tem a própria assiduidade, para gerar sequências de faltas realistas
+            assiduidade = {aluno_id: self.rnd.uniform(0.55, 0.98) for aluno_id in alunos_por_turma.get(turma.pk, [])}
+            Presenca.objects.bulk_create([
+                Presenca(registro_aula=registro, aluno_id=aluno_id, presente=self.rnd.random() < taxa)
+                for registro in registros
+                for aluno_id, taxa in assiduidade.items()
+            ], batch_size=2000)
+
+    def gerar_contratos(self, alunos):
+        contratos = []
+        for aluno in alunos:
+            plano = self.rnd.choice(['anual', 'anual', 'semestral', 'flex'])
+            data_inicio = self.data_aleatoria(self.inicio, self.hoje - timedelta(days=20))
+            data_fim = None
+            if plano == 'anual':
+                data_fim = data_inicio + relativedelta(years=1)
+            elif plano == 'semestral':
+                data_fim = data_inicio + relativedelta(months=6)
+            status = {'ativo': 'ativo', 'trancado': 'trancado', 'inativo': 'cancelado'}[aluno.status]
+            contratos.append(Contrato(
+                aluno=aluno, plano=plano, data_inicio=data_inicio, data_fim=data_fim,
+                data_cancelamento=self.data_aleatoria(data_inicio, self.hoje) if status == 'cancelado' else None,
+                valor_mensalidade=Decimal(self.rnd.choice([280, 320, 350, 390, 420])),
+                valor_matricula=Decimal(self.rnd.choice([0, 150, 300])),
+                parcelas_matricula=self.rnd.choice([1, 2, 3]),
+                ativo=(status == 'ativo'), status=status,
+            ))
+        Contrato.objects.bulk_create(contratos, batch_size=1000)
+        contratos = Contrato.objects.filter(aluno__email__endswith=f'@{DOMINIO}')
+
+        # O histórico de cobranças vem do próprio motor de faturamento
+        gerar_cobrancas(contratos, hoje=self.hoje, reconstruir=True)
+
+        # Quita a maior parte das cobranças vencidas, deixando alguma inadimplência
+        vencidas = list(Pagamento.objects.filter(
+            contrato__in=contratos, status__in=['pendente', 'atrasado'], data_vencimento__lt=self.hoje
+        ))
+        quitadas = []
+        for pagamento in vencidas:
+            if self.rnd.random() < 0.9:
+                pagamento.status = 'pago'
+                pagamento.valor_pago = pagamento.valor
+                pagamento.data_pagamento = pagamento.data_vencimento - timedelta(days=self.rnd.randint(0, 5))
+                quitadas.append(pagamento)
+        Pagamento.objects.bulk_update(quitadas, ['status', 'valor_pago', 'data_pagamento'], batch_size=1000)
+
+    def gerar_leads(self, quantidade):
+        status = [s for s, _ in Lead.STATUS_CHOICES]
+        fontes = [f for f, _ in Lead.FONTE_CHOICES]
+        Lead.objects.bulk_create([
+            Lead(
+                nome_completo=self.nome(), email=f'lead{i}@{DOMINIO}',
+                telefone=(telefone := self.telefone()), telefone_normalizado=normalizar_telefone(telefone),
+                status=self.rnd.choice(status), fonte_contato=self.rnd.choice(fontes),
+                stage_interesse=self.rnd.randint(1, 12),
+            )
+            for i in range(quantidade)
+        ], batch_size=1000)
+        leads = Lead.objects.filter(email__endswith=f'@{DOMINIO}')
+        tipos = [t for t, _ in FollowUp.TIPO_CHOICES]
+        FollowUp.objects.bulk_create([
+            FollowUp(lead=lead, tipo_contato=self.rnd.choice(tipos), anotacoes='Contato de acompanhamento.',
+                     lead_respondeu=self.rnd.random() < 0.6)
+            for lead in leads
+            for _ in range(self.rnd.randint(0, 4))
+        ], batch_size=1000)
+
+    def gerar_provas(self, alunos, professores):
+        templates = []
+        for stage in range(1, 13, 3):
+            template = ProvaTemplate.objects.create(titulo=f'{PREFIXO} Prova Stage {stage}', stage_referencia=stage, pontos_para_aprovar=7)
+            Questao.objects.bulk_create([
+                Questao(
+                    prova_template=template, ordem=ordem, tipo_questao='multiple_choice', enunciado=f'Questão {ordem}',
+                    pontos=2, dados_questao={'opcoes': {'a': 'A', 'b': 'B', 'c': 'C'}, 'resposta_correta': 'b'},
+                )
+                for ordem in range(1, 6)
+            ])
+            templates.append(template)
+        questoes = {t.pk: list(t.questoes.all()) for t in templates}
+
+        AlunoProva.objects.bulk_create([
+            AlunoProva(
+                aluno=aluno, prova_template=template, status='finalizada',
+                data_realizacao=self.data_aleatoria(self.inicio, self.hoje), corrigido_por=self.rnd.choice(professores),
+                pontuacao_total=Decimal(10),
+            )
+            for aluno in alunos if self.rnd.random() < 0.5
+            for template in [self.rnd.choice(templates)]
+        ], batch_size=1000)
+        provas = list(AlunoProva.objects.filter(prova_template__in=templates))
+
+        respostas = []
+        for prova in provas:
+            nota = Decimal(0)
+            for questao in questoes[prova.prova_template_id]:
+                opcao = self.rnd.choice(['a', 'b', 'b', 'b', 'c'])
+                pontos = Decimal(questao.pontos if opcao == 'b' else 0)
+                nota += pontos
+                respostas.append(RespostaAluno(aluno_prova=prova, questao=questao, resposta_opcao=opcao,
+                                               pontos_obtidos=pontos, corrigido=True))
+            prova.nota_final = nota
+        RespostaAluno.objects.bulk_create(respostas, batch_size=2000)
+        AlunoProva.objects.bulk_update(provas, ['nota_final'], batch_size=1000)
+
+    def gerar_pesquisas(self, alunos, professores):
+        PesquisaSatisfacao.objects.bulk_create([
+            PesquisaSatisfacao(
+                aluno=aluno, email_confirmado=aluno.email, nps_score=self.rnd.choice([6, 7, 8, 9, 9, 10, 10, 10]),
+                faixa_etaria=self.rnd.choice([f for f, _ in PesquisaSatisfacao.FAIXA_ETARIA_CHOICES]),
+                como_conheceu=self.rnd.choice([c for c, _ in PesquisaSatisfacao.COMO_CONHECEU_CHOICES]),
+            )
+            for aluno in alunos if self.rnd.random() < 0.3
+        ], batch_size=1000)
+        pesquisas = PesquisaSatisfacao.objects.filter(aluno__email__endswith=f'@{DOMINIO}')
+        AvaliacaoProfessor.objects.bulk_create([
+            AvaliacaoProfessor(
+                pesquisa=pesquisa, professor=self.rnd.choice(professores),
+                satisfacao_aulas=self.rnd.randint(3, 5), incentivo_teacher=self.rnd.randint(3, 5),
+                seguranca_conforto=self.rnd.randint(3, 5), esforco_conteudo=self.rnd.randint(3, 5),
+            )
+            for pesquisa in pesquisas
+        ], batch_size=1000)
+
+    def gerar_acompanhamentos(self, alunos, professores):
+        AcompanhamentoPedagogico.objects.bulk_create([
+            AcompanhamentoPedagogico(
+                aluno=aluno, status=self.rnd.choice(['agendado', 'realizado', 'realizado']),
+                data=timezone.now() - timedelta(days=self.rnd.randint(-15, 300)),
+                stage_no_momento=self.rnd.randint(1, 12), criado_por=professores[0],
+            )
+            for aluno in alunos if self.rnd.random() < 0.4
+        ], batch_size=1000)
+        AcompanhamentoFalta.objects.bulk_create([
+            AcompanhamentoFalta(aluno=aluno, data_inicio_sequencia=self.hoje - timedelta(days=self.rnd.randint(7, 60)),
+                                numero_de_faltas=self.rnd.randint(3, 6), status=self.rnd.choice(['pendente', 'resolvido']))
+            for aluno in alunos if self.rnd.random() < 0.1
+        ], batch_size=1000)
+
+    def gerar_despesas(self, anos):
+        categorias = [c for c, _ in Despesa.CATEGORIA_CHOICES]
+        despesas = []
+        mes = self.inicio.replace(day=1)
+        while mes <= self.hoje:
+            for categoria in categorias:
+                vencimento = mes + timedelta(days=9)
+                pago = vencimento < self.hoje
+                despesas.append(Despesa(
+                    descricao=f'{PREFIXO} {categoria.replace("_", " ").title()}', categoria=categoria,
+                    valor=Decimal(self.rnd.randint(200, 5000)), data_vencimento=vencimento,
+                    pago=pago, data_pagamento=vencimento if pago else None,
+                ))
+            mes += relativedelta(months=1)
+        Despesa.objects.bulk_create(despesas)
@@ -0,0 +1,69 @@
+# cadastros/management/commands/gerar_snapshots.py
+"""
+Consolida os meses encerrados em SnapshotMensal. Pensado para a rotina
+noturna: sem argumentos, grava apenas os meses que ainda não têm snapshot
+(na prática, o mês que acabou de virar).
+
+    python manage.py gerar_snapshots
+    python manage.py gerar_snapshots --desde 2025-01 --recalcular
+"""
+from datetime import datetime, timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Min
+from django.utils import timezone
+
+from cadastros.metricas import fechar_meses, janelas_mensais
+from cadastros.models import Aluno, Despesa, Pagamento, SnapshotMensal
+
+
+def _mes(valor):
+    try:
+        return datetime.strptime(valor, '%Y-%m').date()
+    except ValueError:
+        raise CommandError(f'Mês inválido "{valor}". Use o formato AAAA-MM.')
+
+
+def _primeiro_mes_com_dados():
+    datas = [
+        Aluno.objects.aggregate(data=Min('data_matricula'))['data'],
+        Pagamento.objects.aggregate(data=Min('data_vencimento'))['data'],
+        Despesa.objects.aggregate(data=Min('data_pagamento'))['data'],
+    ]
+    datas = [data for data in datas if data]
+    return min(datas).replace(day=1) if datas else None
+
+
+class Command(BaseCommand):
+    help = 'Grava os snapshots financeiros dos meses encerrados (SnapshotMensal).'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--desde', type=_mes, metavar='AAAA-MM',
+                            help='Primeiro mês a consolidar (padrão: o mês mais antigo com dados).')
+        parser.add_argument('--recalcular', action='store_true',
+                            help='Regrava também os meses que já têm snapshot.')
+
+    def handle(self, *args, **options):
+        hoje = timezone.now().date()
+        ultimo_encerrado = hoje.replace(day=1) - timedelta(days=1)
+        inicio = options['desde'] or _primeiro_mes_com_dados()
+        if inicio is None or inicio > ultimo_encerrado:
+            self.stdout.write('Nenhum mês encerrado para consolidar.')
+            return
+
+        meses = [mes for mes, _ in janelas_mensais(inicio, ultimo_encerrado, limite=None)]
+        if not options['recalcular']:
+            existentes = set(SnapshotMensal.objects.filter(mes__in=meses).values_list('mes', flat=True))
+            meses = [mes for mes in meses if mes not in existentes]
+        if not meses:
+            self.stdout.write('Todos os meses encerrados já estão consolidados.')
+            return
+
+        snapshots = fechar_meses(meses, hoje)
+        if options['verbosity'] >= 2:
+            for snapshot in snapshots:
+                self.stdout.write(
+                    f'  -> {snapshot.mes.strftime("%m/%Y")}: receita R$ {snapshot.receita_bruta}, '
+                    f'despesas R$ {snapshot.despesas_totais}, {snapshot.alunos_ativos} ativo(s).'
+                )
+        self.stdout.write(self.style.SUCCESS(f'{len(snapshots)} mês(es) consolidado(s).'))
@@ -0,0 +1,29 @@
+# cadastros/management/commands/limpar_exclusoes.py
+"""
+Apaga as marcas de exclusão (RegistroExclusao) mais antigas que a retenção
+(EXCLUSOES_RETENCAO_DIAS ou --dias). Pensado para a rotina noturna.
+
+    python manage.py limpar_exclusoes
+    python manage.py limpar_exclusoes --dias 30
+"""
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from cadastros.exclusoes import apagar_antigas
+
+
+class Command(BaseCommand):
+    help = 'Apaga as marcas de exclusão da exportação incremental mais antigas que a retenção.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dias', type=int, default=settings.EXCLUSOES_RETENCAO_DIAS,
+                            help=f'Dias que as marcas são mantidas (padrão: {settings.EXCLUSOES_RETENCAO_DIAS}).')
+
+    def handle(self, *args, **options):
+        if options['dias'] < 1:
+            raise CommandError('--dias precisa ser maior que zero.')
+
+        apagadas = apagar_antigas(options['dias'])
+        self.stdout.write(self.style.SUCCESS(
+            f'{apagadas} marca(s) de exclusão com mais de {options["dias"]} dia(s) apagada(s).'
+        ))
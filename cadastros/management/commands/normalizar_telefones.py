@@ -0,0 +1,42 @@
+# cadastros/management/commands/normalizar_telefones.py
+"""
+Preenche (ou corrige) telefone_normalizado de leads e alunos. O save() dos
+modelos mantém a coluna e a migração 0042 preencheu os registros que já
+existiam; este comando repara os gravados por caminhos em massa
+(bulk_create/update) ou após uma mudança na regra de normalização.
+
+    python manage.py normalizar_telefones --modelo lead
+    python manage.py normalizar_telefones --modelo aluno --chunk-size 2000
+"""
+from cadastros.management.lotes import ComandoEmLotes
+from cadastros.models import Aluno, Lead
+from cadastros.utils import normalizar_telefone
+
+MODELOS = {'lead': Lead, 'aluno': Aluno}
+
+
+class Command(ComandoEmLotes):
+    help = 'Preenche o telefone normalizado (E.164) usado nas buscas por telefone.'
+    tamanho_bloco_padrao = 2000
+
+    def add_arguments(self, parser):
+        super().add_arguments(parser)
+        parser.add_argument('--modelo', choices=sorted(MODELOS), default='lead',
+                            help='Tabela a normalizar (padrão: lead).')
+
+    def get_queryset(self, opcoes):
+        return MODELOS[opcoes['modelo']].objects.all()
+
+    def processar_lote(self, queryset, opcoes):
+        alterados = []
+        sem_ddd = 0
+        for obj in queryset.only('pk', 'telefone', 'telefone_normalizado'):
+            normalizado = normalizar_telefone(obj.telefone)
+            if normalizado is None and obj.telefone:
+                sem_ddd += 1
+            if normalizado != obj.telefone_normalizado:
+                obj.telefone_normalizado = normalizado
+                alterados.append(obj)
+        # bulk_update não toca em atualizado_em: a coluna derivada não entra nas exportações
+        queryset.model.objects.bulk_update(alterados, ['telefone_normalizado'])
+        return {'atualizados': len(alterados), 'nao_normalizaveis': sem_ddd}
@@ -0,0 +1,84 @@
+# cadastros/management/commands/planos_consulta.py
+"""
+Mostra o plano de execução (EXPLAIN) das consultas mais frequentes dos
+dashboards, para comparar antes e depois dos índices:
+
+    python manage.py migrate cadastros 0034 && python manage.py planos_consulta > antes.txt
+    python manage.py migrate cadastros && python manage.py planos_consulta > depois.txt
+"""
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.utils import timezone
+
+from cadastros.models import Aluno, Contrato, Inscricao, Pagamento, Presenca, RegistroAula, Turma
+from cadastros.utils import intervalo_mes
+
+STATUS_EM_ABERTO = ['pendente', 'parcial', 'atrasado']
+
+
+def _primeiro_id(modelo):
+    return modelo.objects.order_by('pk').values_list('pk', flat=True).first() or 0
+
+
+def consultas_frequentes():
+    """ Lista de (descrição, queryset) com os formatos de filtro usados nas telas. """
+    hoje = timezone.now().date()
+    mes = intervalo_mes(hoje.year, hoje.month)
+    aluno_id = _primeiro_id(Aluno)
+    turma_id = _primeiro_id(Turma)
+    contrato_id = _primeiro_id(Contrato)
+
+    return [
+        ('Pagamentos do mês por status (dashboard financeiro)',
+         Pagamento.objects.filter(status__in=STATUS_EM_ABERTO, mes_referencia__range=mes)),
+        ('Cobranças em aberto do aluno por vencimento',
+         Pagamento.objects.filter(aluno_id=aluno_id, status__in=STATUS_EM_ABERTO).order_by('data_vencimento')),
+        ('Cobranças do contrato por tipo e mês (faturamento)',
+         Pagamento.objects.filter(contrato_id=contrato_id, tipo='mensalidade', mes_referencia__gte=mes[0])),
+        ('Inadimplência: cobranças em aberto vencidas',
+         Pagamento.objects.filter(status__in=STATUS_EM_ABERTO, data_vencimento__lt=hoje)),
+        ('Aulas da turma no mês',
+         RegistroAula.objects.filter(turma_id=turma_id, data_aula__range=mes)),
+        ('Histórico de presenças do aluno',
+         Presenca.objects.filter(aluno_id=aluno_id, registro_aula__data_aula__gte=hoje - timedelta(days=180))),
+        ('Inscrições ativas da turma',
+         Inscricao.objects.filter(turma_id=turma_id, status='matriculado')),
+        ('Inscrições ativas do aluno',
+         Inscricao.objects.filter(aluno_id=aluno_id, status='matriculado')),
+        ('Contratos ativos a vencer em 30 dias',
+         Contrato.objects.filter(ativo=True, data_fim__range=(hoje, hoje + timedelta(days=30)))),
+    ]
+
+
+class Command(BaseCommand):
+    help = 'Exibe o EXPLAIN (e, opcionalmente, o tempo médio) das consultas mais frequentes dos dashboards.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--analyze', action='store_true',
+                            help='Usa EXPLAIN ANALYZE (MySQL 8.0.18+ / PostgreSQL); ignorado no SQLite.')
+        parser.add_argument('--repeticoes', type=int, default=0,
+                            help='Executa cada consulta N vezes e mostra o tempo médio.')
+
+    def handle(self, *args, **options):
+        opcoes_explain = {}
+        if options['analyze']:
+            if connection.vendor == 'sqlite':
+                self.stdout.write(self.style.WARNING('SQLite não suporta EXPLAIN ANALYZE; usando EXPLAIN QUERY PLAN.'))
+            else:
+                opcoes_explain['analyze'] = True
+
+        self.stdout.write(self.style.SUCCESS(f'Banco: {connection.vendor} ({connection.settings_dict["NAME"]})'))
+        for descricao, queryset in consultas_frequentes():
+            self.stdout.write(self.style.MIGRATE_HEADING(f'\n{descricao}'))
+            self.stdout.write(str(queryset.query))
+            self.stdout.write(queryset.explain(**opcoes_explain))
+
+            if options['repeticoes'] > 0:
+                inicio = time.perf_counter()
+                for _ in range(options['repeticoes']):
+                    list(queryset.values_list('pk', flat=True))
+                media = (time.perf_counter() - inicio) * 1000 / options['repeticoes']
+                self.stdout.write(f'Tempo médio: {media:.2f} ms')
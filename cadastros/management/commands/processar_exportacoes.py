@@ -0,0 +1,90 @@
+# cadastros/management/commands/processar_exportacoes.py
+"""
+Worker das exportações em segundo plano (TarefaExportacao). Processa as
+tarefas na fila e termina; com --continuo, fica aguardando novas tarefas.
+A cada passagem, apaga os arquivos mais antigos que a retenção
+(EXPORTACOES_RETENCAO_DIAS ou --retencao-dias).
+
+    python manage.py processar_exportacoes              # via cron, a cada minuto
+    python manage.py processar_exportacoes --continuo --workers 2
+"""
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.utils import timezone
+
+from cadastros.exportacao import executar_tarefa, proxima_tarefa
+from cadastros.models import TarefaExportacao
+
+
+class Command(BaseCommand):
+    help = 'Gera os arquivos das exportações solicitadas na página de exportação.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--continuo', action='store_true',
+                            help='Continua aguardando novas tarefas em vez de terminar com a fila vazia.')
+        parser.add_argument('--intervalo', type=int, default=10,
+                            help='Segundos entre as consultas à fila no modo contínuo (padrão: 10).')
+        parser.add_argument('--workers', type=int, default=1,
+                            help='Quantas tarefas gerar ao mesmo tempo (threads; padrão: 1).')
+        parser.add_argument('--retencao-dias', type=int, default=settings.EXPORTACOES_RETENCAO_DIAS,
+                            help=f'Dias que os arquivos gerados ficam disponíveis (padrão: {settings.EXPORTACOES_RETENCAO_DIAS}).')
+        parser.add_argument('--tempo-maximo', type=int, default=60,
+                            help='Minutos após os quais uma tarefa em andamento é dada como interrompida (padrão: 60).')
+
+    def handle(self, *args, **options):
+        if options['workers'] < 1 or options['intervalo'] < 1 or options['retencao_dias'] < 1:
+            raise CommandError('--workers, --intervalo e --retencao-dias precisam ser maiores que zero.')
+
+        self._liberar_interrompidas(options['tempo_maximo'])
+        while True:
+            self._apagar_expiradas(options['retencao_dias'])
+            with ThreadPoolExecutor(max_workers=options['workers']) as pool:
+                geradas = sum(pool.map(lambda _: self._consumir_fila(), range(options['workers'])))
+            if geradas:
+                self.stdout.write(self.style.SUCCESS(f'{geradas} exportação(ões) gerada(s).'))
+            if not options['continuo']:
+                break
+            time.sleep(options['intervalo'])
+
+    def _consumir_fila(self):
+        geradas = 0
+        try:
+            while (tarefa := proxima_tarefa()) is not None:
+                self.stdout.write(f'Gerando {tarefa}...')
+                try:
+                    executar_tarefa(tarefa)
+                except Exception as erro:
+                    self.stdout.write(self.style.ERROR(f'  -> Falhou: {erro}'))
+                    continue
+                geradas += 1
+                self.stdout.write(f'  -> {tarefa.linhas} linha(s), {tarefa.tamanho_bytes} bytes em {tarefa.duracao}.')
+        finally:
+            # Cada thread abre a própria conexão com o banco
+            connections.close_all()
+        return geradas
+
+    def _liberar_interrompidas(self, minutos):
+        """ Tarefas que ficaram em andamento (worker encerrado no meio) são marcadas como falhas. """
+        limite = timezone.now() - timedelta(minutes=minutos)
+        interrompidas = TarefaExportacao.objects.filter(status='em_andamento', iniciado_em__lt=limite).update(
+            status='falhou', erro='Tarefa interrompida antes de terminar.', finalizado_em=timezone.now()
+        )
+        if interrompidas:
+            self.stdout.write(self.style.WARNING(f'{interrompidas} tarefa(s) interrompida(s) marcada(s) como falha.'))
+
+    def _apagar_expiradas(self, dias):
+        """ Apaga os arquivos das exportações concluídas há mais de `dias` dias; a tarefa fica no histórico. """
+        limite = timezone.now() - timedelta(days=dias)
+        expiradas = TarefaExportacao.objects.filter(status='concluida', finalizado_em__lt=limite).exclude(arquivo='')
+        apagadas = 0
+        for tarefa in expiradas.iterator():
+            tarefa.arquivo.delete(save=False)
+            tarefa.save(update_fields=['arquivo'])
+            apagadas += 1
+        if apagadas:
+            self.stdout.write(f'{apagadas} arquivo(s) de exportação expirado(s) apagado(s).')
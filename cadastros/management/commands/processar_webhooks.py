@@ -0,0 +1,51 @@
+# cadastros/management/commands/processar_webhooks.py
+"""
+Worker da caixa de entrada do webhook do WhatsApp (EventoWebhook). Processa
+os eventos pendentes em lotes e termina; com --continuo, fica aguardando.
+
+    python manage.py processar_webhooks                  # via cron, a cada minuto
+    python manage.py processar_webhooks --continuo --intervalo 2
+    python manage.py processar_webhooks --reprocessar-falhas
+"""
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from cadastros.models import EventoWebhook
+from cadastros.whatsapp import TAMANHO_LOTE, processar_lote
+
+
+class Command(BaseCommand):
+    help = 'Processa os eventos recebidos pelo webhook do WhatsApp (leads e mensagens).'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--lote', type=int, default=TAMANHO_LOTE,
+                            help=f'Eventos processados por transação (padrão: {TAMANHO_LOTE}).')
+        parser.add_argument('--continuo', action='store_true',
+                            help='Continua aguardando novos eventos em vez de terminar com a fila vazia.')
+        parser.add_argument('--intervalo', type=int, default=5,
+                            help='Segundos entre as consultas à fila no modo contínuo (padrão: 5).')
+        parser.add_argument('--reprocessar-falhas', action='store_true',
+                            help='Inclui os eventos que falharam em execuções anteriores.')
+
+    def handle(self, *args, **options):
+        if options['lote'] < 1 or options['intervalo'] < 1:
+            raise CommandError('--lote e --intervalo precisam ser maiores que zero.')
+
+        if options['reprocessar_falhas']:
+            # Voltam para a fila uma vez; se falharem de novo, ficam para a próxima execução
+            devolvidos = EventoWebhook.objects.filter(status='falhou').update(status='pendente')
+            self.stdout.write(f'{devolvidos} evento(s) com falha devolvido(s) à fila.')
+
+        while True:
+            resultado = processar_lote(options['lote'])
+            if resultado['eventos']:
+                self.stdout.write(
+                    f"{resultado['eventos']} evento(s): {resultado['mensagens']} mensagem(ns) nova(s) "
+                    f"de {resultado['contatos']} contato(s), {resultado['status']} status atualizado(s), "
+                    f"{resultado['falhas']} falha(s)."
+                )
+                continue
+            if not options['continuo']:
+                break
+            time.sleep(options['intervalo'])
@@ -0,0 +1,27 @@
+# cadastros/management/commands/reconstruir_resumos.py
+
+from cadastros.management.lotes import ComandoEmLotes
+from cadastros.models import Aluno, AlunoResumo
+from cadastros.resumos import atualizar_resumos
+from django.utils import timezone
+
+
+class Command(ComandoEmLotes):
+    help = 'Recalcula a projeção AlunoResumo de todos os alunos (reparo ou rotina noturna).'
+    tamanho_bloco_padrao = 500
+
+    def preparar(self, opcoes):
+        opcoes['hoje'] = timezone.now().date()
+
+    def get_queryset(self, opcoes):
+        return Aluno.objects.all()
+
+    def processar_lote(self, queryset, opcoes):
+        return {'resumos_gravados': atualizar_resumos(queryset, hoje=opcoes['hoje'])}
+
+    def exibir_resumo(self, execucao, resumo):
+        sem_resumo = Aluno.objects.filter(resumo__isnull=True).count()
+        self.stdout.write(self.style.SUCCESS(
+            f'{resumo["resumos_gravados"]} resumo(s) gravado(s) de {execucao.processados} aluno(s). '
+            f'Total de resumos: {AlunoResumo.objects.count()}; alunos sem resumo: {sem_resumo}.'
+        ))
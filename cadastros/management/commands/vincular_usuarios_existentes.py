@@ -1,19 +1,21 @@
-from django.core.management.base import BaseCommand
 from django.contrib.auth.models import User
+from cadastros.management.lotes import ComandoEmLotes
 from cadastros.models import Aluno
 
-class Command(BaseCommand):
+class Command(ComandoEmLotes):
     help = 'Cria e vincula um User para alunos que já estão cadastrados no portal'
 
-    def handle(self, *args, **kwargs):
+    def get_queryset(self, opcoes):
         # 1. Filtra apenas alunos que não possuem usuário vinculado
-        alunos_sem_user = Aluno.objects.filter(usuario__isnull=True)
-        
+        return Aluno.objects.filter(usuario__isnull=True)
+
+    def processar_lote(self, queryset, opcoes):
         count = 0
-        for aluno in alunos_sem_user:
+        detalhes = []
+        for aluno in queryset:
             # Definimos o username como o e-mail ou uma versão do nome se o e-mail faltar
             username = aluno.email if aluno.email else f"aluno_{aluno.id}"
-            
+
             # 2. Verifica se o User já existe (para evitar erro de duplicidade)
             user, created = User.objects.get_or_create(
                 username=username,
@@ -32,6 +34,6 @@ class Command(BaseCommand):
             aluno.usuario = user
             aluno.save()
             count += 1
-            self.stdout.write(self.style.SUCCESS(f'Usuário {username} vinculado ao aluno {aluno.nome_completo}'))
+            detalhes.append(f'Usuário {username} vinculado ao aluno {aluno.nome_completo}')
 
-        self.stdout.write(self.style.SUCCESS(f'Processo concluído! {count} alunos foram vinculados.'))
\ No newline at end of file
+        return {'alunos_vinculados': count, 'detalhes': detalhes}
@@ -0,0 +1,260 @@
+# cadastros/management/lotes.py
+"""
+Executor em lotes compartilhado pelos comandos de manutenção.
+
+O queryset do comando é percorrido por paginação de chave (pk > último pk),
+em blocos de `--chunk-size` registros. Cada bloco roda numa transação própria,
+no próprio processo ou num pool de processos (`--workers N`). Ao final de cada
+bloco, o progresso é gravado em `ExecucaoComando`; `--retomar` continua uma
+execução interrompida a partir do último bloco efetivado. Só é retomada uma
+execução iniciada com as mesmas opções do comando (inclusive as completadas
+em `preparar`, como a data de referência) e que não esteja viva:
+falhou, ou está "em andamento" sem sinal de vida há mais de
+`--inativa-apos` minutos (ou com o processo já encerrado, no mesmo host).
+
+Para usar, o comando herda de `ComandoEmLotes` e implementa:
+
+    get_queryset(self, opcoes)            -> queryset a percorrer
+    processar_lote(self, queryset, opcoes) -> dict de contadores do bloco
+
+Contadores numéricos são somados no resumo final. A chave especial
+'detalhes' (lista de textos) só é exibida com --verbosity 2.
+"""
+import json
+import os
+import socket
+from collections import Counter
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from datetime import timedelta
+
+import django
+from django.core.serializers.json import DjangoJSONEncoder
+from django.core.management import load_command_class
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections, transaction
+from django.utils import timezone
+
+from cadastros.models import ExecucaoComando
+
+TAMANHO_BLOCO_PADRAO = 500
+
+# Opções internas do Django que não precisam (nem podem) ir para os workers
+_OPCOES_LOCAIS = {'stdout', 'stderr', 'no_color', 'force_color', 'skip_checks', 'traceback', 'pythonpath', 'settings'}
+
+# Opções do executor, que não mudam o que é processado: não impedem a retomada
+_OPCOES_DO_EXECUTOR = {'workers', 'chunk_size', 'retomar', 'inativa_apos', 'verbosity'}
+
+
+def _inicializar_worker():
+    # Necessário quando o sistema cria os processos por 'spawn' em vez de 'fork'
+    django.setup()
+    # Com 'fork', o filho herda o socket da conexão aberta do pai. Descarta
+    # sem fechar (fechar encerraria a sessão do pai) e abre uma própria.
+    for conexao in connections.all(initialized_only=True):
+        conexao.connection = None
+
+
+def _executar_bloco(app_label, nome_comando, pks, opcoes):
+    """ Ponto de entrada dos workers: recarrega o comando e processa um bloco. """
+    comando = load_command_class(app_label, nome_comando)
+    return comando.executar_bloco(pks, opcoes)
+
+
+class ComandoEmLotes(BaseCommand):
+    tamanho_bloco_padrao = TAMANHO_BLOCO_PADRAO
+
+    def get_queryset(self, opcoes):
+        raise NotImplementedError('Subclasses de ComandoEmLotes precisam implementar get_queryset().')
+
+    def processar_lote(self, queryset, opcoes):
+        raise NotImplementedError('Subclasses de ComandoEmLotes precisam implementar processar_lote().')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=1,
+                            help='Quantidade de processos em paralelo (padrão: 1, no próprio processo).')
+        parser.add_argument('--chunk-size', type=int, default=self.tamanho_bloco_padrao,
+                            help='Registros por bloco; cada bloco é gravado numa transação própria.')
+        parser.add_argument('--retomar', action='store_true',
+                            help='Continua a última execução interrompida (com as mesmas opções) a partir do último bloco efetivado.')
+        parser.add_argument('--inativa-apos', type=int, default=30,
+                            help='Minutos sem progresso após os quais uma execução "em andamento" é dada como interrompida (padrão: 30).')
+
+    @property
+    def nome_comando(self):
+        return self.__module__.rsplit('.', 1)[-1]
+
+    @property
+    def app_label(self):
+        return self.__module__.split('.management.commands.', 1)[0]
+
+    def executar_bloco(self, pks, opcoes):
+        with transaction.atomic():
+            contadores = self.processar_lote(self.get_queryset(opcoes).filter(pk__in=pks), opcoes) or {}
+        contadores.setdefault('processados', len(pks))
+        return contadores
+
+    def _blocos(self, queryset, cursor, tamanho):
+        """ Paginação por chave: nunca usa OFFSET, então o custo por bloco é constante. """
+        queryset = queryset.order_by('pk').values_list('pk', flat=True)
+        while True:
+            if cursor is not None:
+                pks = list(queryset.filter(pk__gt=cursor)[:tamanho])
+            else:
+                pks = list(queryset[:tamanho])
+            if not pks:
+                return
+            cursor = pks[-1]
+            yield pks
+
+    @staticmethod
+    def _processo_vivo(execucao):
+        """ Só dá para conferir o processo no mesmo host; nos outros, vale o sinal de vida. """
+        if not execucao.pid or execucao.host != socket.gethostname():
+            return None
+        try:
+            os.kill(execucao.pid, 0)
+        except ProcessLookupError:
+            return False
+        except PermissionError:
+            return True
+        return True
+
+    def _interrompida(self, execucao, minutos):
+        if execucao.status == 'falhou':
+            return True
+        vivo = self._processo_vivo(execucao)
+        if vivo is not None:
+            return not vivo
+        return execucao.atualizado_em < timezone.now() - timedelta(minutes=minutos)
+
+    def _execucao(self, retomar, opcoes_execucao, inativa_apos):
+        processo = {'host': socket.gethostname(), 'pid': os.getpid()}
+        if retomar:
+            candidatas = ExecucaoComando.objects.filter(
+                comando=self.nome_comando, opcoes=opcoes_execucao
+            ).exclude(status='concluida')
+            for execucao in candidatas:
+                if not self._interrompida(execucao, inativa_apos):
+                    raise CommandError(
+                        f'A execução #{execucao.pk} ainda está em andamento (processo {execucao.pid} em '
+                        f'{execucao.host or "?"}, último progresso em {timezone.localtime(execucao.atualizado_em):%d/%m/%Y %H:%M}). '
+                        f'Aguarde o término ou ajuste --inativa-apos.'
+                    )
+                execucao.status = 'em_andamento'
+                execucao.erro = ''
+                execucao.host, execucao.pid = processo['host'], processo['pid']
+                execucao.save(update_fields=['status', 'erro', 'host', 'pid', 'atualizado_em'])
+                return execucao
+            self.stdout.write(self.style.WARNING(
+                'Nenhuma execução interrompida com estas opções encontrada; iniciando do zero.'
+            ))
+        return ExecucaoComando.objects.create(comando=self.nome_comando, opcoes=opcoes_execucao, **processo)
+
+    def handle(self, *args, **options):
+        if options['workers'] < 1 or options['chunk_size'] < 1 or options['inativa_apos'] < 1:
+            raise CommandError('--workers, --chunk-size e --inativa-apos precisam ser maiores que zero.')
+
+        if options['workers'] > 1 and connections['default'].vendor == 'sqlite':
+            # O SQLite não aceita escritas concorrentes de vários processos
+            self.stdout.write(self.style.WARNING('SQLite não suporta workers em paralelo; executando em um único processo.'))
+            options['workers'] = 1
+
+        opcoes = {k: v for k, v in options.items() if k not in _OPCOES_LOCAIS}
+        self.verbosidade = options['verbosity']
+        self.preparar(opcoes)
+        # Depois de preparar(): opções derivadas (como a data de referência 'hoje')
+        # também identificam a execução. Normalizadas como no JSONField (datas
+        # viram texto) para comparar com as gravadas.
+        opcoes_execucao = json.loads(json.dumps(
+            {k: v for k, v in opcoes.items() if k not in _OPCOES_DO_EXECUTOR}, cls=DjangoJSONEncoder
+        ))
+
+        queryset = self.get_queryset(opcoes)
+        execucao = self._execucao(options['retomar'], opcoes_execucao, options['inativa_apos'])
+        if execucao.ultimo_pk is not None:
+            queryset_restante = queryset.filter(pk__gt=execucao.ultimo_pk)
+            self.stdout.write(f'Retomando a partir do registro #{execucao.ultimo_pk}.')
+        else:
+            queryset_restante = queryset
+        execucao.total = execucao.processados + queryset_restante.count()
+        execucao.save(update_fields=['total', 'atualizado_em'])
+
+        self.stdout.write(self.style.SUCCESS(f'{execucao.total} registro(s) a processar.'))
+        resumo = Counter(execucao.resumo)
+        blocos = self._blocos(queryset, execucao.ultimo_pk, options['chunk_size'])
+
+        try:
+            if options['workers'] == 1:
+                for pks in blocos:
+                    self._registrar(execucao, resumo, pks[-1], self.executar_bloco(pks, opcoes))
+            else:
+                self._executar_em_paralelo(execucao, resumo, blocos, opcoes, options['workers'])
+        except BaseException as erro:
+            execucao.status = 'falhou'
+            execucao.erro = repr(erro)
+            execucao.save(update_fields=['status', 'erro', 'atualizado_em'])
+            self.stdout.write('')
+            if isinstance(erro, Exception):
+                raise CommandError(
+                    f'Execução interrompida no registro #{execucao.ultimo_pk}: {erro}. '
+                    f'Use --retomar para continuar.'
+                ) from erro
+            raise
+
+        execucao.status = 'concluida'
+        execucao.finalizado_em = timezone.now()
+        execucao.save(update_fields=['status', 'finalizado_em', 'atualizado_em'])
+        self.stdout.write('')
+        self.exibir_resumo(execucao, resumo)
+
+    def _executar_em_paralelo(self, execucao, resumo, blocos, opcoes, workers):
+        pendentes = {}
+        concluidos = {}
+        proximo = 0
+        sequencia = 0
+        with ProcessPoolExecutor(max_workers=workers, initializer=_inicializar_worker) as pool:
+            blocos = iter(blocos)
+            esgotado = False
+            while pendentes or not esgotado:
+                # Mantém no máximo dois blocos na fila por worker
+                while not esgotado and len(pendentes) < workers * 2:
+                    pks = next(blocos, None)
+                    if pks is None:
+                        esgotado = True
+                        break
+                    futuro = pool.submit(_executar_bloco, self.app_label, self.nome_comando, pks, opcoes)
+                    pendentes[futuro] = (sequencia, pks[-1])
+                    sequencia += 1
+                if not pendentes:
+                    break
+                prontos, _ = wait(pendentes, return_when=FIRST_COMPLETED)
+                for futuro in prontos:
+                    seq, ultimo_pk = pendentes.pop(futuro)
+                    concluidos[seq] = (ultimo_pk, futuro.result())
+                # O ponto de controle só avança por blocos contíguos já efetivados
+                while proximo in concluidos:
+                    ultimo_pk, contadores = concluidos.pop(proximo)
+                    self._registrar(execucao, resumo, ultimo_pk, contadores)
+                    proximo += 1
+
+    def _registrar(self, execucao, resumo, ultimo_pk, contadores):
+        detalhes = contadores.pop('detalhes', [])
+        if self.verbosidade >= 2:
+            for linha in detalhes:
+                self.stdout.write(f'\r{linha}')
+        resumo.update(contadores)
+        execucao.ultimo_pk = ultimo_pk
+        execucao.processados = resumo['processados']
+        execucao.resumo = dict(resumo)
+        execucao.save(update_fields=['ultimo_pk', 'processados', 'resumo', 'atualizado_em'])
+        self.stdout.write(f'\r  Processados: {execucao.processados}/{execucao.total}', ending='')
+        self.stdout.flush()
+
+    def preparar(self, opcoes):
+        """ Gancho para validar ou completar as opções antes de montar o queryset. """
+
+    def exibir_resumo(self, execucao, resumo):
+        self.stdout.write(self.style.SUCCESS(f'Processamento finalizado: {execucao.processados} registro(s).'))
+        for chave, valor in sorted(resumo.items()):
+            if chave != 'processados':
+                self.stdout.write(f'  {chave.replace("_", " ").capitalize()}: {valor}')
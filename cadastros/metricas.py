@@ -0,0 +1,247 @@
+# cadastros/metricas.py
+"""
+Motor de indicadores do dashboard de Saúde do Negócio.
+
+Em vez de recalcular cada janela (período atual, comparativo e cada mês do
+histórico) com uma bateria de agregações, buscamos uma única vez, para o
+intervalo que cobre todas as janelas, os totais agrupados por dia (receitas,
+despesas, cobranças, matrículas e churn) e montamos os indicadores de cada
+janela em memória. O número de consultas é fixo, qualquer que seja o
+período selecionado.
+
+Meses já encerrados e consolidados em SnapshotMensal são lidos direto do
+snapshot: as consultas agrupadas só percorrem os dias que nenhum snapshot
+cobre (normalmente o mês em aberto e as pontas de janelas quebradas).
+"""
+from collections import defaultdict
+from datetime import timedelta
+from decimal import Decimal
+from functools import reduce
+from operator import or_
+
+from django.db import transaction
+from django.db.models import Count, F, Q, Sum
+from django.utils import timezone
+
+from .models import Aluno, Contrato, Despesa, Pagamento, SnapshotMensal
+
+ZERO = Decimal('0.00')
+
+
+def fim_do_mes(data):
+    return (data.replace(day=28) + timedelta(days=4)).replace(day=1) - timedelta(days=1)
+
+
+def janelas_mensais(data_inicio, data_fim, limite=12):
+    """ Fatias mensais do período (no máximo `limite`, se informado), usadas no gráfico histórico. """
+    janelas = []
+    atual = data_inicio.replace(day=1)
+    while atual <= data_fim and (limite is None or len(janelas) < limite):
+        proximo = (atual + timedelta(days=32)).replace(day=1)
+        janelas.append((atual, min(proximo - timedelta(days=1), data_fim)))
+        atual = proximo
+    return janelas
+
+
+def janela_anterior(data_inicio, data_fim):
+    """ Janela de mesma duração imediatamente anterior ao período, para os comparativos. """
+    fim = data_inicio - timedelta(days=1)
+    return fim - (data_fim - data_inicio), fim
+
+
+def _trechos_vivos(inicio, fim, cobertos):
+    """ Intervalos contínuos da janela que não estão cobertos pelos meses consolidados. """
+    trechos = []
+    atual = inicio
+    while atual <= fim:
+        ultimo = min(fim_do_mes(atual), fim)
+        if atual.replace(day=1) not in cobertos:
+            if trechos and trechos[-1][1] == atual - timedelta(days=1):
+                trechos[-1] = (trechos[-1][0], ultimo)
+            else:
+                trechos.append((atual, ultimo))
+        atual = ultimo + timedelta(days=1)
+    return trechos
+
+
+def _mesclar(intervalos):
+    mesclados = []
+    for inicio, fim in sorted(intervalos):
+        if mesclados and inicio <= mesclados[-1][1] + timedelta(days=1):
+            mesclados[-1] = (mesclados[-1][0], max(fim, mesclados[-1][1]))
+        else:
+            mesclados.append((inicio, fim))
+    return mesclados
+
+
+def _no_intervalo(campo, intervalos):
+    filtro = Q()
+    for inicio, fim in intervalos:
+        filtro |= Q(**{f'{campo}__range': [inicio, fim]})
+    return filtro
+
+
+def _dentro(dia, trechos):
+    return any(inicio <= dia <= fim for inicio, fim in trechos)
+
+
+def _somar(por_dia, trechos, chave):
+    return sum((v[chave] for dia, v in por_dia.items() if _dentro(dia, trechos)), ZERO)
+
+
+def _dados_diarios(intervalos, hoje):
+    """ Executa as consultas agrupadas por dia que alimentam todas as janelas. """
+    # Matrículas: a contagem de ativos é acumulada desde o início, então não limitamos o intervalo
+    matriculas = {
+        linha['data_matricula']: linha
+        for linha in Aluno.objects.values('data_matricula').annotate(
+            ativos=Count('id', filter=Q(status='ativo')), novos=Count('id'),
+        )
+    }
+    if not intervalos:
+        return matriculas, {}, {}, {}, {}
+
+    receitas = {
+        linha['data_pagamento']: linha
+        for linha in Pagamento.objects.filter(_no_intervalo('data_pagamento', intervalos), status='pago')
+        .values('data_pagamento').annotate(receita=Sum('valor_pago'))
+    }
+
+    em_aberto = F('valor') - F('valor_pago')
+    cobrancas = {
+        linha['data_vencimento']: linha
+        for linha in Pagamento.objects.filter(_no_intervalo('data_vencimento', intervalos))
+        .values('data_vencimento').annotate(
+            gerado=Sum('valor', filter=~Q(status='cancelado')),
+            atrasado=Sum(em_aberto, filter=Q(status='atrasado') | Q(status__in=['pendente', 'parcial'], data_vencimento__lt=hoje)),
+            pendente_no_prazo=Sum(em_aberto, filter=Q(status__in=['pendente', 'parcial'], data_vencimento__gte=hoje)),
+        )
+    }
+
+    despesas = {
+        linha['data_pagamento']: linha
+        for linha in Despesa.objects.filter(_no_intervalo('data_pagamento', intervalos), pago=True)
+        .values('data_pagamento').annotate(
+            total=Sum('valor'), marketing=Sum('valor', filter=Q(categoria='marketing')),
+        )
+    }
+
+    # Churn: uma única consulta para todos os intervalos, agrupada pela data de encerramento
+    churn = defaultdict(set)
+    encerrados = reduce(or_, (Contrato.objects.churn_entre(inicio, fim) for inicio, fim in intervalos))
+    encerrados = encerrados.values_list('aluno_id', 'status', 'data_fim', 'data_cancelamento')
+    for aluno_id, status, data_fim, data_cancelamento in encerrados:
+        churn[data_fim if status == 'finalizado' else data_cancelamento].add(aluno_id)
+
+    # Normaliza os nulos dos agregados condicionais
+    for linha in list(receitas.values()) + list(cobrancas.values()) + list(despesas.values()):
+        for chave, valor in linha.items():
+            if valor is None:
+                linha[chave] = ZERO
+    return matriculas, receitas, cobrancas, despesas, churn
+
+
+def snapshots_do_periodo(inicio, fim, hoje):
+    """ Snapshots dos meses encerrados que tocam o período, indexados pelo primeiro dia do mês. """
+    return {
+        snapshot.mes: snapshot
+        for snapshot in SnapshotMensal.objects.filter(
+            mes__range=[inicio.replace(day=1), fim], mes__lt=hoje.replace(day=1)
+        )
+    }
+
+
+def calcular_metricas(janelas, hoje=None, usar_snapshots=True):
+    """
+    Calcula os indicadores para cada janela (data_inicio, data_fim) da lista,
+    na mesma ordem, com o mesmo formato do antigo `calc_metricas_saude`.
+    Com `usar_snapshots=False`, ignora os meses consolidados e recalcula tudo
+    a partir dos dados brutos (é assim que os próprios snapshots são gerados).
+    """
+    if not janelas:
+        return []
+    hoje = hoje or timezone.now().date()
+    snapshots = {}
+    if usar_snapshots:
+        snapshots = snapshots_do_periodo(min(inicio for inicio, _ in janelas), max(fim for _, fim in janelas), hoje)
+
+    # Para cada janela, os meses inteiros que vêm do snapshot e os trechos que precisam das consultas
+    cobertura = []
+    for data_inicio, data_fim in janelas:
+        cobertos = [mes for mes in snapshots if data_inicio <= mes and fim_do_mes(mes) <= data_fim]
+        cobertura.append((cobertos, _trechos_vivos(data_inicio, data_fim, cobertos)))
+
+    matriculas, receitas, cobrancas, despesas, churn = _dados_diarios(
+        _mesclar(trecho for _, trechos in cobertura for trecho in trechos), hoje
+    )
+
+    resultados = []
+    for (data_inicio, data_fim), (cobertos, trechos) in zip(janelas, cobertura):
+        consolidados = [snapshots[mes] for mes in cobertos]
+
+        def total(campo):
+            return sum((getattr(snapshot, campo) for snapshot in consolidados), ZERO)
+
+        snapshot_fim = snapshots.get(data_fim.replace(day=1))
+        if snapshot_fim and data_fim == fim_do_mes(data_fim):
+            alunos_ativos = snapshot_fim.alunos_ativos
+        else:
+            alunos_ativos = sum(v['ativos'] for dia, v in matriculas.items() if dia <= data_fim)
+        novos_alunos = sum(v['novos'] for dia, v in matriculas.items() if _dentro(dia, trechos)) + int(total('novos_alunos'))
+        total_alunos_inicio = sum(v['ativos'] for dia, v in matriculas.items() if dia <= data_inicio) or 1
+
+        receita_bruta = _somar(receitas, trechos, 'receita') + total('receita_bruta')
+        despesas_totais = _somar(despesas, trechos, 'total') + total('despesas_totais')
+        despesas_mkt = _somar(despesas, trechos, 'marketing') + total('despesas_marketing')
+        valor_atrasados = _somar(cobrancas, trechos, 'atrasado') + total('valor_atrasados')
+        valor_gerado = _somar(cobrancas, trechos, 'gerado') + total('valor_gerado')
+        # Meses encerrados não têm cobranças "no prazo": tudo que venceu e não foi pago está em atraso
+        valor_pendente_no_prazo = _somar(cobrancas, trechos, 'pendente_no_prazo')
+
+        churn_count = len(set().union(*[alunos for dia, alunos in churn.items() if _dentro(dia, trechos)]))
+        churn_count += int(total('alunos_churn'))
+
+        lucro_liquido = receita_bruta - despesas_totais
+        ticket_medio = (receita_bruta / Decimal(str(alunos_ativos))) if alunos_ativos > 0 else ZERO
+        churn_rate = (churn_count / total_alunos_inicio) * 100
+        churn_decimal = (churn_rate / 100) if churn_rate > 0 else 1
+        ltv = ticket_medio / Decimal(str(churn_decimal)) if churn_decimal > 0 else ZERO
+        cac = (despesas_mkt / Decimal(str(novos_alunos))) if novos_alunos > 0 else ZERO
+        inadimplencia = (valor_atrasados / valor_gerado * 100) if valor_gerado > 0 else ZERO
+
+        resultados.append({
+            'alunos_ativos': alunos_ativos, 'receita_bruta': receita_bruta,
+            'despesas_totais': despesas_totais, 'lucro_liquido': lucro_liquido,
+            'ticket_medio': ticket_medio, 'churn_rate': churn_rate, 'ltv': ltv,
+            'cac': cac, 'inadimplencia': inadimplencia, 'valor_atrasados': valor_atrasados,
+            'valor_pendente_no_prazo': valor_pendente_no_prazo,
+            'novos_alunos': novos_alunos, 'alunos_churn': churn_count,
+            'despesas_marketing': despesas_mkt, 'valor_gerado': valor_gerado,
+        })
+    return resultados
+
+
+def fechar_meses(meses, hoje=None):
+    """
+    Consolida (sempre a partir dos dados brutos) os meses informados em
+    SnapshotMensal, sobrescrevendo snapshots existentes. Só aceita meses
+    já encerrados; devolve os snapshots gravados.
+    """
+    hoje = hoje or timezone.now().date()
+    meses = sorted({mes.replace(day=1) for mes in meses})
+    em_aberto = [mes for mes in meses if mes >= hoje.replace(day=1)]
+    if em_aberto:
+        raise ValueError(f"O mês {em_aberto[0].strftime('%m/%Y')} ainda não foi encerrado.")
+
+    resultados = calcular_metricas([(mes, fim_do_mes(mes)) for mes in meses], hoje, usar_snapshots=False)
+    snapshots = []
+    with transaction.atomic():
+        for mes, resultado in zip(meses, resultados):
+            snapshot, _ = SnapshotMensal.objects.update_or_create(mes=mes, defaults={
+                campo: resultado[campo] for campo in (
+                    'receita_bruta', 'despesas_totais', 'despesas_marketing', 'valor_gerado',
+                    'valor_atrasados', 'alunos_ativos', 'novos_alunos', 'alunos_churn',
+                )
+            })
+            snapshots.append(snapshot)
+    return snapshots
@@ -0,0 +1,187 @@
+# cadastros/middleware.py
+"""
+Instrumentação de desempenho por rota.
+
+Para cada requisição, conta as consultas SQL (e quantas são repetidas),
+mede o tempo gasto no banco e o tempo total, e acumula esses números no
+cache por nome de URL, com incrementos atômicos (um contador por chave).
+O cache precisa ser compartilhado entre os workers (Redis/Memcached) para
+que os números cubram todos os processos; por isso a coleta vem
+desligada. Requisições acima dos limites configurados
+(METRICAS_LIMITE_CONSULTAS / METRICAS_LIMITE_TEMPO_MS) são registradas no
+log 'cadastros.desempenho'. Os acumulados aparecem na página de métricas
+(views_metricas.py), restrita a administradores.
+"""
+import logging
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connection
+from django.urls import URLResolver, get_resolver
+
+logger = logging.getLogger('cadastros.desempenho')
+
+PREFIXO_CHAVE = 'metricas_req:'
+
+
+class _ColetorConsultas:
+    """ execute_wrapper que conta e cronometra as consultas da requisição. """
+
+    def __init__(self):
+        self.total = 0
+        self.tempo_ms = 0.0
+        self.identicas = {}
+        self.formatos = {}
+
+    def __call__(self, execute, sql, params, many, context):
+        inicio = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.tempo_ms += (time.perf_counter() - inicio) * 1000
+            self.total += 1
+            chave = (sql, repr(params))
+            self.identicas[chave] = self.identicas.get(chave, 0) + 1
+            self.formatos[sql] = self.formatos.get(sql, 0) + 1
+
+    @property
+    def duplicadas(self):
+        """ Consultas idênticas (mesmo SQL e parâmetros) executadas mais de uma vez. """
+        return self.total - len(self.identicas)
+
+    @property
+    def repetidas(self):
+        """ Consultas com o mesmo SQL e parâmetros diferentes: o sintoma típico de N+1. """
+        return self.total - len(self.formatos)
+
+
+# Contadores somados a cada requisição; os tempos vão em microssegundos (inteiros)
+CONTADORES = ['requisicoes', 'consultas', 'tempo_db_us', 'duplicadas', 'repetidas', 'tempo_total_us', 'lentas']
+MAXIMOS = ['max_consultas', 'max_tempo_us']
+
+
+def _chave(rota, campo):
+    return f'{PREFIXO_CHAVE}{rota}:{campo}'
+
+
+def _somar(chave, valor):
+    """ Incremento atômico no cache; o add cobre a primeira requisição da rota. """
+    try:
+        cache.incr(chave, valor)
+    except ValueError:
+        if not cache.add(chave, valor, None):
+            # Outra requisição criou a chave entre o incr e o add
+            cache.incr(chave, valor)
+
+
+def registrar_metricas(rota, consultas, tempo_db_ms, duplicadas, repetidas, tempo_total_ms):
+    """
+    Acumula as métricas de uma requisição no cache, por nome de rota. Cada
+    contador é uma chave própria com incremento atômico (cache.incr), então
+    requisições simultâneas em vários workers não sobrescrevem umas às
+    outras. Os máximos são aproximados: ler e gravar não é atômico.
+    """
+    tempo_total_us = int(tempo_total_ms * 1000)
+    lenta = consultas > settings.METRICAS_LIMITE_CONSULTAS or tempo_total_ms > settings.METRICAS_LIMITE_TEMPO_MS
+    valores = {
+        'requisicoes': 1, 'consultas': consultas, 'tempo_db_us': int(tempo_db_ms * 1000),
+        'duplicadas': duplicadas, 'repetidas': repetidas, 'tempo_total_us': tempo_total_us, 'lentas': int(lenta),
+    }
+    for campo, valor in valores.items():
+        if valor:
+            _somar(_chave(rota, campo), valor)
+
+    maximos = cache.get_many([_chave(rota, campo) for campo in MAXIMOS])
+    novos = {
+        chave: valor
+        for chave, valor in ((_chave(rota, 'max_consultas'), consultas), (_chave(rota, 'max_tempo_us'), tempo_total_us))
+        if valor > maximos.get(chave, -1)
+    }
+    if novos:
+        cache.set_many(novos, None)
+
+
+def _rotas_conhecidas():
+    """
+    Nomes de todas as rotas (com namespace) do URLconf, mais 'sem_rota'. A
+    página de métricas consulta as chaves de cada uma, em vez de manter no
+    cache um índice das rotas vistas (que podia ser despejado ou perder
+    atualizações concorrentes).
+    """
+    nomes = {'sem_rota'}
+
+    def percorrer(padroes, prefixo):
+        for padrao in padroes:
+            if isinstance(padrao, URLResolver):
+                namespace = f'{prefixo}{padrao.namespace}:' if padrao.namespace else prefixo
+                percorrer(padrao.url_patterns, namespace)
+            elif padrao.name:
+                nomes.add(prefixo + padrao.name)
+
+    percorrer(get_resolver().url_patterns, '')
+    return nomes
+
+
+def metricas_por_rota():
+    """ Lista de dicts com os acumulados e as médias de cada rota, das mais lentas para as mais rápidas. """
+    rotas = _rotas_conhecidas()
+    valores = cache.get_many([_chave(rota, campo) for rota in rotas for campo in CONTADORES + MAXIMOS])
+    linhas = []
+    for rota in rotas:
+        dados = {campo: valores.get(_chave(rota, campo), 0) for campo in CONTADORES + MAXIMOS}
+        if not dados['requisicoes']:
+            continue
+        n = dados['requisicoes']
+        linhas.append({
+            'rota': rota,
+            'requisicoes': n,
+            'consultas': dados['consultas'],
+            'duplicadas': dados['duplicadas'],
+            'repetidas': dados['repetidas'],
+            'lentas': dados['lentas'],
+            'max_consultas': dados['max_consultas'],
+            'max_tempo_ms': dados['max_tempo_us'] / 1000,
+            'media_consultas': dados['consultas'] / n,
+            'media_tempo_db_ms': dados['tempo_db_us'] / 1000 / n,
+            'media_tempo_ms': dados['tempo_total_us'] / 1000 / n,
+            'media_duplicadas': dados['duplicadas'] / n,
+            'media_repetidas': dados['repetidas'] / n,
+        })
+    return sorted(linhas, key=lambda linha: linha['media_tempo_ms'], reverse=True)
+
+
+def limpar_metricas():
+    cache.delete_many([_chave(rota, campo) for rota in _rotas_conhecidas() for campo in CONTADORES + MAXIMOS])
+
+
+class MetricasRequisicaoMiddleware:
+    def __init__(self, get_response):
+        if not settings.METRICAS_REQUISICOES_ATIVAS:
+            raise MiddlewareNotUsed
+        if 'LocMemCache' in settings.CACHES['default']['BACKEND']:
+            logger.warning(
+                'Métricas por rota com cache em memória: cada processo acumula só as próprias requisições. '
+                'Configure um cache compartilhado (CACHE_BACKEND) para números de todos os workers.'
+            )
+        self.get_response = get_response
+
+    def __call__(self, request):
+        coletor = _ColetorConsultas()
+        inicio = time.perf_counter()
+        with connection.execute_wrapper(coletor):
+            response = self.get_response(request)
+        tempo_total_ms = (time.perf_counter() - inicio) * 1000
+
+        match = getattr(request, 'resolver_match', None)
+        rota = match.view_name if match else 'sem_rota'
+        registrar_metricas(rota, coletor.total, coletor.tempo_ms, coletor.duplicadas, coletor.repetidas, tempo_total_ms)
+
+        if coletor.total > settings.METRICAS_LIMITE_CONSULTAS or tempo_total_ms > settings.METRICAS_LIMITE_TEMPO_MS:
+            logger.warning(
+                'Requisição lenta: %s %s (%s) - %d consultas (%d duplicadas, %d repetidas), %.0f ms no banco, %.0f ms no total',
+                request.method, request.path, rota, coletor.total, coletor.duplicadas, coletor.repetidas,
+                coletor.tempo_ms, tempo_total_ms,
+            )
+        return response
@@ -0,0 +1,58 @@
+# Generated by Django 5.2.6 on 2026-10-18 10:12
+
+from django.db import migrations, models
+
+
+def preencher_chaves(apps, schema_editor):
+    """
+    Calcula a chave das mensalidades/matrículas já existentes antes de
+    tornar o campo único. Duplicatas antigas mantêm a chave apenas no
+    registro mais antigo (as demais ficam NULL e continuam no histórico).
+    """
+    Pagamento = apps.get_model('cadastros', 'Pagamento')
+    usadas = set()
+    parcelas = {}
+    pendentes = []
+
+    existentes = Pagamento.objects.filter(
+        contrato__isnull=False, tipo__in=['mensalidade', 'matricula']
+    ).order_by('contrato_id', 'tipo', 'mes_referencia', 'id').values_list('id', 'contrato_id', 'tipo', 'mes_referencia')
+
+    for pk, contrato_id, tipo, mes_referencia in existentes.iterator(chunk_size=2000):
+        if tipo == 'matricula':
+            parcelas[contrato_id] = parcelas.get(contrato_id, 0) + 1
+            parcela = parcelas[contrato_id]
+        else:
+            parcela = 1
+        chave = f"c{contrato_id}:{tipo}:{mes_referencia:%Y-%m}:{parcela}"
+        if chave in usadas:
+            continue
+        usadas.add(chave)
+        pendentes.append(Pagamento(pk=pk, chave_cobranca=chave))
+        if len(pendentes) >= 1000:
+            Pagamento.objects.bulk_update(pendentes, ['chave_cobranca'])
+            pendentes = []
+
+    if pendentes:
+        Pagamento.objects.bulk_update(pendentes, ['chave_cobranca'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cadastros', '0029_contrato_data_cancelamento'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='pagamento',
+            name='chave_cobranca',
+            field=models.CharField(blank=True, editable=False, max_length=150, null=True, verbose_name='Chave da Cobrança'),
+        ),
+        migrations.RunPython(preencher_chaves, reverse_code=migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='pagamento',
+            name='chave_cobranca',
+            field=models.CharField(blank=True, editable=False, max_length=150, null=True, unique=True, verbose_name='Chave da Cobrança'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.6 on 2026-10-18 11:03
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cadastros', '0030_pagamento_chave_cobranca'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='contrato',
+            name='faturado_ate',
+            field=models.DateField(blank=True, editable=False, null=True, verbose_name='Faturado até'),
+        ),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 5.2.6 on 2026-10-18 11:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cadastros', '0031_contrato_faturado_ate'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ExecucaoComando',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('comando', models.CharField(max_length=100)),
+                ('status', models.CharField(choices=[('em_andamento', 'Em Andamento'), ('concluida', 'Concluída'), ('falhou', 'Falhou')], default='em_andamento', max_length=15)),
+                ('ultimo_pk', models.BigIntegerField(blank=True, null=True, verbose_name='Último PK Efetivado')),
+                ('processados', models.IntegerField(default=0)),
+                ('total', models.IntegerField(default=0)),
+                ('resumo', models.JSONField(blank=True, default=dict)),
+                ('erro', models.TextField(blank=True)),
+                ('iniciado_em', models.DateTimeField(auto_now_add=True)),
+                ('atualizado_em', models.DateTimeField(auto_now=True)),
+                ('finalizado_em', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'ordering': ['-iniciado_em'],
+            },
+        ),
+    ]
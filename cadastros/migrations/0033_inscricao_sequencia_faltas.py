@@ -0,0 +1,28 @@
+# Generated by Django 5.2.6 on 2026-10-18 12:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cadastros', '0032_execucaocomando'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='inscricao',
+            name='faltas_consecutivas',
+            field=models.IntegerField(default=0, editable=False, verbose_name='Faltas Consecutivas'),
+        ),
+        migrations.AddField(
+            model_name='inscricao',
+            name='inicio_sequencia_faltas',
+            field=models.DateField(blank=True, editable=False, null=True, verbose_name='Início da Sequência de Faltas'),
+        ),
+        migrations.AddField(
+            model_name='inscricao',
+            name='ultima_aula_contabilizada',
+            field=models.DateField(blank=True, editable=False, null=True, verbose_name='Última Aula Contabilizada'),
+        ),
+    ]
@@ -0,0 +1,36 @@
+# Generated by Django 5.2.6 on 2026-10-18 12:30
+
+from django.db import migrations
+from django.db.models import Count, Max
+
+
+def remover_duplicadas(apps, schema_editor):
+    """
+    Antes da restrição única, mantém só a presença mais recente de cada
+    (aula, aluno); duplicatas vinham de envios simultâneos da chamada.
+    """
+    Presenca = apps.get_model('cadastros', 'Presenca')
+    duplicadas = (
+        Presenca.objects.values('registro_aula_id', 'aluno_id')
+        .annotate(total=Count('id'), manter=Max('id'))
+        .filter(total__gt=1)
+    )
+    for grupo in duplicadas.iterator():
+        Presenca.objects.filter(
+            registro_aula_id=grupo['registro_aula_id'], aluno_id=grupo['aluno_id']
+        ).exclude(pk=grupo['manter']).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cadastros', '0033_inscricao_sequencia_faltas'),
+    ]
+
+    operations = [
+        migrations.RunPython(remover_duplicadas, migrations.RunPython.noop),
+        migrations.AlterUniqueTogether(
+            name='presenca',
+            unique_together={('registro_aula', 'aluno')},
+        ),
+    ]
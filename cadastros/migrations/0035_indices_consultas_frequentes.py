@@ -0,0 +1,49 @@
+# Generated by Django 5.2.6 on 2026-10-18 12:55
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cadastros', '0034_presenca_unica_por_aula'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='contrato',
+            index=models.Index(fields=['ativo', 'data_fim'], name='contrato_ativo_fim_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='inscricao',
+            index=models.Index(fields=['turma', 'status'], name='inscricao_turma_status_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='inscricao',
+            index=models.Index(fields=['aluno', 'status'], name='inscricao_aluno_status_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='pagamento',
+            index=models.Index(fields=['status', 'mes_referencia'], name='pagamento_status_mes_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='pagamento',
+            index=models.Index(fields=['aluno', 'status', 'data_vencimento'], name='pagamento_aluno_venc_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='pagamento',
+            index=models.Index(fields=['contrato', 'tipo', 'mes_referencia'], name='pagamento_contrato_mes_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='pagamento',
+            index=models.Index(condition=models.Q(('status__in', ['pendente', 'parcial', 'atrasado'])), fields=['data_vencimento'], name='pagamento_aberto_venc_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='presenca',
+            index=models.Index(fields=['aluno', 'registro_aula'], name='presenca_aluno_aula_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='registroaula',
+            index=models.Index(fields=['turma', 'data_aula'], name='registroaula_turma_data_idx'),
+        ),
+    ]
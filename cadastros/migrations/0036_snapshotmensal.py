@@ -0,0 +1,34 @@
+# Generated by Django 5.2.6 on 2026-10-18 14:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cadastros', '0035_indices_consultas_frequentes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SnapshotMensal',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('mes', models.DateField(help_text='Sempre o primeiro dia do mês.', unique=True, verbose_name='Mês de Referência')),
+                ('receita_bruta', models.DecimalField(decimal_places=2, default=0, max_digits=12, verbose_name='Receita Bruta')),
+                ('despesas_totais', models.DecimalField(decimal_places=2, default=0, max_digits=12, verbose_name='Despesas Totais')),
+                ('despesas_marketing', models.DecimalField(decimal_places=2, default=0, max_digits=12, verbose_name='Despesas de Marketing')),
+                ('valor_gerado', models.DecimalField(decimal_places=2, default=0, max_digits=12, verbose_name='Valor Gerado em Cobranças')),
+                ('valor_atrasados', models.DecimalField(decimal_places=2, default=0, max_digits=12, verbose_name='Valor em Atraso')),
+                ('alunos_ativos', models.IntegerField(default=0, verbose_name='Alunos Ativos no Fim do Mês')),
+                ('novos_alunos', models.IntegerField(default=0, verbose_name='Novos Alunos')),
+                ('alunos_churn', models.IntegerField(default=0, verbose_name='Alunos Evadidos')),
+                ('fechado_em', models.DateTimeField(auto_now=True, verbose_name='Fechado em')),
+            ],
+            options={
+                'verbose_name': 'Snapshot Mensal',
+                'verbose_name_plural': 'Snapshots Mensais',
+                'ordering': ['-mes'],
+            },
+        ),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 5.2.6 on 2026-10-18 14:39
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cadastros', '0036_snapshotmensal'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AlunoResumo',
+            fields=[
+                ('aluno', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='resumo', serialize=False, to='cadastros.aluno')),
+                ('plano_contrato', models.CharField(blank=True, max_length=10)),
+                ('valor_mensalidade_contrato', models.DecimalField(blank=True, decimal_places=2, max_digits=7, null=True)),
+                ('fim_contrato', models.DateField(blank=True, null=True)),
+                ('data_ultimo_pagamento', models.DateField(blank=True, null=True)),
+                ('tem_feedback', models.BooleanField(default=False)),
+                ('turma_nome', models.CharField(blank=True, max_length=100)),
+                ('turma_stage', models.IntegerField(blank=True, null=True)),
+                ('turma_trancada_nome', models.CharField(blank=True, max_length=100)),
+                ('turma_trancada_stage', models.IntegerField(blank=True, null=True)),
+                ('vencimento_em_aberto', models.DateField(blank=True, null=True, verbose_name='Vencimento em Aberto Mais Antigo')),
+                ('atualizado_em', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['vencimento_em_aberto'], name='alunoresumo_venc_aberto_idx')],
+            },
+        ),
+    ]
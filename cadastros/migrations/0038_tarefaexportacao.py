@@ -0,0 +1,37 @@
+# Generated by Django 5.2.6 on 2026-10-18 15:20
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cadastros', '0037_alunoresumo'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TarefaExportacao',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('tipo', models.CharField(choices=[('contratos', 'Contratos (CSV)'), ('pagamentos', 'Pagamentos (CSV)'), ('registros_aula', 'Registros de Aula (CSV)'), ('registros_por_turma', 'Registros de Aula por Turma (ZIP)'), ('acompanhamentos', 'Acompanhamentos Pedagógicos (CSV)')], max_length=30)),
+                ('filtros', models.JSONField(blank=True, default=dict)),
+                ('status', models.CharField(choices=[('pendente', 'Na Fila'), ('em_andamento', 'Em Andamento'), ('concluida', 'Concluída'), ('falhou', 'Falhou')], default='pendente', max_length=15)),
+                ('arquivo', models.FileField(blank=True, upload_to='exportacoes/%Y/%m/')),
+                ('linhas', models.IntegerField(default=0, verbose_name='Linhas Exportadas')),
+                ('tamanho_bytes', models.BigIntegerField(default=0, verbose_name='Tamanho do Arquivo (bytes)')),
+                ('erro', models.TextField(blank=True)),
+                ('criado_em', models.DateTimeField(auto_now_add=True)),
+                ('iniciado_em', models.DateTimeField(blank=True, null=True)),
+                ('finalizado_em', models.DateTimeField(blank=True, null=True)),
+                ('solicitado_por', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='exportacoes', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['-criado_em'],
+                'indexes': [models.Index(fields=['status', 'criado_em'], name='exportacao_fila_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.6 on 2026-10-18 15:45
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cadastros', '0038_tarefaexportacao'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='tarefaexportacao',
+            name='tipo',
+            field=models.CharField(choices=[('contratos', 'Contratos (CSV)'), ('pagamentos', 'Pagamentos (CSV)'), ('registros_aula', 'Registros de Aula (CSV)'), ('registros_por_turma', 'Registros de Aula por Turma (ZIP)'), ('acompanhamentos', 'Acompanhamentos Pedagógicos (CSV)'), ('pacote_analitico', 'Pacote Analítico (ZIP com NDJSON)')], max_length=30),
+        ),
+    ]
@@ -0,0 +1,55 @@
+# Generated by Django 5.2.6 on 2026-10-18 16:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cadastros', '0039_tarefaexportacao_pacote_analitico'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RegistroExclusao',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('modelo', models.CharField(max_length=50)),
+                ('objeto_id', models.BigIntegerField()),
+                ('excluido_em', models.DateTimeField(auto_now_add=True, db_index=True)),
+            ],
+            options={
+                'ordering': ['excluido_em'],
+            },
+        ),
+        migrations.AddField(
+            model_name='aluno',
+            name='atualizado_em',
+            field=models.DateTimeField(auto_now=True, db_index=True, verbose_name='Atualizado em'),
+        ),
+        migrations.AddField(
+            model_name='contrato',
+            name='atualizado_em',
+            field=models.DateTimeField(auto_now=True, db_index=True, verbose_name='Atualizado em'),
+        ),
+        migrations.AddField(
+            model_name='pagamento',
+            name='atualizado_em',
+            field=models.DateTimeField(auto_now=True, db_index=True, verbose_name='Atualizado em'),
+        ),
+        migrations.AddField(
+            model_name='presenca',
+            name='atualizado_em',
+            field=models.DateTimeField(auto_now=True, db_index=True, verbose_name='Atualizado em'),
+        ),
+        migrations.AddField(
+            model_name='registroaula',
+            name='atualizado_em',
+            field=models.DateTimeField(auto_now=True, db_index=True, verbose_name='Atualizado em'),
+        ),
+        migrations.AlterField(
+            model_name='tarefaexportacao',
+            name='tipo',
+            field=models.CharField(choices=[('contratos', 'Contratos (CSV)'), ('pagamentos', 'Pagamentos (CSV)'), ('registros_aula', 'Registros de Aula (CSV)'), ('presencas', 'Presenças (CSV)'), ('alunos', 'Alunos (CSV)'), ('registros_por_turma', 'Registros de Aula por Turma (ZIP)'), ('acompanhamentos', 'Acompanhamentos Pedagógicos (CSV)'), ('pacote_analitico', 'Pacote Analítico (ZIP com NDJSON)')], max_length=30),
+        ),
+    ]
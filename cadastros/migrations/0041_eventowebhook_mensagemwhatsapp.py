@@ -0,0 +1,45 @@
+# Generated by Django 5.2.6 on 2026-10-18 16:30
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cadastros', '0040_sincronizacao_incremental'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EventoWebhook',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('corpo', models.TextField(verbose_name='Corpo Recebido')),
+                ('status', models.CharField(choices=[('pendente', 'Pendente'), ('processado', 'Processado'), ('falhou', 'Falhou')], default='pendente', max_length=15)),
+                ('tentativas', models.IntegerField(default=0)),
+                ('erro', models.TextField(blank=True)),
+                ('recebido_em', models.DateTimeField(auto_now_add=True)),
+                ('processado_em', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'ordering': ['recebido_em'],
+                'indexes': [models.Index(fields=['status', 'id'], name='eventowebhook_fila_idx')],
+            },
+        ),
+        migrations.CreateModel(
+            name='MensagemWhatsApp',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('direcao', models.CharField(choices=[('entrada', 'Recebida (Cliente -> Escola)'), ('saida', 'Enviada (Escola -> Cliente)')], max_length=10, verbose_name='Direção da Mensagem')),
+                ('conteudo_texto', models.TextField(verbose_name='Conteúdo da Mensagem')),
+                ('wamid', models.CharField(blank=True, max_length=100, null=True, verbose_name='WhatsApp Message ID')),
+                ('status', models.CharField(blank=True, choices=[('enviado', 'Enviado'), ('entregue', 'Entregue'), ('lido', 'Lido'), ('falha', 'Falha')], max_length=15, null=True, verbose_name='Status de Entrega')),
+                ('data_envio', models.DateTimeField(auto_now_add=True)),
+                ('lead', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='mensagens_whatsapp', to='cadastros.lead')),
+            ],
+            options={
+                'ordering': ['data_envio'],
+            },
+        ),
+    ]
@@ -0,0 +1,59 @@
+# Generated by Django 5.2.6 on 2026-10-18 17:10
+
+from django.db import migrations, models
+
+
+def normalizar_telefone(telefone):
+    """
+    Cópia de cadastros.utils.normalizar_telefone no momento desta migração:
+    o preenchimento não pode mudar (nem quebrar) se a função evoluir.
+    """
+    digitos = ''.join(filter(str.isdigit, telefone or '')).lstrip('0')
+    if (telefone or '').strip().startswith('+') and not digitos.startswith('55'):
+        return f'+{digitos}' if 8 <= len(digitos) <= 15 else None
+    if len(digitos) in (10, 11):
+        digitos = '55' + digitos
+    elif not (len(digitos) in (12, 13) and digitos.startswith('55')):
+        return None
+    ddd, numero = digitos[2:4], digitos[4:]
+    if len(numero) == 8 and numero[0] in '6789':
+        numero = '9' + numero
+    return f'+55{ddd}{numero}'
+
+
+def preencher_telefones(apps, schema_editor):
+    """
+    Preenche a coluna nos registros existentes: a busca de leads do webhook
+    e o envio de mensagens dependem dela logo após o deploy. Percorre cada
+    tabela por pk em blocos, sem carregar tudo de uma vez.
+    """
+    for nome in ('Lead', 'Aluno'):
+        modelo = apps.get_model('cadastros', nome)
+        fila = modelo.objects.exclude(telefone=None).exclude(telefone='').order_by('pk').only('pk', 'telefone')
+        ultimo = 0
+        while bloco := list(fila.filter(pk__gt=ultimo)[:2000]):
+            ultimo = bloco[-1].pk
+            for obj in bloco:
+                obj.telefone_normalizado = normalizar_telefone(obj.telefone)
+            modelo.objects.bulk_update(bloco, ['telefone_normalizado'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cadastros', '0041_eventowebhook_mensagemwhatsapp'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='aluno',
+            name='telefone_normalizado',
+            field=models.CharField(blank=True, db_index=True, editable=False, max_length=16, null=True),
+        ),
+        migrations.AddField(
+            model_name='lead',
+            name='telefone_normalizado',
+            field=models.CharField(blank=True, db_index=True, editable=False, max_length=16, null=True),
+        ),
+        migrations.RunPython(preencher_telefones, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,36 @@
+# Generated by Django 5.2.6 on 2026-10-18 17:40
+
+from django.db import migrations, models
+from django.db.models import Count, Min
+
+
+def remover_duplicadas(apps, schema_editor):
+    """
+    Antes do índice único, mantém só a primeira gravação de cada wamid
+    (duplicatas vinham dos reenvios do webhook) e troca wamid vazio por NULL.
+    """
+    MensagemWhatsApp = apps.get_model('cadastros', 'MensagemWhatsApp')
+    MensagemWhatsApp.objects.filter(wamid='').update(wamid=None)
+    duplicadas = (
+        MensagemWhatsApp.objects.exclude(wamid=None).values('wamid')
+        .annotate(total=Count('id'), manter=Min('id'))
+        .filter(total__gt=1)
+    )
+    for grupo in duplicadas.iterator():
+        MensagemWhatsApp.objects.filter(wamid=grupo['wamid']).exclude(pk=grupo['manter']).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cadastros', '0042_telefone_normalizado'),
+    ]
+
+    operations = [
+        migrations.RunPython(remover_duplicadas, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='mensagemwhatsapp',
+            name='wamid',
+            field=models.CharField(blank=True, max_length=100, null=True, unique=True, verbose_name='WhatsApp Message ID'),
+        ),
+    ]
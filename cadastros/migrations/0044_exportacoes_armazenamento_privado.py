@@ -0,0 +1,40 @@
+# Generated by Django 5.2.6 on 2026-10-18 18:20
+
+import cadastros.models
+from django.core.files.storage import default_storage
+from django.db import migrations, models
+
+
+def mover_para_armazenamento_privado(apps, schema_editor):
+    """
+    Os arquivos gerados até aqui ficavam no MEDIA_ROOT, servidos em /media/:
+    passam para o armazenamento privado (com diretório aleatório) e saem
+    do MEDIA_ROOT.
+    """
+    TarefaExportacao = apps.get_model('cadastros', 'TarefaExportacao')
+    privado = cadastros.models.armazenamento_exportacoes()
+    for tarefa in TarefaExportacao.objects.exclude(arquivo='').iterator():
+        antigo = tarefa.arquivo.name
+        if not default_storage.exists(antigo):
+            novo = ''
+        else:
+            with default_storage.open(antigo, 'rb') as conteudo:
+                novo = privado.save(cadastros.models.caminho_exportacao(tarefa, antigo.rsplit('/', 1)[-1]), conteudo)
+            default_storage.delete(antigo)
+        TarefaExportacao.objects.filter(pk=tarefa.pk).update(arquivo=novo)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cadastros', '0043_wamid_unico'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='tarefaexportacao',
+            name='arquivo',
+            field=models.FileField(blank=True, storage=cadastros.models.armazenamento_exportacoes, upload_to=cadastros.models.caminho_exportacao),
+        ),
+        migrations.RunPython(mover_para_armazenamento_privado, migrations.RunPython.noop),
+    ]
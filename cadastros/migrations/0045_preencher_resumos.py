@@ -0,0 +1,81 @@
+# Generated by Django 5.2.6 on 2026-10-18 18:40
+
+from django.db import migrations
+from django.db.models import Exists, Min, OuterRef, Q, Subquery
+from django.utils import timezone
+
+CAMPOS_RESUMO = [
+    'plano_contrato', 'valor_mensalidade_contrato', 'fim_contrato', 'data_ultimo_pagamento',
+    'tem_feedback', 'turma_nome', 'turma_stage', 'turma_trancada_nome', 'turma_trancada_stage',
+    'vencimento_em_aberto',
+]
+
+
+def preencher_resumos(apps, schema_editor):
+    """
+    A tabela AlunoResumo (0037) nasceu vazia e a lista de alunos lê dela:
+    calcula o resumo de todos os alunos existentes, em blocos de 500 pelo pk.
+    Cópia do cálculo de resumos.py neste ponto da história, sobre os modelos
+    históricos; mudanças posteriores no resumo ficam com reconstruir_resumos.
+    """
+    Aluno = apps.get_model('cadastros', 'Aluno')
+    AlunoResumo = apps.get_model('cadastros', 'AlunoResumo')
+    Contrato = apps.get_model('cadastros', 'Contrato')
+    Inscricao = apps.get_model('cadastros', 'Inscricao')
+    Pagamento = apps.get_model('cadastros', 'Pagamento')
+    PesquisaSatisfacao = apps.get_model('cadastros', 'PesquisaSatisfacao')
+
+    hoje = timezone.now().date()
+    contrato_vigente = Contrato.objects.filter(
+        Q(aluno=OuterRef('pk')) & (Q(data_fim__gte=hoje) | Q(data_fim__isnull=True)),
+        ativo=True
+    ).order_by('-data_inicio')
+    ultimo_pagamento = Pagamento.objects.filter(
+        aluno=OuterRef('pk'), status='pago'
+    ).order_by('-data_pagamento').values('data_pagamento')[:1]
+    inscricao_atual = Inscricao.objects.filter(
+        aluno=OuterRef('pk'), status__in=['matriculado', 'experimental', 'acompanhando']
+    ).order_by('-id')
+    inscricao_trancada = Inscricao.objects.filter(aluno=OuterRef('pk'), status='trancado').order_by('-id')
+    vencimento_em_aberto = Pagamento.objects.filter(
+        aluno=OuterRef('pk'), status__in=['atrasado', 'pendente']
+    ).values('aluno').annotate(primeiro=Min('data_vencimento')).values('primeiro')
+
+    linhas = Aluno.objects.order_by('pk').annotate(
+        r_plano_contrato=Subquery(contrato_vigente.values('plano')[:1]),
+        r_valor_mensalidade_contrato=Subquery(contrato_vigente.values('valor_mensalidade')[:1]),
+        r_fim_contrato=Subquery(contrato_vigente.values('data_fim')[:1]),
+        r_data_ultimo_pagamento=Subquery(ultimo_pagamento),
+        r_tem_feedback=Exists(PesquisaSatisfacao.objects.filter(aluno=OuterRef('pk'))),
+        r_turma_nome=Subquery(inscricao_atual.values('turma__nome')[:1]),
+        r_turma_stage=Subquery(inscricao_atual.values('turma__stage')[:1]),
+        r_turma_trancada_nome=Subquery(inscricao_trancada.values('turma__nome')[:1]),
+        r_turma_trancada_stage=Subquery(inscricao_trancada.values('turma__stage')[:1]),
+        r_vencimento_em_aberto=Subquery(vencimento_em_aberto),
+    ).values('pk', *(f'r_{campo}' for campo in CAMPOS_RESUMO))
+
+    # O MySQL não aceita informar as colunas do conflito (usa qualquer chave única)
+    alvo = {'unique_fields': ['aluno']} if schema_editor.connection.features.supports_update_conflicts_with_target else {}
+    ultimo = 0
+    while bloco := list(linhas.filter(pk__gt=ultimo)[:500]):
+        ultimo = bloco[-1]['pk']
+        resumos = []
+        for linha in bloco:
+            valores = {campo: linha[f'r_{campo}'] for campo in CAMPOS_RESUMO}
+            for campo in ('plano_contrato', 'turma_nome', 'turma_trancada_nome'):
+                valores[campo] = valores[campo] or ''
+            resumos.append(AlunoResumo(aluno_id=linha['pk'], **valores))
+        AlunoResumo.objects.bulk_create(
+            resumos, update_conflicts=True, update_fields=CAMPOS_RESUMO + ['atualizado_em'], **alvo
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cadastros', '0044_exportacoes_armazenamento_privado'),
+    ]
+
+    operations = [
+        migrations.RunPython(preencher_resumos, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 5.2.6 on 2026-10-18 19:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cadastros', '0045_preencher_resumos'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='pagamento',
+            name='pagamento_aberto_venc_idx',
+        ),
+        migrations.AddIndex(
+            model_name='pagamento',
+            index=models.Index(fields=['status', 'data_vencimento'], name='pagamento_status_venc_idx'),
+        ),
+    ]
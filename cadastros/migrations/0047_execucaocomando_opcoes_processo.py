@@ -0,0 +1,28 @@
+# Generated by Django 5.2.6 on 2026-10-18 19:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cadastros', '0046_indice_pagamento_status_vencimento'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='execucaocomando',
+            name='host',
+            field=models.CharField(blank=True, max_length=255),
+        ),
+        migrations.AddField(
+            model_name='execucaocomando',
+            name='opcoes',
+            field=models.JSONField(blank=True, default=dict),
+        ),
+        migrations.AddField(
+            model_name='execucaocomando',
+            name='pid',
+            field=models.IntegerField(blank=True, null=True),
+        ),
+    ]
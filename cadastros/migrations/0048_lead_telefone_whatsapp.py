@@ -0,0 +1,18 @@
+# Generated by Django 5.2.6 on 2026-10-18 19:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cadastros', '0047_execucaocomando_opcoes_processo'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='lead',
+            name='telefone_whatsapp',
+            field=models.CharField(blank=True, editable=False, max_length=16, null=True, unique=True),
+        ),
+    ]
@@ -1,4 +1,6 @@
 # cadastros/models.py
+from django.conf import settings
+from django.core.files.storage import FileSystemStorage
 from django.db import models
 from django.contrib.auth.models import User # Vamos precisar do User para os Professores
 from dateutil.relativedelta import relativedelta 
@@ -6,6 +8,8 @@ from datetime import date, timezone, timedelta
 from django.utils import timezone
 import uuid
 
+from .utils import normalizar_telefone
+
 # Aluno permanece quase o mesmo
 class Aluno(models.Model):
     usuario = models.OneToOneField(User, on_delete=models.SET_NULL, null=True, blank=True, related_name="perfil_aluno")
@@ -14,6 +18,8 @@ class Aluno(models.Model):
     cpf = models.CharField(max_length=14, unique=True, null=True, blank=True)
     email = models.EmailField(unique=True, null=True, blank=True)
     telefone = models.CharField(max_length=20, null=True, blank=True)
+    # Forma E.164 do telefone, preenchida no save(); buscas por telefone usam esta coluna
+    telefone_normalizado = models.CharField(max_length=16, null=True, blank=True, editable=False, db_index=True)
     logradouro = models.CharField("Endereço", max_length=255, null=True, blank=True)
     cidade = models.CharField(max_length=100, null=True, blank=True)
     estado = models.CharField(max_length=2, null=True, blank=True)
@@ -23,10 +29,13 @@ class Aluno(models.Model):
     creditos_aulas = models.IntegerField("Créditos (Mensalidades)", default=0)
     token_disponibilidade = models.UUIDField(default=uuid.uuid4, editable=False, unique=True, null=True)
     observacoes_trancamento = models.TextField("Anotações de Trancamento", blank=True, null=True)
+    # Sincronização incremental das exportações (?since=), ver cadastros/exportacao.py
+    atualizado_em = models.DateTimeField("Atualizado em", auto_now=True, db_index=True)
 
     def save(self, *args, **kwargs):
         if not self.token_disponibilidade:
             self.token_disponibilidade = uuid.uuid4()
+        self.telefone_normalizado = normalizar_telefone(self.telefone)
             
         # Auto create user if email is provided and no user is linked
         if self.email and not self.usuario:
@@ -84,6 +93,16 @@ class Inscricao(models.Model):
     aluno = models.ForeignKey(Aluno, on_delete=models.CASCADE)
     turma = models.ForeignKey(Turma, on_delete=models.CASCADE)
     status = models.CharField(max_length=15, choices=STATUS_CHOICES, default='matriculado')
+    # Sequência atual de faltas na turma, mantida a cada chamada salva (ver cadastros/faltas.py)
+    faltas_consecutivas = models.IntegerField("Faltas Consecutivas", default=0, editable=False)
+    inicio_sequencia_faltas = models.DateField("Início da Sequência de Faltas", null=True, blank=True, editable=False)
+    ultima_aula_contabilizada = models.DateField("Última Aula Contabilizada", null=True, blank=True, editable=False)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['turma', 'status'], name='inscricao_turma_status_idx'),
+            models.Index(fields=['aluno', 'status'], name='inscricao_aluno_status_idx'),
+        ]
     
     def __str__(self):
         return f"{self.aluno.nome_completo} em {self.turma.nome} ({self.status})"
@@ -105,6 +124,13 @@ class RegistroAula(models.Model):
     # --- FIM DAS ALTERAÇÕES ---
     
     lesson_check = models.CharField("Lesson Check", max_length=100, null=True, blank=True)
+    # Sincronização incremental das exportações (?since=), ver cadastros/exportacao.py
+    atualizado_em = models.DateTimeField("Atualizado em", auto_now=True, db_index=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['turma', 'data_aula'], name='registroaula_turma_data_idx'),
+        ]
 
     def __str__(self):
         return f"Registro de {self.turma.nome} em {self.data_aula.strftime('%d/%m/%Y')}"
@@ -114,6 +140,15 @@ class Presenca(models.Model):
     registro_aula = models.ForeignKey(RegistroAula, on_delete=models.CASCADE)
     aluno = models.ForeignKey(Aluno, on_delete=models.CASCADE)
     presente = models.BooleanField(default=False)
+    # Sincronização incremental das exportações (?since=), ver cadastros/exportacao.py
+    atualizado_em = models.DateTimeField("Atualizado em", auto_now=True, db_index=True)
+
+    class Meta:
+        unique_together = ('registro_aula', 'aluno')
+        indexes = [
+            # A restrição única começa pela aula; o histórico do aluno precisa do índice invertido
+            models.Index(fields=['aluno', 'registro_aula'], name='presenca_aluno_aula_idx'),
+        ]
 
     def __str__(self):
         status = "Presente" if self.presente else "Falta"
@@ -124,6 +159,26 @@ PLANO_CHOICES = [
     ('semestral', 'Semestral'),
     ('flex', 'Mensal Flexível'),
 ]
+class ContratoQuerySet(models.QuerySet):
+    def churn_entre(self, inicio, fim):
+        """
+        Contratos encerrados no período (finalizados pela data de fim, cancelados
+        pela data de cancelamento) de alunos que ficaram sem nenhum contrato
+        ativo. Formandos do Stage 12 não contam como evasão. Uma única consulta,
+        com anti-join para o "sem contrato ativo".
+        """
+        return self.filter(
+            models.Q(data_fim__range=[inicio, fim], status='finalizado') |
+            models.Q(data_cancelamento__range=[inicio, fim], status='cancelado')
+        ).exclude(aluno__inscricao__turma__stage=12).filter(
+            ~models.Exists(Contrato.objects.filter(aluno=models.OuterRef('aluno'), ativo=True))
+        )
+
+    def alunos_evadidos_entre(self, inicio, fim):
+        """ Quantidade de alunos distintos evadidos no período. """
+        return self.churn_entre(inicio, fim).values('aluno').distinct().count()
+
+
 class Contrato(models.Model):
     # ... (código anterior da classe) ...
     aluno = models.ForeignKey(Aluno, on_delete=models.CASCADE, related_name="contratos")
@@ -144,6 +199,18 @@ class Contrato(models.Model):
         ('finalizado', 'Finalizado'),
     ]
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='ativo')
+    # Marca d'água do faturamento: primeiro dia do último mês já processado pelo `gerar_cobrancas`.
+    faturado_ate = models.DateField("Faturado até", null=True, blank=True, editable=False)
+    # Sincronização incremental das exportações (?since=), ver cadastros/exportacao.py
+    atualizado_em = models.DateTimeField("Atualizado em", auto_now=True, db_index=True)
+
+    objects = ContratoQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            # Renovações e churn: contratos ativos por data de término
+            models.Index(fields=['ativo', 'data_fim'], name='contrato_ativo_fim_idx'),
+        ]
 
     def save(self, *args, **kwargs):
         # A lógica agora só se aplica a planos com duração definida.
@@ -194,6 +261,33 @@ class Pagamento(models.Model):
     data_vencimento = models.DateField()
     data_pagamento = models.DateField(null=True, blank=True)
     valor_pago = models.DecimalField("Valor Pago", max_digits=7, decimal_places=2, default=0)
+    # Chave de idempotência das cobranças geradas automaticamente (contrato/aluno + tipo + mês + parcela).
+    # Lançamentos manuais ficam com NULL, que não conflita no índice único.
+    chave_cobranca = models.CharField("Chave da Cobrança", max_length=150, unique=True, null=True, blank=True, editable=False)
+    # Sincronização incremental das exportações (?since=), ver cadastros/exportacao.py
+    atualizado_em = models.DateTimeField("Atualizado em", auto_now=True, db_index=True)
+
+    class Meta:
+        indexes = [
+            # Dashboard financeiro: pagamentos do mês por status
+            models.Index(fields=['status', 'mes_referencia'], name='pagamento_status_mes_idx'),
+            # Perfil/portal do aluno: cobranças em aberto por vencimento
+            models.Index(fields=['aluno', 'status', 'data_vencimento'], name='pagamento_aluno_venc_idx'),
+            # Faturamento: cobranças do contrato por tipo e mês
+            models.Index(fields=['contrato', 'tipo', 'mes_referencia'], name='pagamento_contrato_mes_idx'),
+            # Inadimplência: cobranças em aberto (status IN ...) por vencimento. Composto
+            # e não parcial porque o MySQL de produção ignora índices parciais.
+            models.Index(fields=['status', 'data_vencimento'], name='pagamento_status_venc_idx'),
+        ]
+
+    @staticmethod
+    def gerar_chave_cobranca(dono, tipo, mes_referencia, parcela=1, complemento=''):
+        """
+        Monta a chave única de uma cobrança gerada pelo sistema.
+        `dono` identifica a origem: f"c{contrato_id}" ou f"a{aluno_id}".
+        """
+        chave = f"{dono}:{tipo}:{mes_referencia:%Y-%m}:{parcela}"
+        return f"{chave}:{complemento}"[:150] if complemento else chave
 
     @property
     def valor_restante(self):
@@ -213,7 +307,7 @@ class Pagamento(models.Model):
         if self.tipo == 'mensalidade' and self.status == 'pago' and old_status != 'pago':
             if self.contrato and self.contrato.status == 'trancado':
                 self.aluno.creditos_aulas += 1
-                self.aluno.save(update_fields=['creditos_aulas'])
+                self.aluno.save(update_fields=['creditos_aulas', 'atualizado_em'])
 
     
 class AcompanhamentoFalta(models.Model):
@@ -360,6 +454,11 @@ class Lead(models.Model):
 
     nome_completo = models.CharField(max_length=200)
     telefone = models.CharField(max_length=20, blank=True)
+    telefone_normalizado = models.CharField(max_length=16, null=True, blank=True, editable=False, db_index=True)
+    # Telefone normalizado dos leads criados pelo webhook do WhatsApp. Único para
+    # que lotes simultâneos do mesmo número novo não criem leads duplicados; os
+    # cadastrados à mão ficam com NULL (telefone repetido só gera aviso).
+    telefone_whatsapp = models.CharField(max_length=16, unique=True, null=True, blank=True, editable=False)
     email = models.EmailField(blank=True)
     status = models.CharField(max_length=15, choices=STATUS_CHOICES, default='novo')
     fonte_contato = models.CharField("Origem do Contato", max_length=15, choices=FONTE_CHOICES, blank=True)
@@ -377,6 +476,7 @@ class Lead(models.Model):
     def save(self, *args, **kwargs):
         if not self.token_disponibilidade:
             self.token_disponibilidade = uuid.uuid4()
+        self.telefone_normalizado = normalizar_telefone(self.telefone)
         super().save(*args, **kwargs)
 
     def __str__(self):
@@ -650,6 +750,38 @@ class FollowUp(models.Model):
     def __str__(self):
         return f"FollowUp {self.get_tipo_contato_display()} com {self.lead.nome_completo}"
 
+class ExecucaoComando(models.Model):
+    """
+    Ponto de controle das execuções em lote dos comandos de manutenção,
+    permitindo retomar a partir do último bloco efetivado.
+    """
+    STATUS_CHOICES = [
+        ('em_andamento', 'Em Andamento'),
+        ('concluida', 'Concluída'),
+        ('falhou', 'Falhou'),
+    ]
+    comando = models.CharField(max_length=100)
+    status = models.CharField(max_length=15, choices=STATUS_CHOICES, default='em_andamento')
+    # Opções com que a execução foi iniciada: só se retoma uma execução com as mesmas
+    opcoes = models.JSONField(default=dict, blank=True)
+    # Processo que está executando; atualizado_em funciona como sinal de vida (a cada bloco)
+    host = models.CharField(max_length=255, blank=True)
+    pid = models.IntegerField(null=True, blank=True)
+    ultimo_pk = models.BigIntegerField("Último PK Efetivado", null=True, blank=True)
+    processados = models.IntegerField(default=0)
+    total = models.IntegerField(default=0)
+    resumo = models.JSONField(default=dict, blank=True)
+    erro = models.TextField(blank=True)
+    iniciado_em = models.DateTimeField(auto_now_add=True)
+    atualizado_em = models.DateTimeField(auto_now=True)
+    finalizado_em = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['-iniciado_em']
+
+    def __str__(self):
+        return f"{self.comando} ({self.get_status_display()}) - {self.processados}/{self.total}"
+
 class Despesa(models.Model):
     CATEGORIA_CHOICES = [
         ('administrativo', 'Administrativo (Água, Luz, Internet, etc.)'),
@@ -675,3 +807,197 @@ class Despesa(models.Model):
         status = "Pago" if self.pago else "Pendente"
         return f"{self.descricao} - R${self.valor} ({status})"
 
+
+class SnapshotMensal(models.Model):
+    """
+    Indicadores financeiros consolidados de um mês já encerrado. Gravados pelo
+    comando gerar_snapshots (rotina noturna) ou pela ação "Fechar mês" do
+    dashboard de Saúde do Negócio; a partir daí os dashboards leem o mês daqui
+    em vez de recalculá-lo a partir dos pagamentos, despesas e contratos.
+    """
+    mes = models.DateField("Mês de Referência", unique=True, help_text="Sempre o primeiro dia do mês.")
+    receita_bruta = models.DecimalField("Receita Bruta", max_digits=12, decimal_places=2, default=0)
+    despesas_totais = models.DecimalField("Despesas Totais", max_digits=12, decimal_places=2, default=0)
+    despesas_marketing = models.DecimalField("Despesas de Marketing", max_digits=12, decimal_places=2, default=0)
+    valor_gerado = models.DecimalField("Valor Gerado em Cobranças", max_digits=12, decimal_places=2, default=0)
+    valor_atrasados = models.DecimalField("Valor em Atraso", max_digits=12, decimal_places=2, default=0)
+    alunos_ativos = models.IntegerField("Alunos Ativos no Fim do Mês", default=0)
+    novos_alunos = models.IntegerField("Novos Alunos", default=0)
+    alunos_churn = models.IntegerField("Alunos Evadidos", default=0)
+    fechado_em = models.DateTimeField("Fechado em", auto_now=True)
+
+    class Meta:
+        ordering = ['-mes']
+        verbose_name = "Snapshot Mensal"
+        verbose_name_plural = "Snapshots Mensais"
+
+    def __str__(self):
+        return f"Snapshot {self.mes.strftime('%m/%Y')}"
+
+class AlunoResumo(models.Model):
+    """
+    Projeção desnormalizada de um aluno para as listagens (lista de alunos,
+    trancados): plano e mensalidade do contrato vigente, último pagamento,
+    feedback, turma atual e situação financeira. Mantida por signals
+    (ver signals.py / resumos.py) e reconstruída pelo comando reconstruir_resumos.
+
+    O que depende da data de hoje não é gravado pronto: guardamos o fim do
+    contrato e o vencimento em aberto mais antigo, e a leitura compara com hoje.
+    """
+    aluno = models.OneToOneField(Aluno, on_delete=models.CASCADE, primary_key=True, related_name="resumo")
+    plano_contrato = models.CharField(max_length=10, blank=True)
+    valor_mensalidade_contrato = models.DecimalField(max_digits=7, decimal_places=2, null=True, blank=True)
+    fim_contrato = models.DateField(null=True, blank=True)
+    data_ultimo_pagamento = models.DateField(null=True, blank=True)
+    tem_feedback = models.BooleanField(default=False)
+    turma_nome = models.CharField(max_length=100, blank=True)
+    turma_stage = models.IntegerField(null=True, blank=True)
+    turma_trancada_nome = models.CharField(max_length=100, blank=True)
+    turma_trancada_stage = models.IntegerField(null=True, blank=True)
+    vencimento_em_aberto = models.DateField("Vencimento em Aberto Mais Antigo", null=True, blank=True)
+    atualizado_em = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            # Filtro de inadimplentes: vencimento_em_aberto < hoje
+            models.Index(fields=['vencimento_em_aberto'], name='alunoresumo_venc_aberto_idx'),
+        ]
+
+    def __str__(self):
+        return f"Resumo de {self.aluno_id}"
+
+
+def armazenamento_exportacoes():
+    """ Armazenamento privado das exportações: fora do MEDIA_ROOT e sem URL pública. """
+    return FileSystemStorage(location=settings.EXPORTACOES_ROOT, base_url=None)
+
+
+def caminho_exportacao(tarefa, nome_arquivo):
+    # Diretório aleatório: o nome do arquivo não permite adivinhar o caminho
+    return f"{timezone.now():%Y/%m}/{uuid.uuid4().hex}/{nome_arquivo}"
+
+
+class TarefaExportacao(models.Model):
+    """
+    Exportação solicitada pela página de exportação e gerada em segundo plano
+    pelo comando processar_exportacoes. O arquivo (CSV compactado em gzip ou
+    ZIP) fica num armazenamento privado, é entregue só pela view
+    baixar_exportacao e é apagado após EXPORTACOES_RETENCAO_DIAS.
+    """
+    TIPO_CHOICES = [
+        ('contratos', 'Contratos (CSV)'),
+        ('pagamentos', 'Pagamentos (CSV)'),
+        ('registros_aula', 'Registros de Aula (CSV)'),
+        ('presencas', 'Presenças (CSV)'),
+        ('alunos', 'Alunos (CSV)'),
+        ('registros_por_turma', 'Registros de Aula por Turma (ZIP)'),
+        ('acompanhamentos', 'Acompanhamentos Pedagógicos (CSV)'),
+        ('pacote_analitico', 'Pacote Analítico (ZIP com NDJSON)'),
+    ]
+    STATUS_CHOICES = [
+        ('pendente', 'Na Fila'),
+        ('em_andamento', 'Em Andamento'),
+        ('concluida', 'Concluída'),
+        ('falhou', 'Falhou'),
+    ]
+    tipo = models.CharField(max_length=30, choices=TIPO_CHOICES)
+    filtros = models.JSONField(default=dict, blank=True)
+    status = models.CharField(max_length=15, choices=STATUS_CHOICES, default='pendente')
+    arquivo = models.FileField(upload_to=caminho_exportacao, storage=armazenamento_exportacoes, blank=True)
+    linhas = models.IntegerField("Linhas Exportadas", default=0)
+    tamanho_bytes = models.BigIntegerField("Tamanho do Arquivo (bytes)", default=0)
+    erro = models.TextField(blank=True)
+    solicitado_por = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name="exportacoes")
+    criado_em = models.DateTimeField(auto_now_add=True)
+    iniciado_em = models.DateTimeField(null=True, blank=True)
+    finalizado_em = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['-criado_em']
+        indexes = [
+            # O worker busca a próxima tarefa da fila
+            models.Index(fields=['status', 'criado_em'], name='exportacao_fila_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.get_tipo_display()} ({self.get_status_display()}) - {self.criado_em:%d/%m/%Y %H:%M}"
+
+    @property
+    def duracao(self):
+        if self.iniciado_em and self.finalizado_em:
+            return self.finalizado_em - self.iniciado_em
+        return None
+
+
+class RegistroExclusao(models.Model):
+    """
+    Marca ("tombstone") de um registro excluído de um dos modelos com
+    sincronização incremental, para que a exportação ?since= informe também
+    o que deixou de existir. Gravada pelo signal post_delete desses modelos.
+    """
+    modelo = models.CharField(max_length=50)
+    objeto_id = models.BigIntegerField()
+    excluido_em = models.DateTimeField(auto_now_add=True, db_index=True)
+
+    class Meta:
+        ordering = ['excluido_em']
+
+    def __str__(self):
+        return f"{self.modelo} #{self.objeto_id} excluído em {self.excluido_em:%d/%m/%Y %H:%M}"
+
+
+class MensagemWhatsApp(models.Model):
+    """ Histórico das conversas de WhatsApp com os leads (entrada pelo webhook, saída pela API da Meta). """
+    DIRECAO_CHOICES = [
+        ('entrada', 'Recebida (Cliente -> Escola)'),
+        ('saida', 'Enviada (Escola -> Cliente)'),
+    ]
+    STATUS_CHOICES = [
+        ('enviado', 'Enviado'),
+        ('entregue', 'Entregue'),
+        ('lido', 'Lido'),
+        ('falha', 'Falha'),
+    ]
+    lead = models.ForeignKey(Lead, on_delete=models.CASCADE, related_name="mensagens_whatsapp")
+    direcao = models.CharField("Direção da Mensagem", max_length=10, choices=DIRECAO_CHOICES)
+    conteudo_texto = models.TextField("Conteúdo da Mensagem")
+    # Único: a Meta reenvia webhooks, e a mesma mensagem não pode entrar duas vezes no histórico
+    wamid = models.CharField("WhatsApp Message ID", max_length=100, null=True, blank=True, unique=True)
+    status = models.CharField("Status de Entrega", max_length=15, choices=STATUS_CHOICES, null=True, blank=True)
+    data_envio = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['data_envio']
+
+    def __str__(self):
+        return f"{self.get_direcao_display()} - {self.lead} ({self.data_envio:%d/%m/%Y %H:%M})"
+
+
+class EventoWebhook(models.Model):
+    """
+    Caixa de entrada dos webhooks da Meta (WhatsApp). O webhook só valida a
+    assinatura, grava o corpo recebido aqui e responde; o comando
+    processar_webhooks consome a fila em lotes (ver cadastros/whatsapp.py).
+    Eventos que falham continuam gravados para serem reprocessados.
+    """
+    STATUS_CHOICES = [
+        ('pendente', 'Pendente'),
+        ('processado', 'Processado'),
+        ('falhou', 'Falhou'),
+    ]
+    corpo = models.TextField("Corpo Recebido")
+    status = models.CharField(max_length=15, choices=STATUS_CHOICES, default='pendente')
+    tentativas = models.IntegerField(default=0)
+    erro = models.TextField(blank=True)
+    recebido_em = models.DateTimeField(auto_now_add=True)
+    processado_em = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['recebido_em']
+        indexes = [
+            # O worker busca os próximos pendentes em ordem de chegada
+            models.Index(fields=['status', 'id'], name='eventowebhook_fila_idx'),
+        ]
+
+    def __str__(self):
+        return f"Webhook #{self.pk} ({self.get_status_display()}) - {self.recebido_em:%d/%m/%Y %H:%M}"
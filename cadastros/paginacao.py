@@ -0,0 +1,128 @@
+# cadastros/paginacao.py
+"""
+Paginação por keyset (cursor) para os painéis carregados sob demanda.
+
+Em vez de OFFSET, cada página pede "os próximos N depois do último item
+visto": o cursor guarda o valor do campo de ordenação e o pk desse item,
+e a consulta continua a partir dele usando o índice. O custo de cada página
+é o mesmo, seja a primeira ou a centésima, e inserções no meio da lista não
+duplicam nem pulam linhas.
+
+Nulos contam como o menor valor possível (primeiro na ordem crescente,
+por último na decrescente), como já fazem o MySQL e o SQLite.
+
+`percorrer_keyset` usa as mesmas páginas para ler uma tabela inteira em
+blocos de tamanho fixo (exportações), sem manter o resultado todo em
+memória nem no driver do banco. `percorrer_keyset_composto` faz o mesmo
+numa ordem de vários campos (crescente, sem nulos), com cursor composto.
+"""
+import base64
+import datetime
+import json
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import F, Q
+
+TAMANHO_PAGINA = 50
+TAMANHO_MAXIMO = 200
+
+
+class _CodificadorCursor(DjangoJSONEncoder):
+    # O DjangoJSONEncoder corta os microssegundos, o que quebraria a igualdade no desempate
+    def default(self, o):
+        if isinstance(o, datetime.datetime):
+            return o.isoformat()
+        return super().default(o)
+
+
+def codificar_cursor(valor, pk):
+    texto = json.dumps([valor, pk], cls=_CodificadorCursor)
+    return base64.urlsafe_b64encode(texto.encode()).decode()
+
+
+def decodificar_cursor(cursor):
+    """ Devolve (valor, pk) ou levanta ValueError para cursores inválidos. """
+    try:
+        valor, pk = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        return valor, int(pk)
+    except (TypeError, ValueError, UnicodeError):
+        raise ValueError('Cursor de paginação inválido.')
+
+
+def _valor(obj, campo):
+    # Funciona com instâncias e com linhas de values_list(named=True)
+    if '__' in campo and hasattr(obj, campo):
+        return getattr(obj, campo)
+    for parte in campo.split('__'):
+        obj = getattr(obj, parte) if obj is not None else None
+    return obj
+
+
+def _depois_de(campo, decrescente, valor, pk):
+    op = 'lt' if decrescente else 'gt'
+    if valor is None:
+        filtro = Q(**{f'{campo}__isnull': True, f'pk__{op}': pk})
+        # Na ordem crescente os nulos vêm primeiro: depois deles vêm todos os preenchidos
+        return filtro if decrescente else filtro | Q(**{f'{campo}__isnull': False})
+    filtro = Q(**{f'{campo}__{op}': valor}) | Q(**{campo: valor, f'pk__{op}': pk})
+    # Na ordem decrescente os nulos ficam por último
+    return filtro | Q(**{f'{campo}__isnull': True}) if decrescente else filtro
+
+
+def pagina_keyset(queryset, campo, decrescente=False, cursor=None, tamanho=TAMANHO_PAGINA):
+    """
+    Uma página de `queryset` ordenado por `campo` (desempate pelo pk).
+    Retorna (itens, proximo_cursor); proximo_cursor é None na última página.
+    """
+    if decrescente:
+        ordem = [F(campo).desc(nulls_last=True), F('pk').desc()]
+    else:
+        ordem = [F(campo).asc(nulls_first=True), F('pk').asc()]
+    queryset = queryset.order_by(*ordem)
+    if cursor:
+        queryset = queryset.filter(_depois_de(campo, decrescente, *decodificar_cursor(cursor)))
+
+    itens = list(queryset[:tamanho + 1])
+    if len(itens) <= tamanho:
+        return itens, None
+    itens = itens[:tamanho]
+    return itens, codificar_cursor(_valor(itens[-1], campo), itens[-1].pk)
+
+
+def percorrer_keyset(queryset, campo='pk', decrescente=False, tamanho=1000):
+    """
+    Itera todo o `queryset` na ordem de `campo`, uma página por consulta.
+    Aceita values_list(named=True), desde que inclua `campo` e o pk.
+    """
+    cursor = None
+    while True:
+        itens, cursor = pagina_keyset(queryset, campo, decrescente, cursor, tamanho)
+        yield from itens
+        if cursor is None:
+            return
+
+
+def _depois_de_composto(campos, valores):
+    # Ordem lexicográfica: (a, b, c) > (x, y, z) se a > x, ou a = x e b > y, ou ...
+    filtro = Q()
+    for i, campo in enumerate(campos):
+        iguais = dict(zip(campos[:i], valores[:i]))
+        filtro |= Q(**iguais, **{f'{campo}__gt': valores[i]})
+    return filtro
+
+
+def percorrer_keyset_composto(queryset, campos, tamanho=1000):
+    """
+    Itera todo o `queryset` na ordem crescente de `campos` (o pk é sempre o
+    último critério), uma página por consulta. Os campos não podem ser nulos.
+    Aceita values_list(named=True), desde que inclua os campos e o pk.
+    """
+    campos = [*campos, 'pk']
+    queryset = queryset.order_by(*campos)
+    pagina = queryset
+    while True:
+        itens = list(pagina[:tamanho])
+        yield from itens
+        if len(itens) < tamanho:
+            return
+        pagina = queryset.filter(_depois_de_composto(campos, [_valor(itens[-1], campo) for campo in campos]))
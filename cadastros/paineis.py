@@ -0,0 +1,123 @@
+# cadastros/paineis.py
+"""
+Consultas e cache dos painéis do dashboard administrativo e da lista de alunos.
+
+As consultas de cada painel ficam aqui para serem compartilhadas entre a
+página (que só monta a "casca") e os endpoints JSON que entregam as linhas
+página a página (views_paineis.py).
+
+Cada resultado vai para o cache com uma chave que inclui os filtros
+selecionados e o dia corrente. Todas as chaves carregam também um número de
+versão: qualquer gravação nos modelos que alimentam os painéis (ver
+signals.py) incrementa a versão e, com isso, invalida todos os painéis de
+uma vez, sem precisar saber quais chaves existem. Escritas em massa que não
+disparam signals chamam `invalidar_paineis()` diretamente; o tempo de
+expiração limita o pior caso. Com PAINEIS_CACHE_SEGUNDOS = 0 (padrão com o
+cache em memória, que é por processo) os painéis são sempre recalculados.
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Exists, OuterRef, Q, Subquery
+from django.utils import timezone
+
+from .models import AcompanhamentoPedagogico, Aluno, Inscricao, Pagamento
+from .resumos import com_resumo
+from .utils import intervalo_mes
+
+CHAVE_VERSAO = 'paineis_admin:versao'
+PREFIXO_CHAVE = 'paineis_admin'
+
+STATUS_A_RECEBER = ['pendente', 'parcial', 'atrasado']
+
+
+def versao_paineis():
+    versao = cache.get(CHAVE_VERSAO)
+    if versao is None:
+        # add() não sobrescreve a versão gravada por outro processo nesse meio-tempo
+        cache.add(CHAVE_VERSAO, 1, None)
+        versao = cache.get(CHAVE_VERSAO, 1)
+    return versao
+
+
+def invalidar_paineis():
+    """ Descarta todos os painéis em cache (as chaves antigas simplesmente expiram). """
+    try:
+        cache.incr(CHAVE_VERSAO)
+    except ValueError:
+        cache.set(CHAVE_VERSAO, 1, None)
+
+
+def em_cache(nome, calcular, *partes):
+    """
+    Devolve o valor do painel `nome`, chamando `calcular()` só quando não está
+    em cache. `partes` são os filtros que diferenciam o painel (mês, turma...).
+    """
+    if settings.PAINEIS_CACHE_SEGUNDOS <= 0:
+        return calcular()
+    chave = ':'.join(str(parte) for parte in (
+        PREFIXO_CHAVE, versao_paineis(), nome, timezone.now().date().isoformat(), *partes
+    ))
+    valor = cache.get(chave)
+    if valor is None:
+        valor = calcular()
+        cache.set(chave, valor, settings.PAINEIS_CACHE_SEGUNDOS)
+    return valor
+
+
+def painel(nome, queryset, *partes):
+    """ Conteúdo do painel como lista, avaliando o queryset só quando não está em cache. """
+    return em_cache(nome, lambda: list(queryset), *partes)
+
+
+# ------------------------------------------------------------------------------
+# Consultas dos painéis
+# ------------------------------------------------------------------------------
+
+def pagamentos_do_mes(ano, mes, status, turma_id=None, tipo=None, busca=''):
+    """ Cobranças do mês de referência com os filtros do dashboard financeiro. """
+    pagamentos = Pagamento.objects.filter(
+        status__in=status, mes_referencia__range=intervalo_mes(ano, mes)
+    ).select_related('aluno', 'contrato')
+    if turma_id:
+        alunos_da_turma = Inscricao.objects.filter(turma__id=turma_id).values_list('aluno__id', flat=True)
+        pagamentos = pagamentos.filter(aluno__id__in=alunos_da_turma)
+    if tipo:
+        pagamentos = pagamentos.filter(tipo=tipo)
+    if busca:
+        pagamentos = pagamentos.filter(Q(aluno__nome_completo__icontains=busca) | Q(descricao__icontains=busca))
+    return pagamentos
+
+
+def alunos_para_acompanhamento(hoje, busca=''):
+    """ Rodízio pedagógico: ativos sem acompanhamento realizado há mais de dois meses e sem nada agendado. """
+    dois_meses_atras = hoje - timedelta(days=60)
+
+    ultimo_acomp_subquery = AcompanhamentoPedagogico.objects.filter(
+        aluno=OuterRef('pk'), status='realizado'
+    ).order_by('-data').values('data')[:1]
+
+    possui_agendado_subquery = AcompanhamentoPedagogico.objects.filter(
+        aluno=OuterRef('pk'), status='agendado'
+    )
+
+    alunos = Aluno.objects.filter(status='ativo').annotate(
+        ultimo_acompanhamento=Subquery(ultimo_acomp_subquery),
+        possui_agendado=Exists(possui_agendado_subquery)
+    ).filter(
+        Q(possui_agendado=False),
+        Q(ultimo_acompanhamento__lt=dois_meses_atras) |
+        Q(ultimo_acompanhamento__isnull=True, data_matricula__lt=dois_meses_atras)
+    )
+    if busca:
+        alunos = alunos.filter(nome_completo__icontains=busca)
+    return alunos
+
+
+def alunos_com_resumo(busca=''):
+    """ Alunos com plano, turma atual, feedback e situação financeira, lidos da projeção AlunoResumo. """
+    alunos = com_resumo(Aluno.objects.all())
+    if busca:
+        alunos = alunos.filter(Q(nome_completo__icontains=busca) | Q(email__icontains=busca))
+    return alunos
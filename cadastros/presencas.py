@@ -0,0 +1,61 @@
+# cadastros/presencas.py
+"""
+Gravação da chamada de uma aula.
+
+Compara a chamada enviada com as presenças já gravadas e aplica só a
+diferença: cria as que faltam, atualiza as que mudaram e remove as de
+alunos que não estão mais na lista, tudo numa única transação.
+"""
+from django.db import transaction
+from django.utils import timezone
+
+from .desempenho import invalidar_desempenho
+from .exclusoes import em_lote
+from .models import Inscricao, Presenca
+
+STATUS_NA_CHAMADA = ['matriculado', 'experimental', 'acompanhando']
+
+
+def alunos_da_chamada(turma):
+    """ Ids dos alunos que entram na lista de chamada da turma. """
+    return list(
+        Inscricao.objects.filter(turma=turma, status__in=STATUS_NA_CHAMADA)
+        .values_list('aluno_id', flat=True)
+    )
+
+
+def salvar_chamada(registro_aula, presentes_ids, alunos_ids=None):
+    """
+    Grava a chamada de `registro_aula`. `presentes_ids` são os ids (texto ou
+    inteiro) marcados como presentes; `alunos_ids` é a lista de chamada
+    (por padrão, os inscritos ativos da turma).
+    Retorna um dict com as quantidades criadas, atualizadas e removidas.
+    """
+    if alunos_ids is None:
+        alunos_ids = alunos_da_chamada(registro_aula.turma_id)
+    presentes = {str(pk) for pk in presentes_ids}
+
+    existentes = {p.aluno_id: p for p in Presenca.objects.filter(registro_aula=registro_aula)}
+    novas, alteradas = [], []
+    for aluno_id in alunos_ids:
+        presente = str(aluno_id) in presentes
+        presenca = existentes.pop(aluno_id, None)
+        if presenca is None:
+            novas.append(Presenca(registro_aula=registro_aula, aluno_id=aluno_id, presente=presente))
+        elif presenca.presente != presente:
+            presenca.presente = presente
+            presenca.atualizado_em = timezone.now()
+            alteradas.append(presenca)
+
+    # O que sobrou em `existentes` é de alunos que saíram da lista de chamada
+    with transaction.atomic():
+        if novas:
+            Presenca.objects.bulk_create(novas)
+        if alteradas:
+            Presenca.objects.bulk_update(alteradas, ['presente', 'atualizado_em'])
+        if existentes:
+            with em_lote():
+                Presenca.objects.filter(pk__in=[p.pk for p in existentes.values()]).delete()
+
+    invalidar_desempenho([p.aluno_id for p in novas + alteradas] + list(existentes))
+    return {'criadas': len(novas), 'atualizadas': len(alteradas), 'removidas': len(existentes)}
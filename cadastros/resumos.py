@@ -0,0 +1,137 @@
+# cadastros/resumos.py
+"""
+Manutenção da projeção AlunoResumo.
+
+`atualizar_resumos` recalcula, numa única consulta com subqueries, os campos
+do resumo de um conjunto de alunos e grava tudo com um upsert em massa. É
+chamado pelos signals de Contrato, Pagamento, Inscricao, PesquisaSatisfacao
+e Aluno (um aluno por vez, após o commit) e de Turma (os alunos inscritos),
+pelas escritas em massa que não disparam signals e pelo comando
+reconstruir_resumos (em blocos).
+
+As listagens leem o resumo com `com_resumo()`, que expõe os mesmos nomes
+das antigas anotações (plano_contrato, turma_nome, inadimplente...) a partir
+de um único LEFT JOIN pela chave primária.
+"""
+from django.db import connection, transaction
+from django.db.models import BooleanField, Case, Exists, ExpressionWrapper, F, Min, OuterRef, Q, QuerySet, Subquery, When
+from django.utils import timezone
+
+from .models import Aluno, AlunoResumo, Contrato, Inscricao, Pagamento, PesquisaSatisfacao
+
+CAMPOS_RESUMO = [
+    'plano_contrato', 'valor_mensalidade_contrato', 'fim_contrato', 'data_ultimo_pagamento',
+    'tem_feedback', 'turma_nome', 'turma_stage', 'turma_trancada_nome', 'turma_trancada_stage',
+    'vencimento_em_aberto',
+]
+
+
+def _alunos_com_campos(alunos, hoje):
+    contrato_vigente = Contrato.objects.filter(
+        Q(aluno=OuterRef('pk')) & (Q(data_fim__gte=hoje) | Q(data_fim__isnull=True)),
+        ativo=True
+    ).order_by('-data_inicio')
+
+    ultimo_pagamento = Pagamento.objects.filter(
+        aluno=OuterRef('pk'), status='pago'
+    ).order_by('-data_pagamento').values('data_pagamento')[:1]
+
+    inscricao_atual = Inscricao.objects.filter(
+        aluno=OuterRef('pk'), status__in=['matriculado', 'experimental', 'acompanhando']
+    ).order_by('-id')
+
+    inscricao_trancada = Inscricao.objects.filter(aluno=OuterRef('pk'), status='trancado').order_by('-id')
+
+    vencimento_em_aberto = Pagamento.objects.filter(
+        aluno=OuterRef('pk'), status__in=['atrasado', 'pendente']
+    ).values('aluno').annotate(primeiro=Min('data_vencimento')).values('primeiro')
+
+    return alunos.annotate(
+        r_plano_contrato=Subquery(contrato_vigente.values('plano')[:1]),
+        r_valor_mensalidade_contrato=Subquery(contrato_vigente.values('valor_mensalidade')[:1]),
+        r_fim_contrato=Subquery(contrato_vigente.values('data_fim')[:1]),
+        r_data_ultimo_pagamento=Subquery(ultimo_pagamento),
+        r_tem_feedback=Exists(PesquisaSatisfacao.objects.filter(aluno=OuterRef('pk'))),
+        r_turma_nome=Subquery(inscricao_atual.values('turma__nome')[:1]),
+        r_turma_stage=Subquery(inscricao_atual.values('turma__stage')[:1]),
+        r_turma_trancada_nome=Subquery(inscricao_trancada.values('turma__nome')[:1]),
+        r_turma_trancada_stage=Subquery(inscricao_trancada.values('turma__stage')[:1]),
+        r_vencimento_em_aberto=Subquery(vencimento_em_aberto),
+    ).values('pk', *(f'r_{campo}' for campo in CAMPOS_RESUMO))
+
+
+def atualizar_resumos(alunos, hoje=None):
+    """
+    Recalcula e grava o resumo dos alunos informados (queryset ou lista de
+    ids). Alunos que não existem mais são ignorados. Retorna quantos foram gravados.
+    """
+    hoje = hoje or timezone.now().date()
+    if not isinstance(alunos, QuerySet):
+        alunos = Aluno.objects.filter(pk__in=list(alunos))
+
+    resumos = []
+    for linha in _alunos_com_campos(alunos.order_by(), hoje):
+        valores = {campo: linha[f'r_{campo}'] for campo in CAMPOS_RESUMO}
+        valores['plano_contrato'] = valores['plano_contrato'] or ''
+        valores['turma_nome'] = valores['turma_nome'] or ''
+        valores['turma_trancada_nome'] = valores['turma_trancada_nome'] or ''
+        resumos.append(AlunoResumo(aluno_id=linha['pk'], **valores))
+    if not resumos:
+        return 0
+
+    # O MySQL não aceita informar as colunas do conflito (usa qualquer chave única)
+    alvo = {'unique_fields': ['aluno']} if connection.features.supports_update_conflicts_with_target else {}
+    with transaction.atomic():
+        AlunoResumo.objects.bulk_create(
+            resumos, update_conflicts=True, update_fields=CAMPOS_RESUMO + ['atualizado_em'], **alvo
+        )
+    return len(resumos)
+
+
+def atualizar_resumos_em_blocos(alunos=None, tamanho=500, hoje=None):
+    """
+    Recalcula o resumo de todos os alunos do queryset (padrão: todos) em
+    blocos de `tamanho`, percorridos pela chave primária. Usado pelo gerador
+    de dados sintéticos, que grava com bulk_create e não dispara os signals.
+    Retorna quantos foram gravados.
+    """
+    hoje = hoje or timezone.now().date()
+    pks = (Aluno.objects.all() if alunos is None else alunos).order_by('pk').values_list('pk', flat=True)
+    gravados, ultimo = 0, 0
+    while bloco := list(pks.filter(pk__gt=ultimo)[:tamanho]):
+        ultimo = bloco[-1]
+        gravados += atualizar_resumos(bloco, hoje=hoje)
+    return gravados
+
+
+def agendar_atualizacao(aluno_id):
+    """ Atualiza o resumo do aluno depois do commit (exclusões em cascata já terão terminado). """
+    if aluno_id:
+        transaction.on_commit(lambda: atualizar_resumos([aluno_id]))
+
+
+def agendar_atualizacao_da_turma(turma_id):
+    """ Atualiza, depois do commit, o resumo dos alunos inscritos na turma (nome e estágio da turma). """
+    alunos = Aluno.objects.filter(pk__in=Inscricao.objects.filter(turma_id=turma_id).values('aluno_id'))
+    transaction.on_commit(lambda: atualizar_resumos_em_blocos(alunos))
+
+
+def com_resumo(alunos, hoje=None):
+    """
+    Anota os alunos com os campos do resumo, nos mesmos nomes usados pelos
+    templates. O contrato que já venceu deixa de contar como plano vigente e
+    a inadimplência é o vencimento em aberto mais antigo antes de hoje.
+    """
+    hoje = hoje or timezone.now().date()
+    contrato_vigente = Q(resumo__fim_contrato__isnull=True) | Q(resumo__fim_contrato__gte=hoje)
+    return alunos.annotate(
+        plano_contrato=Case(When(contrato_vigente, then=F('resumo__plano_contrato')), default=None),
+        valor_mensalidade_contrato=Case(When(contrato_vigente, then=F('resumo__valor_mensalidade_contrato')), default=None),
+        data_ultimo_pagamento=F('resumo__data_ultimo_pagamento'),
+        tem_feedback=F('resumo__tem_feedback'),
+        turma_nome=F('resumo__turma_nome'),
+        turma_stage=F('resumo__turma_stage'),
+        turma_trancada_nome=F('resumo__turma_trancada_nome'),
+        turma_trancada_stage=F('resumo__turma_trancada_stage'),
+        inadimplente=ExpressionWrapper(Q(resumo__vencimento_em_aberto__lt=hoje), output_field=BooleanField()),
+    )
@@ -1,7 +1,11 @@
 # cadastros/signals.py
-from django.db.models.signals import post_save
+from django.db.models.signals import post_save, post_delete
 from django.dispatch import receiver
-from .models import Aluno, Inscricao
+from .models import Aluno, Inscricao, Pagamento, Contrato, AcompanhamentoFalta, AcompanhamentoPedagogico, PesquisaSatisfacao, Presenca, AlunoProva, RegistroAula, Turma
+from . import exclusoes
+from .desempenho import invalidar_desempenho
+from .paineis import invalidar_paineis
+from .resumos import agendar_atualizacao, agendar_atualizacao_da_turma
 from django.db.models import Q 
 from django.contrib.auth.models import User # <-- Novo import para a criação de usuários
 
@@ -58,4 +62,81 @@ def criar_usuario_aluno(sender, instance, created, **kwargs):
             )
             
             # Vincula o novo usuário ao perfil do aluno e salva sem disparar os signals novamente em loop
-            Aluno.objects.filter(pk=instance.pk).update(usuario=novo_usuario)
\ No newline at end of file
+            Aluno.objects.filter(pk=instance.pk).update(usuario=novo_usuario)
+
+
+# ==============================================================================
+# Cache dos painéis do dashboard administrativo (cadastros/paineis.py)
+# ==============================================================================
+@receiver([post_save, post_delete], sender=Pagamento)
+@receiver([post_save, post_delete], sender=Contrato)
+@receiver([post_save, post_delete], sender=Inscricao)
+@receiver([post_save, post_delete], sender=AcompanhamentoFalta)
+@receiver([post_save, post_delete], sender=AcompanhamentoPedagogico)
+@receiver([post_save, post_delete], sender=Aluno)
+def invalidar_cache_paineis(sender, **kwargs):
+    """
+    Qualquer alteração nos modelos exibidos no dashboard invalida os painéis.
+    Aluno entra na lista por causa do rodízio pedagógico (status e nome).
+    """
+    invalidar_paineis()
+
+
+# ==============================================================================
+# Projeção AlunoResumo (cadastros/resumos.py)
+# ==============================================================================
+@receiver([post_save, post_delete], sender=Contrato)
+@receiver([post_save, post_delete], sender=Pagamento)
+@receiver([post_save, post_delete], sender=Inscricao)
+@receiver([post_save, post_delete], sender=PesquisaSatisfacao)
+def atualizar_resumo_aluno(sender, instance, **kwargs):
+    """
+    Recalcula o resumo do aluno afetado após o commit. Escritas em massa
+    (update/bulk_create) não passam por aqui e atualizam o resumo diretamente.
+    """
+    agendar_atualizacao(instance.aluno_id)
+
+
+@receiver(post_save, sender=Aluno)
+def criar_resumo_aluno(sender, instance, **kwargs):
+    """
+    Cria o resumo dos novos alunos e reflete a sincronização de status das
+    inscrições (sincronizar_status_inscricao usa update()).
+    """
+    agendar_atualizacao(instance.pk)
+
+
+@receiver(post_save, sender=Turma)
+def atualizar_resumos_da_turma(sender, instance, created, **kwargs):
+    """
+    O resumo copia nome e estágio da turma atual/trancada de cada aluno
+    inscrito (renomear a turma precisa refletir na lista de alunos).
+    """
+    if not created:
+        agendar_atualizacao_da_turma(instance.pk)
+
+
+# ==============================================================================
+# Gráficos de desempenho do aluno (cadastros/desempenho.py)
+# ==============================================================================
+@receiver([post_save, post_delete], sender=Presenca)
+@receiver([post_save, post_delete], sender=AlunoProva)
+def invalidar_cache_desempenho(sender, instance, **kwargs):
+    """ A chamada em massa (presencas.salvar_chamada) invalida diretamente. """
+    invalidar_desempenho([instance.aluno_id])
+
+
+# ==============================================================================
+# Exclusões para a exportação incremental (?since=, ver cadastros/exportacao.py)
+# ==============================================================================
+@receiver(post_delete, sender=Aluno)
+@receiver(post_delete, sender=Contrato)
+@receiver(post_delete, sender=Pagamento)
+@receiver(post_delete, sender=RegistroAula)
+@receiver(post_delete, sender=Presenca)
+def registrar_exclusao(sender, instance, **kwargs):
+    """
+    Também vale para exclusões em cascata e queryset.delete(), que disparam o
+    signal por objeto; dentro de exclusoes.em_lote() as marcas saem num único INSERT.
+    """
+    exclusoes.registrar(sender, instance.pk)
@@ -1,3 +1,46 @@
+import csv
+from datetime import date, timedelta
+
+from django.contrib.auth.models import User
 from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from .models import Aluno, Contrato, Pagamento
+
+
+class QuitacaoEmLoteExportacaoIncrementalTests(TestCase):
+    """ A quitação em lote precisa aparecer na exportação ?since= (atualizado_em). """
+
+    def setUp(self):
+        self.client.force_login(User.objects.create_user('admin_teste', is_staff=True))
+        self.aluno = Aluno.objects.create(nome_completo='Aluno Trancado')
+        contrato = Contrato.objects.create(
+            aluno=self.aluno, plano='flex', data_inicio=date(2026, 1, 1), valor_mensalidade=300, status='trancado',
+        )
+        self.pagamento = Pagamento.objects.create(
+            aluno=self.aluno, contrato=contrato, tipo='mensalidade', descricao='Mensalidade Teste', valor=300,
+            mes_referencia=date(2026, 9, 1), data_vencimento=date(2026, 9, 30),
+        )
+        # Tudo "antigo": só o que a quitação alterar deve sair no ?since=
+        antes = timezone.now() - timedelta(days=1)
+        Pagamento.objects.filter(pk=self.pagamento.pk).update(atualizado_em=antes)
+        Aluno.objects.filter(pk=self.aluno.pk).update(atualizado_em=antes)
+        self.since = (timezone.localtime() - timedelta(hours=1)).strftime('%Y-%m-%dT%H:%M:%S')
+
+    def exportar(self, nome_url):
+        response = self.client.get(reverse(nome_url), {'since': self.since})
+        self.assertEqual(response.status_code, 200)
+        conteudo = b''.join(response.streaming_content).decode('utf-8-sig')
+        return [linha[0] for linha in list(csv.reader(conteudo.splitlines()))[1:]]
+
+    def test_pagamento_quitado_em_lote_sai_na_exportacao_incremental(self):
+        self.assertNotIn(str(self.pagamento.pk), self.exportar('cadastros:exportar_pagamentos_csv'))
+
+        self.client.post(reverse('cadastros:pagamentos_bulk'), {'ids': [self.pagamento.pk], 'action': 'quitar'})
 
-# Create your tests here.
+        self.pagamento.refresh_from_db()
+        self.assertEqual(self.pagamento.status, 'pago')
+        self.assertIn(str(self.pagamento.pk), self.exportar('cadastros:exportar_pagamentos_csv'))
+        # O crédito do contrato trancado também altera o aluno
+        self.assertIn(str(self.aluno.pk), self.exportar('cadastros:exportar_alunos_csv'))
@@ -6,6 +6,9 @@ from . import views_leads_public
 from . import views_leads_descarte
 from . import views_leads_match
 from . import views_alunos_public
+from . import views_metricas
+from . import views_paineis
+from . import views_webhook
 from .forms import MyPasswordChangeForm
 
 app_name = 'cadastros'
@@ -75,6 +78,7 @@ urlpatterns = [
     path('leads/disponibilidade/<uuid:token>/', views_leads_public.coletar_disponibilidade_lead, name='coletar_disponibilidade_lead'),
     path('leads/descartar/', views_leads_descarte.descartar_lead, name='descartar_lead'),
     path('leads/match/', views_leads_match.dashboard_match_horarios, name='dashboard_match_horarios'),
+    path('webhook/whatsapp/', views_webhook.whatsapp_webhook, name='whatsapp_webhook'),
 
     # Rotas de Turmas
     path('turma/<int:pk>/', views.detalhe_turma, name='detalhe_turma'),
@@ -95,12 +99,19 @@ urlpatterns = [
 
     # Rotas para Exportação
     path('exportar/', views.exportar_dados_page, name='exportar_dados_page'),
+    path('exportar/solicitar/', views.solicitar_exportacao, name='solicitar_exportacao'),
+    path('exportar/tarefas/<int:pk>/baixar/', views.baixar_exportacao, name='baixar_exportacao'),
     path('exportar/contratos/', views.exportar_contratos_csv, name='exportar_contratos_csv'),
     path('exportar/pagamentos/', views.exportar_pagamentos_csv, name='exportar_pagamentos_csv'),
+    path('exportar/registros-aula/', views.exportar_registros_aula_csv, name='exportar_registros_aula_csv'),
+    path('exportar/presencas/', views.exportar_presencas_csv, name='exportar_presencas_csv'),
+    path('exportar/alunos/', views.exportar_alunos_csv, name='exportar_alunos_csv'),
+    path('exportar/exclusoes/', views.exportar_exclusoes_csv, name='exportar_exclusoes_csv'),
     path('exportar/registros-aula-por-turma/', views.exportar_registros_aula_por_turma_zip, name='exportar_registros_aula_por_turma_zip'),
     
     # --- LINHA ADICIONADA ---
     path('exportar/acompanhamentos/', views.exportar_acompanhamentos_csv, name='exportar_acompanhamentos_csv'),
+    path('exportar/pacote-analitico/', views.exportar_pacote_analitico, name='exportar_pacote_analitico'),
     
     # Relatórios
     path('relatorios/professores/', views.relatorio_pagamento_professores, name='relatorio_professores'),
@@ -131,6 +142,9 @@ urlpatterns = [
     path('dashboard/marketing/', views.dashboard_marketing, name='dashboard_marketing'),
     path('dashboard/feedback/', views.dashboard_feedback, name='dashboard_feedback'),
     path('dashboard/saude/', views.dashboard_saude_view, name='dashboard_saude'),
+    path('dashboard/saude/fechar-mes/', views.fechar_mes_financeiro, name='fechar_mes_financeiro'),
+    path('dashboard/desempenho/', views_metricas.metricas_desempenho, name='metricas_desempenho'),
+    path('paineis/<slug:nome>/', views_paineis.painel_dados, name='painel_dados'),
 
     # Rotas de Envio de Emails
     path('enviar-email/', views.enviar_email_alunos, name='enviar_email_alunos'),
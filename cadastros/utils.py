@@ -0,0 +1,37 @@
+# cadastros/utils.py
+import calendar
+from datetime import date
+
+
+def intervalo_mes(ano, mes):
+    """
+    Primeiro e último dia do mês, para filtrar com `__range`.
+    Ao contrário de `__year`/`__month`, que aplicam funções sobre a coluna,
+    o intervalo permite ao banco usar os índices de data.
+    """
+    ano, mes = int(ano), int(mes)
+    return date(ano, mes, 1), date(ano, mes, calendar.monthrange(ano, mes)[1])
+
+
+def normalizar_telefone(telefone):
+    """
+    Forma canônica E.164 (+5511987654321) de um telefone digitado livremente,
+    usada nas buscas por igualdade (coluna indexada telefone_normalizado).
+
+    Sem DDI, assume o Brasil (55). Celulares brasileiros sem o nono dígito,
+    como o WhatsApp costuma enviar (5511 8765-4321), ganham o 9 para que as
+    duas formas do mesmo número coincidam. Números sem DDD não são
+    normalizados (retorna None): não dá para saber de onde são.
+    """
+    digitos = ''.join(filter(str.isdigit, telefone or '')).lstrip('0')
+    if (telefone or '').strip().startswith('+') and not digitos.startswith('55'):
+        # Número estrangeiro com DDI explícito: mantém como veio
+        return f'+{digitos}' if 8 <= len(digitos) <= 15 else None
+    if len(digitos) in (10, 11):
+        digitos = '55' + digitos
+    elif not (len(digitos) in (12, 13) and digitos.startswith('55')):
+        return None
+    ddd, numero = digitos[2:4], digitos[4:]
+    if len(numero) == 8 and numero[0] in '6789':
+        numero = '9' + numero
+    return f'+55{ddd}{numero}'
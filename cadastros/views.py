@@ -1,7 +1,19 @@
 # cadastros/views.py
 from django.core.paginator import Paginator
 from django.contrib.auth.decorators import login_required
-from .models import Turma, Inscricao, RegistroAula, Professor, Presenca, Pagamento, Contrato, AcompanhamentoFalta, Aluno, Inscricao, RegistroAula, Presenca, Lead, TokenAtualizacaoAluno, AcompanhamentoPedagogico, AlunoProva, Questao, ProvaTemplate, RespostaAluno, PesquisaSatisfacao, AvaliacaoProfessor, AvaliacaoAdministrativo, AvaliacaoPedagogico, FollowUp, Despesa
+from .models import Turma, Inscricao, RegistroAula, Professor, Presenca, Pagamento, Contrato, AcompanhamentoFalta, Aluno, Inscricao, RegistroAula, Presenca, Lead, TokenAtualizacaoAluno, AcompanhamentoPedagogico, AlunoProva, Questao, ProvaTemplate, RespostaAluno, PesquisaSatisfacao, AvaliacaoProfessor, AvaliacaoAdministrativo, AvaliacaoPedagogico, FollowUp, Despesa, TarefaExportacao
+from .desempenho import ultimos_meses
+from .exportacao import (
+    EXPORTACOES, exportar_csv, exportar_exclusoes, ler_desde, linhas_exportacao, resposta_csv, resposta_pacote_analitico,
+    resposta_zip_registros_por_turma,
+)
+from .exclusoes import em_lote
+from .faltas import atualizar_sequencias_da_aula
+from .metricas import calcular_metricas, fechar_meses, janela_anterior, janelas_mensais
+from .paineis import invalidar_paineis, painel
+from .resumos import atualizar_resumos, com_resumo
+from .presencas import alunos_da_chamada, salvar_chamada
+from .utils import intervalo_mes
 from .forms import (
     AlunoForm, PagamentoForm, AlunoExperimentalForm, ContratoForm, 
     RegistroAulaForm, LeadForm, AcompanhamentoPedagogicoForm, 
@@ -19,7 +31,8 @@ from django.views.decorators.http import require_POST
 from django.shortcuts import get_object_or_404, render, redirect
 import csv
 from django.utils.encoding import smart_str
-from django.http import HttpResponse, HttpResponseRedirect, JsonResponse
+import uuid
+from django.http import FileResponse, Http404, HttpResponse, HttpResponseBadRequest, HttpResponseRedirect, JsonResponse
 from django.urls import reverse
 from django.contrib import messages
 from django.db.models.functions import ExtractWeek
@@ -33,8 +46,6 @@ from django import forms
 from django.db import transaction
 from django.utils.html import format_html
 import json
-import io
-import zipfile
 from .decorators import admin_required, professor_required, aluno_required
 from django.db.models import Avg, FloatField, Case, When
 from django.db.models.functions import Cast
@@ -118,16 +129,9 @@ def detalhe_turma(request, pk):
                 novo_registro = RegistroAula.objects.create(**dados_aula)
 
             # 4. A lógica de presença é executada DEPOIS
-            alunos_presentes_ids = request.POST.getlist('presenca')
-            todos_os_inscritos = list(turma.inscricao_set.filter(status__in=['matriculado', 'experimental', 'acompanhando']))
-            
-            Presenca.objects.filter(registro_aula=novo_registro).delete() # Limpa presenças antigas, se houver
-            
-            for inscricao in todos_os_inscritos:
-                Presenca.objects.create(
-                    registro_aula=novo_registro, aluno=inscricao.aluno,
-                    presente=(str(inscricao.aluno.pk) in alunos_presentes_ids)
-                )
+            # Se a aula já tinha chamada (plano salvo de novo), só a diferença é gravada
+            salvar_chamada(novo_registro, request.POST.getlist('presenca'), alunos_da_chamada(turma))
+            atualizar_sequencias_da_aula(novo_registro)
 
         # --- Lógica para 'salvar_aula_atrasada' ---
         elif 'salvar_aula_atrasada' in request.POST:
@@ -157,13 +161,8 @@ def detalhe_turma(request, pk):
                 lesson_check=request.POST.get('lesson_check_atrasada'),
             )
             
-            alunos_presentes_ids = request.POST.getlist('presenca_atrasada')
-            todos_os_inscritos = list(turma.inscricao_set.filter(status__in=['matriculado', 'experimental', 'acompanhando']))
-            for inscricao in todos_os_inscritos:
-                Presenca.objects.create(
-                    registro_aula=novo_registro, aluno=inscricao.aluno,
-                    presente=(str(inscricao.aluno.pk) in alunos_presentes_ids)
-                )
+            salvar_chamada(novo_registro, request.POST.getlist('presenca_atrasada'), alunos_da_chamada(turma))
+            atualizar_sequencias_da_aula(novo_registro)
         
         # --- Lógica para 'salvar_plano_aula' ---
         elif 'salvar_plano_aula' in request.POST:
@@ -231,8 +230,7 @@ def detalhe_turma(request, pk):
 
     historico_aulas = RegistroAula.objects.filter(
         turma=turma,
-        data_aula__year=ano_selecionado, 
-        data_aula__month=mes_selecionado,
+        data_aula__range=intervalo_mes(ano_selecionado, mes_selecionado),
         data_aula__lte=hoje
     ).select_related('professor').prefetch_related(
         'presenca_set__aluno'
@@ -263,8 +261,7 @@ def detalhe_turma(request, pk):
 
     faltas_do_mes = Presenca.objects.filter(
         registro_aula__turma=turma,
-        registro_aula__data_aula__year=ano_selecionado,
-        registro_aula__data_aula__month=mes_selecionado,
+        registro_aula__data_aula__range=intervalo_mes(ano_selecionado, mes_selecionado),
         presente=False
     ).values(
         'aluno__nome_completo'
@@ -341,19 +338,8 @@ def dashboard_admin(request):
     data_limite_renovacao = hoje + timedelta(days=30)
 
     # --- Consultas otimizadas ---
-    pagamentos_pendentes = Pagamento.objects.filter(
-        status__in=['pendente', 'parcial', 'atrasado'],
-        mes_referencia__year=ano_selecionado,
-        mes_referencia__month=mes_selecionado
-    ).select_related('aluno', 'contrato')
-
-    pagamentos_pagos = Pagamento.objects.filter(
-        status='pago',
-        mes_referencia__year=ano_selecionado,
-        mes_referencia__month=mes_selecionado
-    ).select_related('aluno', 'contrato')
-
-    data_limite_renovacao = hoje + timedelta(days=30)
+    # Cobranças do mês e rodízio pedagógico são carregados pela própria página,
+    # página a página, a partir dos endpoints em views_paineis.py
     contratos_a_vencer = Contrato.objects.filter(
         ativo=True, 
         data_fim__gte=hoje, 
@@ -386,54 +372,19 @@ def dashboard_admin(request):
         status='experimental'
     ).select_related('aluno', 'turma')
 
-    # --- Lógica de Rodízio de Acompanhamentos no Dashboard ---
-    dois_meses_atras = hoje - timedelta(days=60)
-    
-    ultimo_acomp_subquery = AcompanhamentoPedagogico.objects.filter(
-        aluno=OuterRef('pk'), status='realizado'
-    ).order_by('-data').values('data')[:1]
-
-    possui_agendado_subquery = AcompanhamentoPedagogico.objects.filter(
-        aluno=OuterRef('pk'), status='agendado'
-    )
-
-    alunos_precisam_acompanhamento = Aluno.objects.filter(status='ativo').annotate(
-        ultimo_acompanhamento=Subquery(ultimo_acomp_subquery),
-        possui_agendado=Exists(possui_agendado_subquery)
-    ).filter(
-        Q(possui_agendado=False),
-        Q(ultimo_acompanhamento__lt=dois_meses_atras) | 
-        Q(ultimo_acompanhamento__isnull=True, data_matricula__lt=dois_meses_atras)
-    ).order_by('ultimo_acompanhamento', 'nome_completo')
-
-    # Aplicar filtros adicionais se existirem
-    if turma_filtrada_id:
-        alunos_da_turma = Inscricao.objects.filter(turma__id=turma_filtrada_id).values_list('aluno__id', flat=True)
-        pagamentos_pendentes = pagamentos_pendentes.filter(aluno__id__in=alunos_da_turma)
-        pagamentos_pagos = pagamentos_pagos.filter(aluno__id__in=alunos_da_turma)
-
-    if tipo_filtrado:
-        pagamentos_pendentes = pagamentos_pendentes.filter(tipo=tipo_filtrado)
-        pagamentos_pagos = pagamentos_pagos.filter(tipo=tipo_filtrado)
-
-    pagamentos_pendentes = pagamentos_pendentes.order_by('aluno__nome_completo')
-    pagamentos_pagos = pagamentos_pagos.order_by('-data_pagamento')
-
     # Preparar headers para as tabelas
     headers_renovacoes = ["Aluno", "Telefone", "Plano", "Fim do Contrato", "Status"]
     headers_experimentais = ["Aluno", "Telefone", "Turma", "Ações"]
     headers_pendentes = ["","Aluno", "Telefone", "Descrição", "Valor Restante", "Vencimento", "Status", "Ação Rápida"]
     headers_recebidos = ["Aluno", "Descrição", "Valor", "Data Pagamento", "Ações"]
 
+    # Os painéis vêm do cache enquanto nada relevante mudar (ver cadastros/paineis.py)
     context = {
-        'pagamentos_pendentes': pagamentos_pendentes,
-        'pagamentos_pagos': pagamentos_pagos,
         'data_selecionada': data_selecionada,
-        'contratos_a_vencer': contratos_a_vencer,
-        'contratos_vencidos': contratos_vencidos_sem_renovacao,
-        'acompanhamentos_pendentes': acompanhamentos_pendentes,
-        'inscricoes_experimentais': inscricoes_experimentais,
-        'alunos_precisam_acompanhamento': alunos_precisam_acompanhamento,
+        'contratos_a_vencer': painel('contratos_a_vencer', contratos_a_vencer),
+        'contratos_vencidos': painel('contratos_vencidos', contratos_vencidos_sem_renovacao),
+        'acompanhamentos_pendentes': painel('acompanhamentos_pendentes', acompanhamentos_pendentes),
+        'inscricoes_experimentais': painel('inscricoes_experimentais', inscricoes_experimentais),
         'nav': {
             'mes_anterior': mes_anterior, 
             'ano_anterior': ano_anterior,
@@ -450,6 +401,13 @@ def dashboard_admin(request):
         "headers_experimentais": headers_experimentais,
         "headers_pendentes": headers_pendentes,
         "headers_recebidos": headers_recebidos,
+        # Parâmetros dos painéis carregados sob demanda (static/cadastros/paineis.js)
+        'params_financeiro': json.dumps({
+            'ano': ano_selecionado, 'mes': mes_selecionado,
+            'turma': turma_filtrada_id or '', 'tipo': tipo_filtrado or '',
+            'voltar': request.get_full_path(),
+        }),
+        'params_rodizio': json.dumps({'voltar': request.get_full_path()}),
     }
 
     return render(request, 'cadastros/dashboard.html', context)
@@ -518,8 +476,7 @@ def relatorio_pagamento_professores(request):
     # --- Parte 2: Nova Consulta ao Banco de Dados ---
     # Agora, extraímos o número da semana e agrupamos por professor E por semana.
     relatorio_flat = RegistroAula.objects.filter(
-        data_aula__year=ano_selecionado,
-        data_aula__month=mes_selecionado
+        data_aula__range=intervalo_mes(ano_selecionado, mes_selecionado)
     ).annotate(
         semana=ExtractWeek('data_aula')  # Extrai o número da semana do ano
     ).values(
@@ -580,30 +537,45 @@ def venda_livro(request):
         aluno = get_object_or_404(Aluno, pk=aluno_id)
         valor_parcela = round(valor_total / numero_parcelas, 2)
         hoje = timezone.now().date()
+        # Identifica esta venda: cada carregamento do formulário traz um novo id,
+        # então só o reenvio do mesmo formulário repete as chaves das parcelas
+        venda_id = request.POST.get('venda_id') or uuid.uuid4().hex
 
-        # Loop para criar uma cobrança para cada parcela nos meses seguintes
+        # Monta uma cobrança para cada parcela nos meses seguintes
+        parcelas = []
         for i in range(numero_parcelas):
             # Calcula o mês de referência e vencimento para cada parcela
             mes_futuro = hoje + relativedelta(months=i)
             ultimo_dia_futuro = calendar.monthrange(mes_futuro.year, mes_futuro.month)[1]
             data_vencimento_parcela = mes_futuro.replace(day=ultimo_dia_futuro)
 
-            Pagamento.objects.create(
+            parcelas.append(Pagamento(
                 aluno=aluno,
                 tipo='material',
                 descricao=f"{descricao} (Parcela {i + 1}/{numero_parcelas})",
                 valor=valor_parcela,
                 mes_referencia=mes_futuro,
                 data_vencimento=data_vencimento_parcela,
-                status='pendente'
-            )
-        
+                status='pendente',
+                chave_cobranca=Pagamento.gerar_chave_cobranca(
+                    f"a{aluno.pk}", 'material', mes_futuro, f"{i + 1}/{numero_parcelas}", venda_id[:32]
+                ),
+            ))
+
+        # Um duplo envio do formulário gera as mesmas chaves e é ignorado pelo banco
+        Pagamento.objects.bulk_create(parcelas, ignore_conflicts=True)
+        invalidar_paineis()
+        atualizar_resumos([aluno.pk])
+        gravadas = Pagamento.objects.filter(chave_cobranca__in=[p.chave_cobranca for p in parcelas]).count()
+        messages.success(request, f'Venda de "{descricao}" para {aluno.nome_completo} registrada em {gravadas} parcela(s).')
+
         return redirect('cadastros:dashboard_admin')
 
     # Lógica GET: Apenas exibe o formulário
     alunos = Aluno.objects.filter(status='ativo').order_by('nome_completo')
     context = {
         'alunos': alunos,
+        'venda_id': uuid.uuid4().hex,
     }
     return render(request, 'cadastros/venda_livro_form.html', context)
 
@@ -625,7 +597,7 @@ def pagamentos_bulk(request):
             p.status = 'pago'
             if not p.data_pagamento:
                 p.data_pagamento = hoje
-            p.save(update_fields=['valor_pago', 'status', 'data_pagamento'])
+            p.save(update_fields=['valor_pago', 'status', 'data_pagamento', 'atualizado_em'])
 
     # Redireciona de volta para o mês/filtros atuais se for seguro
     if next_url and url_has_allowed_host_and_scheme(next_url, allowed_hosts={request.get_host()}):
@@ -650,16 +622,7 @@ def quitar_pagamento_especifico(request, pk):
 @login_required
 @admin_required
 def perfil_aluno(request, pk):
-    aluno = get_object_or_404(
-        Aluno.objects.prefetch_related(
-            'contratos',
-            'pagamentos',
-            'acompanhamentos',
-            'presenca_set__registro_aula__turma',
-            'inscricao_set__turma'
-        ), 
-        pk=pk
-    )
+    aluno = get_object_or_404(Aluno.objects.select_related('usuario'), pk=pk)
 
     contrato_ativo = (Contrato.objects
                       .filter(aluno=aluno, ativo=True)
@@ -691,43 +654,15 @@ def perfil_aluno(request, pk):
     )
 
     # --- LÓGICA DO GRÁFICO HÍBRIDO (BARRAS + LINHA) ---
-    dados_grafico = []
-    hoje = timezone.now().date()
-    
-    for i in range(5, -1, -1):
-        mes_data = hoje - relativedelta(months=i)
-        mes_inicio = mes_data.replace(day=1)
-        # Último dia do mês
-        mes_fim = mes_inicio + relativedelta(months=1) - timedelta(days=1)
-        
-        # 1. Frequência (Barras)
-        presencas_mes = Presenca.objects.filter(
-            aluno=aluno,
-            registro_aula__data_aula__range=[mes_inicio, mes_fim]
-        ).aggregate(
-            total=Count('id'),
-            presentes=Count('id', filter=Q(presente=True))
-        )
-        total_m = presencas_mes['total'] or 0
-        pres_m = presencas_mes['presentes'] or 0
-        freq_pct = (pres_m / total_m * 100) if total_m > 0 else 0
-        
-        # 2. Notas (Linha) - Média percentual das provas do mês
-        # Calculamos (nota_final / pontuacao_total * 100) para cada prova e tiramos a média
-        provas_mes = AlunoProva.objects.filter(
-            aluno=aluno,
-            data_realizacao__range=[mes_inicio, mes_fim],
-            status='finalizada'
-        ).aggregate(media=Avg('nota_final'))
-        
-        # Se não houver provas, a média vem None, então tratamos para 0 ou None
-        nota_media = provas_mes['media'] if provas_mes['media'] is not None else 0
-
-        dados_grafico.append({
-            'mes': mes_inicio.strftime('%b'),
-            'freq': round(freq_pct, 1),
-            'nota': round(float(nota_media), 1) # Convertemos Decimal para float para o JSON
-        })
+    # Frequência (barras) e média das provas finalizadas (linha) dos últimos 6 meses
+    dados_grafico = [
+        {
+            'mes': serie['mes'].strftime('%b'),
+            'freq': serie['frequencia'],
+            'nota': serie['nota'] or 0,
+        }
+        for serie in ultimos_meses(aluno.pk)
+    ]
 
     # Todas as turmas para o modal de adicionar
     todas_turmas = Turma.objects.all().order_by('nome')
@@ -752,33 +687,9 @@ def perfil_aluno(request, pk):
 @admin_required
 def exportar_pagamentos_aluno(request, pk):
     aluno = get_object_or_404(Aluno, pk=pk)
-    qs = (Pagamento.objects
-          .filter(aluno=aluno)
-          .order_by('-data_vencimento'))
-
-    response = HttpResponse(content_type='text/csv; charset=utf-8')
+    exportacao = EXPORTACOES['pagamentos_aluno']
     filename = f"pagamentos_{aluno.nome_completo.replace(' ', '_')}.csv"
-    response['Content-Disposition'] = f'attachment; filename="{filename}"'
-
-    writer = csv.writer(response)
-    writer.writerow([
-        'Aluno', 'Descrição', 'Tipo', 'Valor', 'Status',
-        'Mês de Referência', 'Vencimento', 'Data Pagamento', 'Valor Pago', 'Contrato ID'
-    ])
-    for p in qs:
-        writer.writerow([
-            smart_str(aluno.nome_completo),
-            smart_str(p.descricao),
-            p.get_tipo_display(),
-            f"{p.valor:.2f}",
-            p.get_status_display(),
-            p.mes_referencia.strftime("%Y-%m-%d") if p.mes_referencia else "",
-            p.data_vencimento.strftime("%Y-%m-%d") if p.data_vencimento else "",
-            p.data_pagamento.strftime("%Y-%m-%d") if p.data_pagamento else "",
-            f"{p.valor_pago:.2f}",
-            p.contrato_id or "",
-        ])
-    return response
+    return resposta_csv(filename, exportacao['cabecalho'], linhas_exportacao('pagamentos_aluno', Q(aluno=aluno)))
 
 @login_required
 @admin_required
@@ -863,79 +774,15 @@ def relatorio_alunos_pendentes(request):
 @login_required
 @admin_required
 def lista_alunos(request):
-    # Usamos Subquery para buscar informações de outros modelos de forma eficiente,
-    # evitando o problema de N+1 queries.
-
-    contrato_ativo_plano = Contrato.objects.filter(
-        Q(aluno=OuterRef('pk')) & (Q(data_fim__gte=timezone.now()) | Q(data_fim__isnull=True)),
-        ativo=True
-    ).order_by('-data_inicio').values('plano')[:1]
-
-    contrato_ativo_valor = Contrato.objects.filter(
-        Q(data_fim__gte=timezone.now()) | Q(data_fim__isnull=True),
-        aluno=OuterRef('pk'), 
-        ativo=True
-    ).order_by('-data_inicio').values('valor_mensalidade')[:1]
-    
-    ultimo_pagamento = Pagamento.objects.filter(
-        aluno=OuterRef('pk'),
-        status='pago'
-    ).order_by('-data_pagamento').values('data_pagamento')[:1]
-
-    pesquisa_respondida = PesquisaSatisfacao.objects.filter(
-        aluno=OuterRef('pk')
-    )
-    
-    turma_atual = Inscricao.objects.filter(
-        aluno=OuterRef('pk'), 
-        status__in=['matriculado', 'experimental', 'acompanhando']
-    ).order_by('-id').values('turma__nome')[:1]
-    
-    stage_atual = Inscricao.objects.filter(
-        aluno=OuterRef('pk'), 
-        status__in=['matriculado', 'experimental', 'acompanhando']
-    ).order_by('-id').values('turma__stage')[:1]
-    
-    tem_atraso = Pagamento.objects.filter(
-        aluno=OuterRef('pk'), 
-        status__in=['atrasado', 'pendente'],
-        data_vencimento__lt=timezone.now().date()
-    )
-
-    alunos = Aluno.objects.annotate(
-        plano_contrato=Subquery(contrato_ativo_plano),
-        valor_mensalidade_contrato=Subquery(contrato_ativo_valor),
-        data_ultimo_pagamento=Subquery(ultimo_pagamento),
-        tem_feedback=Exists(pesquisa_respondida),
-        turma_nome=Subquery(turma_atual),
-        turma_stage=Subquery(stage_atual),
-        inadimplente=Exists(tem_atraso)
-    ).order_by('nome_completo')
-
-    context = {
-        'alunos': alunos,
-    }
-    return render(request, 'cadastros/lista_alunos.html', context)
+    # A página é só a casca: as linhas vêm do painel 'alunos' (views_paineis.py),
+    # página a página, com busca e ordenação no servidor
+    return render(request, 'cadastros/lista_alunos.html')
 
 @login_required
 @admin_required
 def lista_alunos_trancados(request):
-    # Subqueries similares à lista_alunos para mostrar informações úteis
-    turma_anterior = Inscricao.objects.filter(
-        aluno=OuterRef('pk'), 
-        status='trancado'
-    ).order_by('-id').values('turma__nome')[:1]
-    
-    stage_anterior = Inscricao.objects.filter(
-        aluno=OuterRef('pk'), 
-        status='trancado'
-    ).order_by('-id').values('turma__stage')[:1]
-
-    # Alunos com status trancado
-    alunos_trancados = Aluno.objects.filter(status='trancado').annotate(
-        turma_nome=Subquery(turma_anterior),
-        turma_stage=Subquery(stage_anterior)
-    ).order_by('nome_completo')
+    # Turma de antes do trancamento e demais dados vêm da projeção AlunoResumo
+    alunos_trancados = com_resumo(Aluno.objects.filter(status='trancado')).order_by('nome_completo')
 
     context = {
         'alunos': alunos_trancados,
@@ -978,11 +825,16 @@ def pagamentos_acoes_em_lote(request):
         queryset = Pagamento.objects.filter(pk__in=pagamento_ids)
 
         if acao == 'quitar':
+            alunos_ids = set(queryset.values_list('aluno_id', flat=True))
             queryset.update(
                 status='pago',
                 valor_pago=F('valor'), # Define o valor pago igual ao valor total da cobrança
-                data_pagamento=timezone.now().date()
+                data_pagamento=timezone.now().date(),
+                atualizado_em=timezone.now(),  # update() não preenche o auto_now
             )
+            # update() não dispara signals: atualiza o cache dos painéis e os resumos aqui
+            invalidar_paineis()
+            atualizar_resumos(alunos_ids)
             messages.success(request, f'{len(pagamento_ids)} pagamento(s) foram quitados com sucesso.')
         
         # Aqui podemos adicionar outras ações no futuro (ex: elif acao == 'cancelar': ...)
@@ -1006,8 +858,11 @@ def quitar_dividas_aluno(request, pk):
     pagamentos_pendentes.update(
         status='pago',
         valor_pago=F('valor'),
-        data_pagamento=timezone.now().date()
+        data_pagamento=timezone.now().date(),
+        atualizado_em=timezone.now(),
     )
+    invalidar_paineis()
+    atualizar_resumos([aluno.pk])
     
     messages.success(request, f'Todas as pendências de {aluno.nome_completo} foram quitadas.')
     
@@ -1042,6 +897,10 @@ def novo_aluno_experimental(request):
                     pass # Se o lead não for encontrado, não faz nada
             else:
                 messages.success(request, f'Aluno(a) {aluno.nome_completo} cadastrado(a) como experimental.')
+                if aluno.telefone_normalizado:
+                    lead = Lead.objects.filter(telefone_normalizado=aluno.telefone_normalizado).first()
+                    if lead:
+                        messages.info(request, f'O telefone do(a) aluno(a) corresponde ao lead "{lead.nome_completo}" ({lead.get_status_display()}).')
 
             return redirect('cadastros:dashboard_admin')
     else:
@@ -1073,6 +932,8 @@ def criar_contrato(request, aluno_pk):
             # A MÁGICA DA AUTOMAÇÃO ACONTECE AQUI:
             # Busca a inscrição experimental do aluno e atualiza o status para 'matriculado'
             Inscricao.objects.filter(aluno=aluno, status='experimental').update(status='matriculado')
+            invalidar_paineis()
+            atualizar_resumos([aluno.pk])
 
             messages.success(request, f'Contrato criado para {aluno.nome_completo}. Status atualizado para "Matriculado".')
             return redirect('cadastros:perfil_aluno', pk=aluno.pk) # Redireciona para o perfil do aluno
@@ -1130,22 +991,9 @@ def editar_registro_aula(request, pk):
             # ▼▼▼ LÓGICA ADICIONADA (TAREFA 2) ▼▼▼
             # =====================================================
             
-            # 2. Recria os registros de presença
-            alunos_presentes_ids = request.POST.getlist('presenca')
-            todos_os_inscritos = Inscricao.objects.filter(
-                turma=turma, 
-                status__in=['matriculado', 'experimental', 'acompanhando']
-            )
-            
-            # 3. Apaga presenças antigas e recria
-            Presenca.objects.filter(registro_aula=registro_aula).delete() 
-            
-            for inscricao in todos_os_inscritos:
-                Presenca.objects.create(
-                    registro_aula=registro_aula, 
-                    aluno=inscricao.aluno,
-                    presente=(str(inscricao.aluno.pk) in alunos_presentes_ids)
-                )
+            # 2. Grava só o que mudou na chamada (cria, atualiza ou remove presenças)
+            salvar_chamada(registro_aula, request.POST.getlist('presenca'), alunos_da_chamada(turma))
+            atualizar_sequencias_da_aula(registro_aula)
             # =====================================================
             # ▲▲▲ FIM DA LÓGICA DE PRESENÇA ▲▲▲
             # =====================================================
@@ -1227,6 +1075,17 @@ def lista_leads(request):
     }
     return render(request, 'cadastros/lista_leads.html', context)
 
+def _avisar_telefone_repetido(request, lead):
+    """ Avisa quando o telefone do lead já é de outro lead ou de um aluno (busca indexada por igualdade). """
+    if not lead.telefone_normalizado:
+        return
+    outro_lead = Lead.objects.filter(telefone_normalizado=lead.telefone_normalizado).exclude(pk=lead.pk).first()
+    if outro_lead:
+        messages.warning(request, f'O telefone {lead.telefone} já está cadastrado no lead "{outro_lead.nome_completo}".')
+    aluno = Aluno.objects.filter(telefone_normalizado=lead.telefone_normalizado).first()
+    if aluno:
+        messages.warning(request, f'O telefone {lead.telefone} é do(a) aluno(a) {aluno.nome_completo} ({aluno.get_status_display()}).')
+
 @login_required
 @admin_required
 def adicionar_lead(request):
@@ -1235,6 +1094,7 @@ def adicionar_lead(request):
         if form.is_valid():
             lead = form.save()
             messages.success(request, f'Lead "{lead.nome_completo}" adicionado com sucesso.')
+            _avisar_telefone_repetido(request, lead)
             return redirect('cadastros:lista_leads')
     else:
         form = LeadForm()
@@ -1579,27 +1439,14 @@ def portal_aluno(request):
     # 2. Histórico das últimas 5 aulas
     historico_aulas_mes = Presenca.objects.filter(
         aluno=aluno,
-        registro_aula__data_aula__year=ano_selecionado,
-        registro_aula__data_aula__month=mes_selecionado
+        registro_aula__data_aula__range=intervalo_mes(ano_selecionado, mes_selecionado)
     ).select_related('registro_aula__turma').order_by('-registro_aula__data_aula')
 
     # 3. Dados para o gráfico de frequência (últimos 6 meses)
-    meses_frequencia_data = []
-    hoje = timezone.now().date()
-    for i in range(5, -1, -1):
-        mes_data = hoje - relativedelta(months=i)
-        mes_inicio, mes_fim = mes_data.replace(day=1), (mes_data.replace(day=1) + relativedelta(months=1)) - timedelta(days=1)
-        
-        presencas_mes = Presenca.objects.filter(
-            aluno=aluno, registro_aula__data_aula__range=[mes_inicio, mes_fim]
-        ).aggregate(total=Count('id'), presentes=Count('id', filter=Q(presente=True)))
-        
-        percentual_mes = (presencas_mes['presentes'] / presencas_mes['total'] * 100) if presencas_mes['total'] > 0 else 0
-        
-        meses_frequencia_data.append({
-            'mes': mes_inicio.strftime('%b/%Y'),
-            'percentual': round(percentual_mes, 1),
-        })
+    meses_frequencia_data = [
+        {'mes': serie['mes'].strftime('%b/%Y'), 'percentual': serie['frequencia']}
+        for serie in ultimos_meses(aluno.pk, hoje=hoje)
+    ]
 
     provas_aluno = AlunoProva.objects.filter(
         aluno=aluno
@@ -2185,186 +2032,107 @@ def atualizar_status_lead(request):
 @login_required
 @admin_required
 def exportar_dados_page(request):
-    """ Exibe a página com os botões para exportar dados. """
-    return render(request, 'cadastros/exportar_dados.html')
+    """ Exibe a página com os botões para exportar dados e as exportações em segundo plano. """
+    context = {
+        'tarefas': TarefaExportacao.objects.select_related('solicitado_por')[:20],
+        'tipos_exportacao': TarefaExportacao.TIPO_CHOICES,
+    }
+    return render(request, 'cadastros/exportar_dados.html', context)
+
+@login_required
+@admin_required
+@require_POST
+def solicitar_exportacao(request):
+    """ Coloca uma exportação completa na fila do comando processar_exportacoes. """
+    tipo = request.POST.get('tipo')
+    if tipo not in dict(TarefaExportacao.TIPO_CHOICES):
+        messages.error(request, 'Tipo de exportação inválido.')
+        return redirect('cadastros:exportar_dados_page')
+
+    # Evita enfileirar de novo a mesma exportação enquanto ela ainda não saiu
+    tarefa = TarefaExportacao.objects.filter(tipo=tipo, status__in=['pendente', 'em_andamento']).first()
+    if tarefa:
+        messages.info(request, f'A exportação "{tarefa.get_tipo_display()}" já está na fila.')
+    else:
+        tarefa = TarefaExportacao.objects.create(tipo=tipo, solicitado_por=request.user)
+        messages.success(request, f'Exportação "{tarefa.get_tipo_display()}" solicitada. O arquivo aparecerá na lista quando ficar pronto.')
+    return redirect('cadastros:exportar_dados_page')
+
+@login_required
+@admin_required
+def baixar_exportacao(request, pk):
+    """ Entrega o arquivo gerado por uma exportação em segundo plano. """
+    tarefa = get_object_or_404(TarefaExportacao, pk=pk, status='concluida')
+    if not tarefa.arquivo:
+        raise Http404('Arquivo não encontrado.')
+    return FileResponse(tarefa.arquivo.open('rb'), as_attachment=True, filename=tarefa.arquivo.name.rsplit('/', 1)[-1])
 
 @login_required
 @admin_required
 def exportar_contratos_csv(request):
-    """ Gera e baixa um CSV com todos os contratos. """
-    response = HttpResponse(content_type='text/csv')
-    response['Content-Disposition'] = 'attachment; filename="mms_contratos.csv"'
-    writer = csv.writer(response)
-
-    writer.writerow([
-        'ID Contrato', 'ID Aluno', 'Nome Aluno', 'Plano', 'Data Início', 'Data Fim',
-        'Valor Mensalidade', 'Valor Matrícula', 'Parcelas Matrícula', 'Ativo', 'Observações'
-    ])
-    response.write('\ufeff'.encode('utf-8')) # Adiciona o BOM do UTF-8
-
-    contratos = Contrato.objects.select_related('aluno').all()
-    for c in contratos:
-        writer.writerow([
-            c.id, c.aluno.id, smart_str(c.aluno.nome_completo), c.get_plano_display(),
-            c.data_inicio.strftime('%Y-%m-%d') if c.data_inicio else '',
-            c.data_fim.strftime('%Y-%m-%d') if c.data_fim else '',
-            f"{c.valor_mensalidade:.2f}", f"{c.valor_matricula:.2f}", c.parcelas_matricula,
-            'Sim' if c.ativo else 'Não', smart_str(c.observacoes)
-        ])
-
-    response['charset'] = 'utf-8' # Garante que o charset está na resposta final
-    return response
+    """ Baixa um CSV com todos os contratos (ou só os alterados, com ?since=). """
+    return _exportacao_incremental(request, 'contratos')
 
 @login_required
 @admin_required
 def exportar_pagamentos_csv(request):
-    """ Gera e baixa um CSV com todos os pagamentos. """
-    response = HttpResponse(content_type='text/csv')
-    response['Content-Disposition'] = 'attachment; filename="mms_pagamentos.csv"'
-    writer = csv.writer(response)
-
-    writer.writerow([
-        'ID Pagamento', 'ID Aluno', 'Nome Aluno', 'ID Contrato', 'Tipo', 'Descrição',
-        'Valor Total', 'Valor Pago', 'Status', 'Mês Referência', 'Data Vencimento', 'Data Pagamento'
-    ])
-    response.write('\ufeff'.encode('utf-8')) # Adiciona o BOM do UTF-8
-
-    pagamentos = Pagamento.objects.select_related('aluno', 'contrato').all()
-    for p in pagamentos:
-        writer.writerow([
-            p.id, p.aluno.id, smart_str(p.aluno.nome_completo), p.contrato.id if p.contrato else '',
-            p.get_tipo_display(), smart_str(p.descricao), f"{p.valor:.2f}", f"{p.valor_pago:.2f}",
-            p.get_status_display(), p.mes_referencia.strftime('%Y-%m-%d') if p.mes_referencia else '',
-            p.data_vencimento.strftime('%Y-%m-%d') if p.data_vencimento else '',
-            p.data_pagamento.strftime('%Y-%m-%d') if p.data_pagamento else ''
-        ])
-    response['charset'] = 'utf-8' # Garante que o charset está na resposta final
-    return response
+    """ Baixa um CSV com todos os pagamentos (ou só os alterados, com ?since=). """
+    return _exportacao_incremental(request, 'pagamentos')
 
 @login_required
 @admin_required
 def exportar_registros_aula_csv(request):
-    """ Gera e baixa um CSV com todos os registros de aula. """
-    response = HttpResponse(content_type='text/csv')
-    response['Content-Disposition'] = 'attachment; filename="mms_registros_aula.csv"'
-    writer = csv.writer(response)
-    response.write('\ufeff'.encode('utf-8')) # Adiciona o BOM do UTF-8
-
-    writer.writerow([
-        'ID Registro', 'ID Turma', 'Nome Turma', 'Data Aula', 'ID Professor', 'Nome Professor',
-        'Último Parágrafo', 'Última Palavra', 'Ditado Novo', 'Ditado Antigo',
-        'Leitura Nova', 'Leitura Antiga', 'Lesson Check'
-    ])
-
-    registros = RegistroAula.objects.select_related('turma', 'professor').all()
-    for r in registros:
-        writer.writerow([
-            r.id, r.turma.id, smart_str(r.turma.nome), r.data_aula.strftime('%Y-%m-%d') if r.data_aula else '',
-            r.professor.id if r.professor else '', smart_str(r.professor.nome_completo) if r.professor else '',
-            r.last_parag, smart_str(r.last_word), r.new_dictation, r.old_dictation,
-            r.new_reading, r.old_reading, smart_str(r.lesson_check)
-        ])
-    response['charset'] = 'utf-8' # Garante que o charset está na resposta final
-    return response
+    """ Baixa um CSV com todos os registros de aula (ou só os alterados, com ?since=). """
+    return _exportacao_incremental(request, 'registros_aula')
 
 @login_required
 @admin_required
-def exportar_registros_aula_por_turma_zip(request):
-    """
-    Gera um arquivo ZIP contendo um CSV para cada turma com seus registros de aula.
-    """
-    # Cria um buffer de bytes em memória para o arquivo ZIP
-    zip_buffer = io.BytesIO()
+def exportar_presencas_csv(request):
+    """ Baixa um CSV com todas as presenças (ou só as alteradas, com ?since=). """
+    return _exportacao_incremental(request, 'presencas')
 
-    # Cria o arquivo ZIP em memória
-    with zipfile.ZipFile(zip_buffer, 'w', zipfile.ZIP_DEFLATED) as zip_file:
-        turmas = Turma.objects.all().order_by('nome')
+@login_required
+@admin_required
+def exportar_alunos_csv(request):
+    """ Baixa um CSV com todos os alunos (ou só os alterados, com ?since=). """
+    return _exportacao_incremental(request, 'alunos')
 
-        for turma in turmas:
-            registros = RegistroAula.objects.filter(turma=turma).select_related('professor').order_by('data_aula')
-            
-            if not registros.exists():
-                continue # Pula turmas sem registros
-
-            # Cria um buffer de texto em memória para o CSV da turma
-            csv_buffer = io.StringIO()
-            writer = csv.writer(csv_buffer)
-
-            # Escreve o BOM e o cabeçalho
-            csv_buffer.write('\ufeff') # BOM para UTF-8
-            writer.writerow([
-                'ID Registro', 'Data Aula', 'ID Professor', 'Nome Professor',
-                'Último Parágrafo', 'Última Palavra', 'Ditado Novo', 'Ditado Antigo',
-                'Leitura Nova', 'Leitura Antiga', 'Lesson Check'
-            ])
-
-            # Escreve os dados
-            for r in registros:
-                writer.writerow([
-                    r.id, r.data_aula.strftime('%Y-%m-%d') if r.data_aula else '',
-                    r.professor.id if r.professor else '', smart_str(r.professor.nome_completo) if r.professor else '',
-                    r.last_parag, smart_str(r.last_word), r.new_dictation, r.old_dictation,
-                    r.new_reading, r.old_reading, smart_str(r.lesson_check)
-                ])
-            
-            # Prepara o nome do arquivo CSV dentro do ZIP
-            # Remove caracteres inválidos para nomes de arquivo
-            nome_turma_seguro = re.sub(r'[^\w\-]+', '_', turma.nome)
-            csv_filename = f'registros_turma_{nome_turma_seguro}.csv'
-            
-            # Adiciona o conteúdo do CSV (como bytes UTF-8) ao ZIP
-            zip_file.writestr(csv_filename, csv_buffer.getvalue().encode('utf-8'))
+@login_required
+@admin_required
+def exportar_exclusoes_csv(request):
+    """ Baixa um CSV com os registros excluídos (a partir de ?since=, se informado). """
+    return _com_since(request, exportar_exclusoes)
+
+def _com_since(request, exportar):
+    """ Chama `exportar(desde)` com o ?since= da requisição (None se ausente); 400 se inválido. """
+    try:
+        desde = ler_desde(request.GET['since']) if request.GET.get('since') else None
+        return exportar(desde)
+    except ValueError as erro:
+        return HttpResponseBadRequest(str(erro))
 
-    # Prepara a resposta HTTP para o ZIP
-    zip_buffer.seek(0)
-    response = HttpResponse(zip_buffer, content_type='application/zip')
-    response['Content-Disposition'] = 'attachment; filename="mms_registros_aula_por_turma.zip"'
-    return response
+def _exportacao_incremental(request, nome):
+    return _com_since(request, lambda desde: exportar_csv(nome, desde))
+
+@login_required
+@admin_required
+def exportar_registros_aula_por_turma_zip(request):
+    """
+    Baixa um arquivo ZIP contendo um CSV para cada turma com seus registros de aula.
+    """
+    return resposta_zip_registros_por_turma()
 
 @login_required
 @admin_required # Apenas administradores podem exportar dados pedagógicos
 def exportar_acompanhamentos_csv(request):
-    """ Gera e baixa um CSV com todos os acompanhamentos pedagógicos. """
-    response = HttpResponse(content_type='text/csv')
-    response['Content-Disposition'] = 'attachment; filename="mms_acompanhamentos_pedagogicos.csv"'
-    response.write('\ufeff'.encode('utf-8')) # Adiciona o BOM do UTF-8
-    writer = csv.writer(response)
-
-    # Define os cabeçalhos
-    writer.writerow([
-        'ID Acompanhamento', 'ID Aluno', 'Nome Aluno', 'Status', 'Data Agendamento', 
-        'Data Realização', 'Stage no Momento', 'Criado por (Professor)', 
-        'Dificuldades', 'Relação Língua', 'Objetivo Estudo', 'Correção Ditados', 
-        'Pontos Fortes', 'Pontos a Melhorar', 'Estratégia', 'Comentários Extras', 
-        'Atividades Recomendadas'
-    ])
-
-    # Busca os dados
-    acompanhamentos = AcompanhamentoPedagogico.objects.select_related('aluno', 'criado_por').all().order_by('-data')
-
-    for a in acompanhamentos:
-        writer.writerow([
-            a.id,
-            a.aluno.id,
-            smart_str(a.aluno.nome_completo),
-            a.get_status_display(),
-            a.data.strftime('%Y-%m-%d %H:%M') if a.data else '',
-            '', # Data Realização is removed, keeping empty column for retro-compatibility if needed or can just remove. I'll leave empty.
-            a.stage_no_momento,
-            smart_str(a.criado_por.nome_completo) if a.criado_por else 'N/A',
-            smart_str(a.dificuldades),
-            smart_str(a.relacao_lingua),
-            smart_str(a.objetivo_estudo),
-            smart_str(a.correcao_ditados),
-            smart_str(a.pontos_fortes),
-            smart_str(a.pontos_melhorar),
-            smart_str(a.estrategia),
-            smart_str(a.comentarios_extras),
-            smart_str(a.atividades_recomendadas),
-        ])
-    
-    response['charset'] = 'utf-8'
-    return response
+    """ Baixa um CSV com todos os acompanhamentos pedagógicos. """
+    return exportar_csv('acompanhamentos')
+
+@login_required
+@admin_required
+def exportar_pacote_analitico(request):
+    """ Baixa o pacote analítico (NDJSON colunar de pagamentos, contratos, presenças, inscrições e despesas). """
+    return resposta_pacote_analitico()
 
 @login_required
 @professor_required
@@ -2378,7 +2146,9 @@ def excluir_registro_aula(request, pk):
     
     try:
         data_aula_formatada = registro_aula.data_aula.strftime('%d/%m/%Y')
-        registro_aula.delete()
+        # A cascata apaga as presenças da aula: marcas de exclusão num único INSERT
+        with em_lote():
+            registro_aula.delete()
         messages.success(request, f'O registro da aula do dia {data_aula_formatada} foi excluído com sucesso.')
     except Exception as e:
         messages.error(request, f'Ocorreu um erro ao excluir o registro: {e}')
@@ -2586,7 +2356,9 @@ def cancelar_contrato(request, pk):
             contrato=contrato,
             status='pendente',
             data_vencimento__gt=hoje
-        ).update(status='cancelado')
+        ).update(status='cancelado', atualizado_em=timezone.now())
+        invalidar_paineis()
+        atualizar_resumos([contrato.aluno_id])
 
         messages.warning(request, f'Contrato CANCELADO. Multa de R$ {multa:.2f} gerada.')
         return redirect('cadastros:perfil_aluno', pk=contrato.aluno.pk)
@@ -2610,6 +2382,8 @@ def trancar_contrato(request, pk):
     
     # 3. Atualiza inscrições ativas para 'trancado'
     Inscricao.objects.filter(aluno=aluno, status__in=['matriculado', 'acompanhando']).update(status='trancado')
+    invalidar_paineis()
+    atualizar_resumos([aluno.pk])
     
     messages.warning(request, f'Contrato e Matrícula de {aluno.nome_completo} foram TRANCADOS. Cobranças futuras gerarão créditos.')
     return redirect('cadastros:perfil_aluno', pk=aluno.pk)
@@ -2718,49 +2492,6 @@ def gerenciar_inscricao(request, inscricao_pk):
     return redirect('cadastros:perfil_aluno', pk=aluno_pk)
 
 
-# ==============================================================================
-# 3. LÓGICA DE VERIFICAÇÃO DE FALTAS (Helper Function)
-# ==============================================================================
-
-def _verificar_e_gerar_alerta_faltas(aluno):
-    """
-    Função utilitária para verificar se o aluno tem 3 faltas consecutivas 
-    e gerar um alerta, EVITANDO DUPLICIDADE.
-    Deve ser chamada sempre que uma falta é registrada.
-    """
-    # 1. Verifica se JÁ EXISTE um acompanhamento pendente. Se sim, não faz nada.
-    if AcompanhamentoFalta.objects.filter(aluno=aluno, status='pendente').exists():
-        return # Já tem alerta aberto, não precisa spammar.
-
-    # 2. Busca as últimas 3 presenças do aluno (ordenadas da mais recente para antiga)
-    ultimas_presencas = Presenca.objects.filter(aluno=aluno).order_by('-registro_aula__data_aula')[:3]
-    
-    # Se tiver menos de 3 aulas registradas, não tem como ter 3 faltas seguidas
-    if len(ultimas_presencas) < 3:
-        return
-
-    # 3. Verifica se as 3 são faltas (presente=False)
-    # A lista vem [Recente, Anterior, Antepenúltima]
-    faltas_consecutivas = all(p.presente is False for p in ultimas_presencas)
-    
-    if faltas_consecutivas:
-        data_inicio = ultimas_presencas[2].registro_aula.data_aula # A data da 1ª falta da sequência
-        
-        AcompanhamentoFalta.objects.create(
-            aluno=aluno,
-            data_inicio_sequencia=data_inicio,
-            numero_de_faltas=3,
-            status='pendente',
-            motivo="Alerta Automático: 3 faltas consecutivas detectadas."
-        )
-
-# --- ONDE CHAMAR ESSA FUNÇÃO? ---
-# Você deve adicionar a chamada `_verificar_e_gerar_alerta_faltas(inscricao.aluno)`
-# dentro das views 'detalhe_turma' e 'editar_registro_aula', logo após criar a Presenca=False.
-# Exemplo (pseudocódigo para você inserir nas views existentes):
-# if not presente:
-#    _verificar_e_gerar_alerta_faltas(inscricao.aluno)
-
 @login_required
 @admin_required
 @require_POST
@@ -2788,6 +2519,8 @@ def destrancar_contrato(request, pk):
         
         # 3. Reativa inscrições
         Inscricao.objects.filter(aluno=aluno, status='trancado').update(status='matriculado')
+        invalidar_paineis()
+        atualizar_resumos([aluno.pk])
         
         messages.success(request, f'Contrato de {aluno.nome_completo} DESTRANCADO com sucesso! Status voltou para Ativo.')
     
@@ -3087,69 +2820,8 @@ def enviar_email_alunos(request):
     return render(request, 'cadastros/enviar_email.html', {'form': form})
 
 def calc_metricas_saude(data_inicio, data_fim):
-    hoje = timezone.now().date()
-    
-    alunos_ativos = Aluno.objects.filter(status='ativo', data_matricula__lte=data_fim).count()
-    
-    receita_bruta = Pagamento.objects.filter(
-        status='pago', data_pagamento__range=[data_inicio, data_fim]
-    ).aggregate(total=Sum('valor_pago'))['total'] or Decimal('0.00')
-
-    despesas_totais = Despesa.objects.filter(
-        pago=True, data_pagamento__range=[data_inicio, data_fim]
-    ).aggregate(total=Sum('valor'))['total'] or Decimal('0.00')
-
-    lucro_liquido = receita_bruta - despesas_totais
-    ticket_medio = (receita_bruta / Decimal(str(alunos_ativos))) if alunos_ativos > 0 else Decimal('0.00')
-
-    contratos_potenciais_churn = Contrato.objects.filter(
-        Q(data_fim__range=[data_inicio, data_fim], status='finalizado') | 
-        Q(data_cancelamento__range=[data_inicio, data_fim], status='cancelado')
-    ).exclude(aluno__inscricao__turma__stage=12).values('aluno').distinct()
-    
-    churn_count = 0
-    for c in contratos_potenciais_churn:
-        tem_ativo = Contrato.objects.filter(aluno_id=c['aluno'], ativo=True).exists()
-        if not tem_ativo:
-            churn_count += 1
-            
-    total_alunos_inicio = Aluno.objects.filter(data_matricula__lte=data_inicio, status='ativo').count() or 1
-    churn_rate = (churn_count / total_alunos_inicio) * 100
-
-    churn_decimal = (churn_rate / 100) if churn_rate > 0 else 1
-    ltv = ticket_medio / Decimal(str(churn_decimal)) if churn_decimal > 0 else Decimal('0.00')
-
-    despesas_mkt = Despesa.objects.filter(
-        categoria='marketing', pago=True, data_pagamento__range=[data_inicio, data_fim]
-    ).aggregate(total=Sum('valor'))['total'] or Decimal('0.00')
-    
-    novos_alunos = Aluno.objects.filter(data_matricula__range=[data_inicio, data_fim]).count()
-    cac = (despesas_mkt / Decimal(str(novos_alunos))) if novos_alunos > 0 else Decimal('0.00')
-
-    valor_atrasados = Pagamento.objects.filter(
-        Q(status='atrasado') | (Q(status__in=['pendente', 'parcial']) & Q(data_vencimento__lt=hoje)),
-        data_vencimento__range=[data_inicio, data_fim]
-    ).aggregate(total=Sum(F('valor') - F('valor_pago')))['total'] or Decimal('0.00')
-    
-    valor_gerado = Pagamento.objects.filter(
-        data_vencimento__range=[data_inicio, data_fim]
-    ).exclude(status='cancelado').aggregate(total=Sum('valor'))['total'] or Decimal('0.00')
-    
-    inadimplencia = (valor_atrasados / valor_gerado * 100) if valor_gerado > 0 else Decimal('0.00')
-    
-    valor_pendente_no_prazo = Pagamento.objects.filter(
-        status__in=['pendente', 'parcial'],
-        data_vencimento__gte=hoje,
-        data_vencimento__range=[data_inicio, data_fim]
-    ).aggregate(total=Sum(F('valor') - F('valor_pago')))['total'] or Decimal('0.00')
-
-    return {
-        'alunos_ativos': alunos_ativos, 'receita_bruta': receita_bruta,
-        'despesas_totais': despesas_totais, 'lucro_liquido': lucro_liquido,
-        'ticket_medio': ticket_medio, 'churn_rate': churn_rate, 'ltv': ltv,
-        'cac': cac, 'inadimplencia': inadimplencia, 'valor_atrasados': valor_atrasados,
-        'valor_pendente_no_prazo': valor_pendente_no_prazo
-    }
+    """ Indicadores de uma única janela. Para várias janelas, use metricas.calcular_metricas. """
+    return calcular_metricas([(data_inicio, data_fim)])[0]
 
 @login_required
 @admin_required
@@ -3179,14 +2851,12 @@ def dashboard_saude_view(request):
         prox_mes = hoje.replace(day=28) + timedelta(days=4)
         data_fim = prox_mes - timedelta(days=prox_mes.day)
 
-    # 1. Atual
-    atual = calc_metricas_saude(data_inicio, data_fim)
-    
-    # 2. Comparativo
-    delta_days = (data_fim - data_inicio).days
-    data_fim_ant = data_inicio - timedelta(days=1)
-    data_inicio_ant = data_fim_ant - timedelta(days=delta_days)
-    anterior = calc_metricas_saude(data_inicio_ant, data_fim_ant)
+    # 1. Atual, 2. Comparativo (mesma duração, imediatamente antes) e 3. cada mês do histórico:
+    # todas as janelas saem das mesmas consultas agrupadas
+    janelas_historico = janelas_mensais(data_inicio, data_fim)
+    atual, anterior, *metricas_historico = calcular_metricas(
+        [(data_inicio, data_fim), janela_anterior(data_inicio, data_fim)] + janelas_historico
+    )
     
     def calc_delta(val_atual, val_ant):
         va = float(val_ant)
@@ -3209,23 +2879,12 @@ def dashboard_saude_view(request):
     meses_historico = []
     dados_historico = {'churn': [], 'despesas': [], 'lucro': [], 'inadimplencia': []}
     
-    curr = data_inicio.replace(day=1)
-    contador = 0
-    while curr <= data_fim and contador < 12:
-        nxt_month = (curr + timedelta(days=32)).replace(day=1)
-        fim_mes = nxt_month - timedelta(days=1)
-        if fim_mes > data_fim: fim_mes = data_fim
-            
-        m_dados = calc_metricas_saude(curr, fim_mes)
-        
-        meses_historico.append(curr.strftime('%b/%Y'))
+    for (inicio_mes, _), m_dados in zip(janelas_historico, metricas_historico):
+        meses_historico.append(inicio_mes.strftime('%b/%Y'))
         dados_historico['churn'].append(float(m_dados['churn_rate']))
         dados_historico['despesas'].append(float(m_dados['despesas_totais']))
         dados_historico['lucro'].append(float(m_dados['lucro_liquido']))
         dados_historico['inadimplencia'].append(float(m_dados['inadimplencia']))
-        
-        curr = nxt_month
-        contador += 1
 
     # 4. Gráfico Rosca
     despesas_por_categoria = Despesa.objects.filter(
@@ -3248,5 +2907,30 @@ def dashboard_saude_view(request):
         'valores_rosca': valores_rosca,
         'meses_historico': meses_historico,
         'dados_historico': dados_historico,
+        'mes_a_fechar': (hoje.replace(day=1) - timedelta(days=1)).strftime('%Y-%m'),
     }
-    return render(request, 'cadastros/dashboard_saude.html', context)
\ No newline at end of file
+    return render(request, 'cadastros/dashboard_saude.html', context)
+
+
+@login_required
+@admin_required
+@require_POST
+def fechar_mes_financeiro(request):
+    """ Consolida (ou reconsolida) um mês encerrado em SnapshotMensal. """
+    url_redirect = reverse('cadastros:dashboard_saude')
+    params = request.GET.urlencode()
+    if params: url_redirect += f"?{params}"
+
+    try:
+        mes = date.fromisoformat(f"{request.POST.get('mes', '')}-01")
+    except ValueError:
+        messages.error(request, 'Selecione um mês válido para fechar.')
+        return redirect(url_redirect)
+
+    try:
+        snapshot, = fechar_meses([mes])
+    except ValueError as e:
+        messages.error(request, f'Não foi possível fechar o mês: {e}')
+    else:
+        messages.success(request, f'Mês {snapshot.mes.strftime("%m/%Y")} fechado com sucesso!')
+    return redirect(url_redirect)
\ No newline at end of file
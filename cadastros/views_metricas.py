@@ -0,0 +1,26 @@
+# cadastros/views_metricas.py
+from django.conf import settings
+from django.contrib import messages
+from django.contrib.auth.decorators import login_required
+from django.shortcuts import redirect, render
+
+from .decorators import admin_required
+from .middleware import limpar_metricas, metricas_por_rota
+
+
+@login_required
+@admin_required
+def metricas_desempenho(request):
+    """ Consultas SQL, tempo de banco e tempo total acumulados por rota. """
+    if request.method == 'POST':
+        limpar_metricas()
+        messages.success(request, 'Métricas zeradas com sucesso.')
+        return redirect('cadastros:metricas_desempenho')
+
+    context = {
+        'metricas': metricas_por_rota(),
+        'limite_consultas': settings.METRICAS_LIMITE_CONSULTAS,
+        'limite_tempo_ms': settings.METRICAS_LIMITE_TEMPO_MS,
+        'ativas': settings.METRICAS_REQUISICOES_ATIVAS,
+    }
+    return render(request, 'cadastros/metricas_desempenho.html', context)
@@ -0,0 +1,139 @@
+# cadastros/views_paineis.py
+"""
+Endpoints JSON dos painéis carregados sob demanda (cobranças e rodízio do
+dashboard administrativo, lista de alunos).
+
+Cada resposta traz as linhas já renderizadas com os templates de linha da
+própria página, o cursor da próxima página (paginação por keyset, ver
+paginacao.py) e, na primeira página, o total de itens do painel. Busca e
+ordenação são feitas no servidor. O script static/cadastros/paineis.js
+busca as páginas conforme o fim da lista aparece na tela.
+"""
+import hashlib
+
+from django.contrib.auth.decorators import login_required
+from django.http import Http404, JsonResponse
+from django.template.loader import render_to_string
+from django.urls import reverse
+from django.utils import timezone
+from django.utils.http import url_has_allowed_host_and_scheme
+
+from .decorators import admin_required
+from .models import Pagamento
+from .paginacao import TAMANHO_MAXIMO, TAMANHO_PAGINA, pagina_keyset
+from .paineis import (
+    STATUS_A_RECEBER, alunos_com_resumo, alunos_para_acompanhamento, em_cache, pagamentos_do_mes,
+)
+
+# Para cada painel: a consulta (a partir dos filtros da requisição), o template
+# das linhas e as ordenações aceitas (campo, decrescente); a primeira é o padrão.
+PAINEIS = {
+    'pendentes': {
+        'consulta': lambda f: pagamentos_do_mes(f['ano'], f['mes'], STATUS_A_RECEBER, f['turma'], f['tipo'], f['busca']),
+        'template': 'cadastros/includes/rows_pendentes.html',
+        'ordenacoes': {
+            'az': ('aluno__nome_completo', False),
+            'za': ('aluno__nome_completo', True),
+            'vencimento': ('data_vencimento', False),
+        },
+    },
+    'recebidos': {
+        'consulta': lambda f: pagamentos_do_mes(f['ano'], f['mes'], ['pago'], f['turma'], f['tipo'], f['busca']),
+        'template': 'cadastros/includes/rows_recebidos.html',
+        'ordenacoes': {
+            'recentes': ('data_pagamento', True),
+            'az': ('aluno__nome_completo', False),
+            'za': ('aluno__nome_completo', True),
+        },
+    },
+    'rodizio': {
+        'consulta': lambda f: alunos_para_acompanhamento(f['hoje'], f['busca']),
+        'template': 'cadastros/includes/rows_rodizio.html',
+        'ordenacoes': {
+            'acompanhamento': ('ultimo_acompanhamento', False),
+            'az': ('nome_completo', False),
+        },
+    },
+    'alunos': {
+        'consulta': lambda f: alunos_com_resumo(f['busca']),
+        'template': 'cadastros/includes/rows_alunos.html',
+        'ordenacoes': {
+            'az': ('nome_completo', False),
+            'za': ('nome_completo', True),
+            'recentes': ('data_matricula', True),
+        },
+    },
+}
+
+
+def _inteiro(request, parametro, padrao=None):
+    valor = request.GET.get(parametro)
+    if not valor:
+        return padrao
+    try:
+        return int(valor)
+    except ValueError:
+        raise ValueError(f'Valor inválido para "{parametro}".')
+
+
+def _filtros(request):
+    """ Lê e valida os filtros comuns aos painéis; levanta ValueError se algum for inválido. """
+    hoje = timezone.now().date()
+    tipo = request.GET.get('tipo') or None
+    if tipo and tipo not in dict(Pagamento.TIPO_CHOICES):
+        raise ValueError('Tipo de pagamento inválido.')
+    mes = _inteiro(request, 'mes', hoje.month)
+    if not 1 <= mes <= 12:
+        raise ValueError('Mês inválido.')
+    return {
+        'hoje': hoje,
+        'ano': _inteiro(request, 'ano', hoje.year),
+        'mes': mes,
+        'turma': _inteiro(request, 'turma'),
+        'tipo': tipo,
+        'busca': request.GET.get('busca', '').strip()[:100],
+    }
+
+
+@login_required
+@admin_required
+def painel_dados(request, nome):
+    """ Uma página de linhas do painel `nome`, em JSON. """
+    if nome not in PAINEIS:
+        raise Http404
+    definicao = PAINEIS[nome]
+
+    try:
+        filtros = _filtros(request)
+        ordem = request.GET.get('ordem') or next(iter(definicao['ordenacoes']))
+        if ordem not in definicao['ordenacoes']:
+            raise ValueError('Ordenação inválida.')
+        tamanho = min(max(_inteiro(request, 'limite', TAMANHO_PAGINA), 1), TAMANHO_MAXIMO)
+        cursor = request.GET.get('cursor') or None
+
+        campo, decrescente = definicao['ordenacoes'][ordem]
+        queryset = definicao['consulta'](filtros)
+        partes = (
+            filtros['ano'], filtros['mes'], filtros['turma'] or '', filtros['tipo'] or '',
+            hashlib.md5(filtros['busca'].encode()).hexdigest() if filtros['busca'] else '',
+        )
+        itens, proximo = em_cache(
+            f'painel_{nome}', lambda: pagina_keyset(queryset, campo, decrescente, cursor, tamanho),
+            *partes, ordem, tamanho, cursor or '',
+        )
+    except ValueError as e:
+        return JsonResponse({'status': 'erro', 'mensagem': str(e)}, status=400)
+
+    # Links de "editar" nas linhas voltam para a página que carregou o painel
+    voltar = request.GET.get('voltar')
+    if not voltar or not url_has_allowed_host_and_scheme(voltar, allowed_hosts={request.get_host()}):
+        voltar = reverse('cadastros:dashboard_admin')
+
+    resposta = {
+        'status': 'sucesso',
+        'html': render_to_string(definicao['template'], {'items': itens, 'voltar': voltar}, request=request),
+        'proximo': proximo,
+    }
+    if not cursor:
+        resposta['total'] = em_cache(f'painel_{nome}_total', queryset.count, *partes)
+    return JsonResponse(resposta)
@@ -1,10 +1,11 @@
-import json
+import hashlib
+import hmac
 import requests
 import logging
 from django.http import HttpResponse
 from django.views.decorators.csrf import csrf_exempt
 from django.conf import settings
-from .models import Lead, MensagemWhatsApp
+from .models import EventoWebhook, MensagemWhatsApp
 
 logger = logging.getLogger(__name__)
 
@@ -12,6 +13,30 @@ logger = logging.getLogger(__name__)
 VERIFY_TOKEN = getattr(settings, 'WHATSAPP_VERIFY_TOKEN', 'mms_portal_whatsapp_token')
 ACCESS_TOKEN = getattr(settings, 'META_ACCESS_TOKEN', '')
 PHONE_NUMBER_ID = getattr(settings, 'META_PHONE_NUMBER_ID', '')
+APP_SECRET = getattr(settings, 'META_APP_SECRET', '')
+
+
+# Corpo máximo aceito pelo webhook; os eventos da Meta têm poucos KB
+TAMANHO_MAXIMO_CORPO = 256 * 1024
+
+_aviso_sem_segredo_emitido = False
+
+
+def assinatura_valida(request):
+    """
+    Confere o cabeçalho X-Hub-Signature-256 (HMAC-SHA256 do corpo com o App
+    Secret). Sem META_APP_SECRET configurado nenhuma requisição é aceita:
+    o webhook é público e cria leads e mensagens.
+    """
+    global _aviso_sem_segredo_emitido
+    if not APP_SECRET:
+        if not _aviso_sem_segredo_emitido:
+            logger.error('META_APP_SECRET não configurado: o webhook do WhatsApp está recusando todos os eventos.')
+            _aviso_sem_segredo_emitido = True
+        return False
+    recebida = request.headers.get('X-Hub-Signature-256', '')
+    esperada = 'sha256=' + hmac.new(APP_SECRET.encode(), request.body, hashlib.sha256).hexdigest()
+    return hmac.compare_digest(recebida, esperada)
 
 def enviar_mensagem_whatsapp(lead, texto):
     """
@@ -23,12 +48,10 @@ def enviar_mensagem_whatsapp(lead, texto):
         "Content-Type": "application/json",
     }
     
-    # Formata o telefone removendo caracteres não numéricos
-    telefone_destino = ''.join(filter(str.isdigit, lead.telefone))
-    
-    # A Meta exige o DDI (55 para Brasil)
-    if not telefone_destino.startswith('55'):
-        telefone_destino = f"55{telefone_destino}"
+    # A Meta exige o número com DDI e sem o "+": vem pronto do telefone normalizado (E.164)
+    if not lead.telefone_normalizado:
+        return False, "Telefone do lead inválido ou sem DDD"
+    telefone_destino = lead.telefone_normalizado.lstrip('+')
 
     payload = {
         "messaging_product": "whatsapp",
@@ -46,7 +69,7 @@ def enviar_mensagem_whatsapp(lead, texto):
         response_data = response.json()
         
         if response.status_code == 200:
-            wamid = response_data.get('messages', [{}])[0].get('id', '')
+            wamid = response_data.get('messages', [{}])[0].get('id') or None
             # Regista a mensagem de saída no histórico do CRM
             MensagemWhatsApp.objects.create(
                 lead=lead,
@@ -84,54 +107,18 @@ def whatsapp_webhook(request):
         return HttpResponse('Requisição inválida', status=400)
 
     elif request.method == 'POST':
-        # Processamento das mensagens recebidas
+        # Só confere a assinatura e grava o evento na caixa de entrada; o
+        # processamento fica com o comando processar_webhooks (ver whatsapp.py),
+        # para a Meta receber o 200 rápido e não reenviar em picos de mensagens.
         try:
-            body = json.loads(request.body)
-            print(json.dumps(body, indent=4))
-            
-            if body.get('object') == 'whatsapp_business_account':
-                for entry in body.get('entry', []):
-                    for change in entry.get('changes', []):
-                        value = change.get('value', {})
-                        
-                        # Verifica se há mensagens de texto
-                        if 'messages' in value:
-                            for msg in value['messages']:
-                                if msg.get('type') == 'text':
-                                    telefone_remetente = msg.get('from')
-                                    texto_recebido = msg.get('text', {}).get('body', '')
-                                    wamid = msg.get('id')
-                                    nome_contato = value.get('contacts', [{}])[0].get('profile', {}).get('name', 'Contato Desconhecido')
+            tamanho = int(request.headers.get('Content-Length') or 0)
+        except ValueError:
+            return HttpResponse('Requisição inválida', status=400)
+        if tamanho > TAMANHO_MAXIMO_CORPO or len(request.body) > TAMANHO_MAXIMO_CORPO:
+            return HttpResponse('Corpo muito grande', status=413)
+        if not assinatura_valida(request):
+            return HttpResponse('Assinatura inválida', status=403)
+        EventoWebhook.objects.create(corpo=request.body.decode('utf-8', errors='replace'))
+        return HttpResponse('EVENT_RECEIVED', status=200)
 
-                                    # Busca o Lead ou cria um novo (Lógica aprimorada)
-                                    lead_telefone = telefone_remetente.replace('55', '', 1) if telefone_remetente.startswith('55') else telefone_remetente
-                                    
-                                    lead, created = Lead.objects.get_or_create(
-                                        telefone__contains=lead_telefone[-8:], # Flexibilidade para DDI/DDD
-                                        defaults={
-                                            'nome_completo': nome_contato,
-                                            'telefone': telefone_remetente,
-                                            'status': 'novo',
-                                            'fonte_contato': 'whatsapp',
-                                            'observacoes': "Lead criado automaticamente via integração WhatsApp."
-                                        }
-                                    )
-
-                                    # Regista a mensagem de entrada no histórico
-                                    MensagemWhatsApp.objects.create(
-                                        lead=lead,
-                                        direcao='entrada',
-                                        conteudo_texto=texto_recebido,
-                                        wamid=wamid,
-                                        status='entregue'
-                                    )
-                                    
-            return HttpResponse('EVENT_RECEIVED', status=200)
-            
-        except json.JSONDecodeError:
-            return HttpResponse('Invalid JSON', status=400)
-        except Exception as e:
-            logger.error(f"Server Error no Webhook: {e}")
-            return HttpResponse('Server Error', status=500)
-    
     return HttpResponse('Method not allowed', status=405)
\ No newline at end of file
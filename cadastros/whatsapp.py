@@ -0,0 +1,220 @@
+# cadastros/whatsapp.py
+"""
+Processamento da caixa de entrada dos webhooks do WhatsApp (EventoWebhook).
+
+O webhook (views_webhook.py) só grava o corpo recebido; aqui os eventos são
+consumidos em lotes. As mensagens de texto do lote inteiro são extraídas,
+os leads dos remetentes são encontrados com uma única consulta pelo
+telefone normalizado (os que não existem são criados de uma vez, com chave
+única contra duplicatas entre workers) e as mensagens são gravadas com um
+bulk_create.
+
+A Meta reenvia entregas que não receberam 200 a tempo, então a gravação é
+idempotente pelo wamid (índice único): os wamids já conhecidos são
+descartados com uma consulta ao índice e o INSERT ignora conflitos, o que
+cobre dois workers gravando o mesmo reenvio. Os avisos de status (enviada,
+entregue, lida, falha) viram um UPDATE por status no lote inteiro, e só
+avançam: um "entregue" atrasado não desfaz um "lido".
+
+Cada lote é processado dentro da transação que reserva os eventos (SELECT
+... FOR UPDATE SKIP LOCKED, quando o banco suporta), então vários workers
+podem consumir a fila ao mesmo tempo. Um evento com JSON inválido falha
+sozinho; se a gravação do lote falhar, os eventos do lote ficam como
+"falhou" com o erro e podem ser reprocessados depois
+(processar_webhooks --reprocessar-falhas).
+"""
+import json
+import logging
+
+from django.db import connection, transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import EventoWebhook, Lead, MensagemWhatsApp
+from .utils import normalizar_telefone
+
+logger = logging.getLogger(__name__)
+
+TAMANHO_LOTE = 200
+
+# Status dos avisos da Meta -> status de MensagemWhatsApp
+STATUS_META = {'sent': 'enviado', 'delivered': 'entregue', 'read': 'lido', 'failed': 'falha'}
+
+# Status que cada aviso pode substituir: o status de entrega só avança
+STATUS_ANTERIORES = {
+    'enviado': [],
+    'entregue': ['enviado'],
+    'lido': ['enviado', 'entregue'],
+    'falha': ['enviado'],
+}
+
+
+def _mais_avancado(atual, novo):
+    return novo if atual is None or atual in STATUS_ANTERIORES[novo] else atual
+
+
+def telefone_remetente(numero):
+    """ Telefone normalizado de um remetente; a Meta envia o número com DDI, sem o "+". """
+    return normalizar_telefone(f'+{numero}') if numero else None
+
+
+def ler_evento(dados):
+    """
+    Extrai de um corpo de webhook da Meta as mensagens de texto recebidas
+    (lista de dicts) e os avisos de status ({wamid: status do modelo}).
+    """
+    mensagens, status = [], {}
+    if dados.get('object') != 'whatsapp_business_account':
+        return mensagens, status
+    for entry in dados.get('entry', []):
+        for change in entry.get('changes', []):
+            value = change.get('value', {})
+            nome_contato = (value.get('contacts') or [{}])[0].get('profile', {}).get('name', 'Contato Desconhecido')
+            for msg in value.get('messages', []):
+                remetente = telefone_remetente(msg.get('from'))
+                # Sem um número válido não há como vincular a mensagem a um lead
+                if msg.get('type') == 'text' and remetente:
+                    mensagens.append({
+                        'telefone': msg.get('from', ''),
+                        'remetente': remetente,
+                        'texto': msg.get('text', {}).get('body', ''),
+                        'wamid': msg.get('id') or None,
+                        'nome': nome_contato,
+                    })
+            for aviso in value.get('statuses', []):
+                novo = STATUS_META.get(aviso.get('status'))
+                if novo and aviso.get('id'):
+                    status[aviso['id']] = _mais_avancado(status.get(aviso['id']), novo)
+    return mensagens, status
+
+
+def resolver_leads(contatos):
+    """
+    Recebe {telefone_normalizado: (telefone, nome)} e devolve
+    {telefone_normalizado: lead}, buscando todos os leads com uma consulta e
+    criando os que não existem. Havendo mais de um lead com o mesmo número,
+    fica o mais recente.
+
+    Os novos entram num único bulk_create com a chave única telefone_whatsapp:
+    se outro lote (outro worker) criou o mesmo número nesse meio-tempo, o
+    INSERT é ignorado e o lead dele é relido em seguida. A releitura trava
+    as linhas: no MySQL (REPEATABLE READ) uma leitura comum usaria o retrato
+    do início da transação e não veria o lead gravado pelo outro lote.
+    """
+    def buscar(telefones, travar=False):
+        consulta = Lead.objects.select_for_update() if travar else Lead.objects
+        for lead in consulta.filter(telefone_normalizado__in=telefones).order_by('-data_criacao'):
+            leads.setdefault(lead.telefone_normalizado, lead)
+
+    leads = {}
+    buscar(list(contatos))
+    faltantes = [normalizado for normalizado in contatos if normalizado not in leads]
+    if faltantes:
+        # bulk_create não passa pelo Lead.save(): a normalização vai pronta
+        Lead.objects.bulk_create([
+            Lead(
+                nome_completo=contatos[normalizado][1],
+                telefone=contatos[normalizado][0],
+                telefone_normalizado=normalizado,
+                telefone_whatsapp=normalizado,
+                status='novo',
+                fonte_contato='whatsapp',
+                observacoes="Lead criado automaticamente via integração WhatsApp.",
+            )
+            for normalizado in faltantes
+        ], ignore_conflicts=True)
+        buscar(faltantes, travar=True)
+    return leads
+
+
+def _gravar_mensagens(mensagens):
+    """ Grava as mensagens ainda não conhecidas. Retorna (gravadas, contatos). """
+    por_wamid = {}
+    for mensagem in mensagens:
+        # Sem wamid não há como reconhecer o reenvio; cada uma entra como nova
+        por_wamid.setdefault(mensagem['wamid'] or object(), mensagem)
+    conhecidos = set(
+        MensagemWhatsApp.objects.filter(wamid__in=[m['wamid'] for m in mensagens if m['wamid']])
+        .values_list('wamid', flat=True)
+    )
+    novas = [m for m in por_wamid.values() if m['wamid'] not in conhecidos]
+    if not novas:
+        return 0, 0
+
+    contatos = {}
+    for mensagem in novas:
+        contatos.setdefault(mensagem['remetente'], (mensagem['telefone'], mensagem['nome']))
+    leads = resolver_leads(contatos)
+    MensagemWhatsApp.objects.bulk_create([
+        MensagemWhatsApp(
+            lead=leads[mensagem['remetente']],
+            direcao='entrada',
+            conteudo_texto=mensagem['texto'],
+            wamid=mensagem['wamid'],
+            status='entregue',
+        )
+        for mensagem in novas
+    ], ignore_conflicts=True)
+    return len(novas), len(contatos)
+
+
+def _aplicar_status(status):
+    """ Um UPDATE por status de destino, só nas mensagens em que ele é um avanço. Retorna as linhas alteradas. """
+    por_status = {}
+    for wamid, novo in status.items():
+        por_status.setdefault(novo, []).append(wamid)
+    alteradas = 0
+    for novo, wamids in por_status.items():
+        alteradas += MensagemWhatsApp.objects.filter(
+            Q(status__isnull=True) | Q(status__in=STATUS_ANTERIORES[novo]), wamid__in=wamids
+        ).update(status=novo)
+    return alteradas
+
+
+def processar_lote(tamanho=TAMANHO_LOTE):
+    """ Processa até `tamanho` eventos pendentes. Retorna os contadores do lote. """
+    resultado = {'eventos': 0, 'mensagens': 0, 'contatos': 0, 'status': 0, 'falhas': 0}
+
+    with transaction.atomic():
+        fila = EventoWebhook.objects.filter(status='pendente').order_by('pk')
+        if connection.features.has_select_for_update_skip_locked:
+            fila = fila.select_for_update(skip_locked=True)
+        eventos = list(fila[:tamanho])
+        if not eventos:
+            return resultado
+
+        agora = timezone.now()
+        validos, mensagens, status = [], [], {}
+        for evento in eventos:
+            evento.tentativas += 1
+            try:
+                mensagens_evento, status_evento = ler_evento(json.loads(evento.corpo))
+            except (ValueError, AttributeError, TypeError) as erro:
+                evento.status, evento.erro = 'falhou', f'Corpo inválido: {erro}'
+                continue
+            mensagens.extend(mensagens_evento)
+            for wamid, novo in status_evento.items():
+                status[wamid] = _mais_avancado(status.get(wamid), novo)
+            validos.append(evento)
+
+        try:
+            with transaction.atomic():
+                if mensagens:
+                    resultado['mensagens'], resultado['contatos'] = _gravar_mensagens(mensagens)
+                # Depois das mensagens: um aviso pode chegar no mesmo lote da mensagem
+                if status:
+                    resultado['status'] = _aplicar_status(status)
+        except Exception as erro:
+            logger.exception('Falha ao gravar o lote de webhooks do WhatsApp')
+            resultado['mensagens'] = resultado['contatos'] = resultado['status'] = 0
+            for evento in validos:
+                evento.status, evento.erro = 'falhou', repr(erro)
+        else:
+            for evento in validos:
+                evento.status, evento.erro, evento.processado_em = 'processado', '', agora
+
+        EventoWebhook.objects.bulk_update(eventos, ['status', 'erro', 'tentativas', 'processado_em'])
+
+    resultado['eventos'] = len(eventos)
+    resultado['falhas'] = sum(1 for evento in eventos if evento.status == 'falhou')
+    return resultado
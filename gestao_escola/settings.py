@@ -38,6 +38,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    # Primeiro da lista para medir a requisição inteira, inclusive os demais middlewares
+    'cadastros.middleware.MetricasRequisicaoMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -47,6 +49,32 @@ MIDDLEWARE = [
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
 
+# Métricas de desempenho por rota (cadastros/middleware.py): requisições acima
+# destes limites são registradas no log 'cadastros.desempenho'. Desligadas por
+# padrão; ao ligar, use um cache compartilhado (CACHE_BACKEND), não o LocMem.
+METRICAS_REQUISICOES_ATIVAS = config('METRICAS_REQUISICOES_ATIVAS', default=False, cast=bool)
+METRICAS_LIMITE_CONSULTAS = config('METRICAS_LIMITE_CONSULTAS', default=50, cast=int)
+METRICAS_LIMITE_TEMPO_MS = config('METRICAS_LIMITE_TEMPO_MS', default=1000, cast=int)
+
+# Cache (painéis do dashboard, métricas por rota). O padrão em memória é por
+# processo; com vários workers, aponte para um cache compartilhado para que a
+# invalidação dos painéis valha para todos.
+CACHE_BACKEND = config('CACHE_BACKEND', default='django.core.cache.backends.locmem.LocMemCache')
+CACHES = {
+    'default': {
+        'BACKEND': CACHE_BACKEND,
+        'LOCATION': config('CACHE_LOCATION', default=''),
+    }
+}
+# No LocMem, a invalidação feita por um worker não alcança os outros, que
+# continuariam servindo painéis financeiros desatualizados: sem cache (0) por
+# padrão, a menos que o backend seja compartilhado.
+PAINEIS_CACHE_SEGUNDOS = config(
+    'PAINEIS_CACHE_SEGUNDOS', default=0 if 'LocMemCache' in CACHE_BACKEND else 300, cast=int
+)
+# Gráficos de frequência/notas do perfil e do portal do aluno (cadastros/desempenho.py)
+DESEMPENHO_CACHE_SEGUNDOS = config('DESEMPENHO_CACHE_SEGUNDOS', default=3600, cast=int)
+
 ROOT_URLCONF = 'gestao_escola.urls'
 
 TEMPLATES = [
@@ -170,9 +198,20 @@ DEFAULT_FROM_EMAIL = config('DEFAULT_FROM_EMAIL', default='MMS Institute <info@m
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
+# Arquivos das exportações em segundo plano (dados pessoais): fora do MEDIA_ROOT,
+# sem URL pública; só saem pela view baixar_exportacao. Apagados após a retenção.
+EXPORTACOES_ROOT = config('EXPORTACOES_ROOT', default=os.path.join(BASE_DIR, 'exportacoes_privadas'))
+EXPORTACOES_RETENCAO_DIAS = config('EXPORTACOES_RETENCAO_DIAS', default=7, cast=int)
+# Marcas de exclusão da sincronização incremental (?since=): o comando
+# limpar_exclusoes apaga as mais antigas que isto.
+EXCLUSOES_RETENCAO_DIAS = config('EXCLUSOES_RETENCAO_DIAS', default=180, cast=int)
+
 # ==============================================================================
 # CONFIGURAÇÕES DA API DO WHATSAPP (META)
 # ==============================================================================
 META_ACCESS_TOKEN = config('META_ACCESS_TOKEN', default='')
 META_PHONE_NUMBER_ID = config('META_PHONE_NUMBER_ID', default='')
 WHATSAPP_VERIFY_TOKEN = config('META_VERIFY_TOKEN', default='mms_portal_whatsapp_token')
+# Chave secreta do app na Meta: valida a assinatura (X-Hub-Signature-256) dos webhooks.
+# Obrigatória: vazia, o webhook recusa todos os eventos (403).
+META_APP_SECRET = config('META_APP_SECRET', default='')
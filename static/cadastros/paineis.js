@@ -0,0 +1,87 @@
+// static/cadastros/paineis.js
+// Painéis carregados sob demanda. Cada elemento [data-painel] busca suas linhas
+// no endpoint JSON (data-url) página a página: a primeira ao abrir a tela e as
+// seguintes quando o fim da lista ([data-painel-sentinela]) chega perto da área
+// visível. Filtros e ordenação vão como parâmetros (data-params + painel.definir).
+(function () {
+  class Painel {
+    constructor(el) {
+      this.el = el;
+      this.url = el.dataset.url;
+      this.params = el.dataset.params ? JSON.parse(el.dataset.params) : {};
+      this.corpo = el.querySelector('[data-painel-corpo]');
+      this.vazio = el.querySelector('[data-painel-vazio]');
+      this.textoVazio = this.vazio.innerHTML;
+      this.sentinela = el.querySelector('[data-painel-sentinela]');
+      this.carregandoEl = el.querySelector('[data-painel-carregando]');
+      this.geracao = 0;
+      this.observer = new IntersectionObserver(
+        (entradas) => { if (entradas.some((e) => e.isIntersecting)) this.carregar(); },
+        { rootMargin: '300px' }
+      );
+      this.recarregar();
+    }
+
+    // Troca filtros/ordenação e recomeça da primeira página
+    definir(params) {
+      Object.assign(this.params, params);
+      this.recarregar();
+    }
+
+    recarregar() {
+      this.geracao += 1;
+      this.proximo = null;
+      this.fim = false;
+      this.carregando = false;
+      this.corpo.innerHTML = '';
+      this.vazio.innerHTML = this.textoVazio;
+      this.vazio.classList.add('d-none');
+      this.observer.disconnect();
+      this.carregar();
+    }
+
+    async carregar() {
+      if (this.carregando || this.fim) return;
+      this.carregando = true;
+      const geracao = this.geracao;
+      const params = new URLSearchParams(this.params);
+      if (this.proximo) params.set('cursor', this.proximo);
+      this.carregandoEl.classList.remove('d-none');
+
+      try {
+        const resposta = await fetch(`${this.url}?${params}`, { headers: { 'X-Requested-With': 'XMLHttpRequest' } });
+        const dados = await resposta.json();
+        // Uma recarga (novo filtro) começou enquanto esta página chegava
+        if (geracao !== this.geracao) return;
+        if (!resposta.ok) throw new Error(dados.mensagem || resposta.statusText);
+
+        this.corpo.insertAdjacentHTML('beforeend', dados.html);
+        this.proximo = dados.proximo;
+        this.fim = !dados.proximo;
+        if (dados.total !== undefined) {
+          document.querySelectorAll(`[data-total-de="${this.el.id}"]`).forEach((t) => { t.textContent = dados.total; });
+          this.el.dispatchEvent(new CustomEvent('painel:total', { detail: dados.total }));
+          this.vazio.classList.toggle('d-none', dados.total > 0);
+        }
+      } catch (erro) {
+        if (geracao !== this.geracao) return;
+        this.fim = true;
+        this.vazio.textContent = `Não foi possível carregar: ${erro.message}`;
+        this.vazio.classList.remove('d-none');
+      } finally {
+        if (geracao === this.geracao) {
+          this.carregando = false;
+          this.carregandoEl.classList.add('d-none');
+          // Reobservar dispara de novo se a sentinela continua visível (tela maior que a página)
+          this.observer.disconnect();
+          if (!this.fim) this.observer.observe(this.sentinela);
+        }
+      }
+    }
+  }
+
+  window.Paineis = {};
+  document.querySelectorAll('[data-painel]').forEach((el) => {
+    window.Paineis[el.id] = new Painel(el);
+  });
+})();